@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
+from app.core.metrics import metrics
+
+
+class AdmissionSlot:
+    """One in-flight permit. Releasing is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    def __del__(self):
+        # Backstop for a streaming response that was dropped before it was iterated
+        self.release()
+
+
+class AdmissionController:
+    """
+    Bounds the number of concurrent requests and the number waiting for a slot.
+
+    Requests beyond the wait queue are rejected with 429 immediately, queued
+    requests that wait longer than `queue_timeout` get 503. Both carry a
+    Retry-After header so clients back off instead of piling up.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        self._in_flight = 0
+        self._waiting = 0
+
+    async def acquire(self) -> AdmissionSlot:
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            metrics.incr(f"admission.{self.name}.rejected_queue_full")
+            raise self._reject(429, "Too many requests, please retry shortly.")
+
+        self._waiting += 1
+        self._publish()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.incr(f"admission.{self.name}.rejected_timeout")
+            raise self._reject(503, "Server is busy, please retry shortly.")
+        finally:
+            self._waiting -= 1
+            metrics.observe(f"admission.{self.name}.wait_seconds", time.monotonic() - started)
+
+        self._in_flight += 1
+        self._publish()
+        return AdmissionSlot(self)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._semaphore.release()
+        self._publish()
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+    def _publish(self) -> None:
+        metrics.set(f"admission.{self.name}.in_flight", self._in_flight)
+        metrics.set(f"admission.{self.name}.queue_depth", self._waiting)
+
+
+async def hold_slot(slot: AdmissionSlot, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Keeps the slot for as long as the response streams, however it ends."""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        slot.release()
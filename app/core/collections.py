@@ -0,0 +1,58 @@
+import re
+from typing import Tuple
+
+from app.core.redis_client import get_redis
+
+# Chroma's naming rules, leaving room for the `__v<N>` suffix of physical versions
+COLLECTION_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,54}[a-zA-Z0-9]$")
+VERSION_SUFFIX_PATTERN = re.compile(r"__v\d+$")
+
+# The worker bumps this counter every time it writes to a collection.
+# API processes compare it against the version of the handle they hold open.
+VERSION_KEY = "onbi:collection_version:{name}"
+
+# Physical Chroma collection currently serving a logical collection name.
+# Unset means the physical collection has the logical name itself.
+ALIAS_KEY = "onbi:collection_alias:{name}"
+
+
+def validate_collection_name(collection_name: str) -> str:
+    """Raises ValueError for names Chroma would reject or that address a physical version."""
+    if not COLLECTION_NAME_PATTERN.match(collection_name or "") or VERSION_SUFFIX_PATTERN.search(collection_name):
+        raise ValueError(
+            f"Invalid collection name {collection_name!r}: use 3-56 letters, digits, '.', '_' or '-',"
+            " starting and ending with a letter or digit."
+        )
+    return collection_name
+
+
+def get_collection_version(collection_name: str) -> int:
+    value = get_redis().get(VERSION_KEY.format(name=collection_name))
+    return int(value) if value else 0
+
+
+def get_collection_state(collection_name: str) -> Tuple[int, str]:
+    """Version and physical collection of a logical name, read together."""
+    version, alias = get_redis().mget(VERSION_KEY.format(name=collection_name), ALIAS_KEY.format(name=collection_name))
+    return int(version) if version else 0, alias.decode() if alias else collection_name
+
+
+def resolve_collection(collection_name: str) -> str:
+    """Physical collection that reads and incremental writes of `collection_name` go to."""
+    return get_collection_state(collection_name)[1]
+
+
+def bump_collection_version(collection_name: str) -> int:
+    """Marks the collection as changed so open handles get reopened."""
+    return get_redis().incr(VERSION_KEY.format(name=collection_name))
+
+
+def swap_collection_alias(collection_name: str, physical_name: str) -> int:
+    """
+    Points the logical name at another physical collection and bumps its
+    version in one transaction, so no reader sees one without the other.
+    """
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.set(ALIAS_KEY.format(name=collection_name), physical_name)
+    pipe.incr(VERSION_KEY.format(name=collection_name))
+    return pipe.execute()[1]
@@ -1,11 +1,158 @@
 import os 
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
 API_KEY = os.getenv("OPENAI_API_KEY")
-if not API_KEY:
-  raise RuntimeError("OPENAI_API_KEY not set in .env")
 
-openai_client = OpenAI(api_key=API_KEY)
+def require_api_key() -> str:
+  # Checked when the models are built rather than at import, so a missing key
+  # shows up as "not ready" instead of a crash on import.
+  if not API_KEY:
+    raise RuntimeError("OPENAI_API_KEY not set in .env")
+  return API_KEY
+
+# --- Vector store (MUST MATCH between the API and the worker) ---
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "chroma_db_persistent")
+DEFAULT_COLLECTION_NAME = os.getenv("DEFAULT_COLLECTION_NAME", "default_collection")
+# Celery queue of every task that writes to Chroma (see app.worker.celery_app).
+# Exactly one worker process may consume it, on the host holding CHROMA_PERSIST_DIR.
+CHROMA_WRITE_QUEUE = os.getenv("CHROMA_WRITE_QUEUE", "chroma_writes")
+# Embedding model used at ingestion AND query time; vectors of different models do not mix
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+# Worker-side ingestion state: file manifest and caches
+INGEST_STATE_DIR = os.getenv("INGEST_STATE_DIR", "ingest_state")
+# A collection version replaced by a reindex is deleted this long after the swap,
+# once API processes holding it open have moved on
+COLLECTION_GC_GRACE_SECONDS = int(os.getenv("COLLECTION_GC_GRACE_SECONDS", "600"))
+
+# Redis is shared by the Celery broker/backend and the API-side caches
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# --- Vector store handles kept open by the API process ---
+# Maximum number of collections kept open at once (least recently used is closed first)
+COLLECTION_CACHE_SIZE = int(os.getenv("COLLECTION_CACHE_SIZE", "64"))
+# ... and the estimated memory they may use together: vectors x bytes per vector
+COLLECTION_CACHE_MAX_BYTES = int(os.getenv("COLLECTION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Resident memory per stored vector once a collection is queried: measured
+# with chromadb 1.0.13 at 1536 dimensions (~63.5 MiB per 3000 vectors)
+COLLECTION_BYTES_PER_VECTOR = int(os.getenv("COLLECTION_BYTES_PER_VECTOR", "22000"))
+# Hybrid retrieval: BM25 over the lexical index built at ingestion plus dense
+# search, fused with reciprocal rank fusion into RETRIEVER_K documents
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+DENSE_K = int(os.getenv("DENSE_K", "4"))
+LEXICAL_K = int(os.getenv("LEXICAL_K", "8"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Comma-separated collections chat requests may select; empty allows any ingested collection
+CHAT_COLLECTIONS = [name.strip() for name in os.getenv("CHAT_COLLECTIONS", "").split(",") if name.strip()]
+# How often (seconds) an open collection checks whether the worker wrote a new version
+COLLECTION_VERSION_CHECK_INTERVAL = float(os.getenv("COLLECTION_VERSION_CHECK_INTERVAL", "2"))
+
+# --- Query embedding cache (in-process LRU in front of Redis) ---
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+# "float32" keeps vectors exact, "float16" halves the memory and Redis footprint
+QUERY_EMBEDDING_CACHE_DTYPE = os.getenv("QUERY_EMBEDDING_CACHE_DTYPE", "float32")
+
+# --- Semantic answer cache for near-duplicate questions ---
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Cosine distance (1 - cosine similarity) under which two questions count as the same.
+# text-embedding-ada-002 compresses distances (unrelated questions rarely pass 0.3),
+# so at 0.05 questions differing only in a unit number or a date already match;
+# 0.02 keeps replays to rewordings. To tune it, replay a labelled set of question
+# pairs and pick the largest value with no false match, or compare the
+# answer_cache.best_distance summary with reported wrong answers.
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.02"))
+# Entries kept per collection; the oldest are dropped first
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+# --- SSE flush policy for streamed answers ---
+# Tokens are coalesced until the buffer reaches this many bytes...
+STREAM_FLUSH_MAX_BYTES = int(os.getenv("STREAM_FLUSH_MAX_BYTES", "256"))
+# ...or this many milliseconds passed since the previous flush. 0 flushes every token.
+STREAM_FLUSH_INTERVAL_MS = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+# How often (ms) an open stream checks whether the client has gone away
+DISCONNECT_POLL_INTERVAL_MS = int(os.getenv("DISCONNECT_POLL_INTERVAL_MS", "250"))
+
+# --- Admission control for /chat/send ---
+# Requests allowed to run at the same time (retrieval + LLM stream)
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "32"))
+# Requests allowed to wait for a slot; beyond this they get 429 straight away
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+# Seconds a queued request may wait before it gets 503
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "5"))
+# Value of the Retry-After header (seconds) on rejected requests
+CHAT_RETRY_AFTER = int(os.getenv("CHAT_RETRY_AFTER", "2"))
+
+# --- Micro-batching of query embeddings across concurrent requests ---
+# How long (ms) the first query of a batch waits for others to join
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+# Upper bound of tokens sent in one embeddings request
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "8000"))
+
+# --- Shared HTTP connection pool for OpenAI calls (one per process) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Seconds an idle connection stays open for reuse
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+# HTTP/2 is only used when the optional `h2` package is installed
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# --- Worker embedding cache (content-addressed, on local disk) ---
+INGEST_EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("INGEST_EMBEDDING_CACHE_MAX_BYTES", str(1024 ** 3)))
+INGEST_EMBEDDING_CACHE_DTYPE = os.getenv("INGEST_EMBEDDING_CACHE_DTYPE", "float32")
+
+# --- Worker parse cache (parsed document elements, zstd-compressed, on local disk) ---
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+PARSE_CACHE_ZSTD_LEVEL = int(os.getenv("PARSE_CACHE_ZSTD_LEVEL", "10"))
+
+# --- Streaming ingestion pipeline ---
+# Chunks per embed + upsert batch (also capped by Chroma's max batch size)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# Batches allowed to wait between two pipeline stages; bounds worker memory
+INGEST_QUEUE_BATCHES = int(os.getenv("INGEST_QUEUE_BATCHES", "2"))
+# "character" (1000 chars, 200 overlap) or "structure" (token-sized, breaks at
+# headings, list items and table rows). Changing it only affects files ingested
+# afterwards; `python -m app.worker.cli rebuild` re-chunks a whole collection.
+# On public/data, `python -m app.worker.cli compare-chunkers` measured structure
+# at 142 chunks / 32,806 embedding tokens vs 155 / 36,470 for character
+# (-8.4% chunks, -10.0% tokens, ~924 vs ~941 prompt tokens for the top 4).
+INGEST_CHUNKER = os.getenv("INGEST_CHUNKER", "character")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+# Only used when a single element is longer than CHUNK_MAX_TOKENS
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "20"))
+
+# --- PDF page triage: only pages without a usable text layer are OCRed ---
+PDF_OCR_PAGE_TIMEOUT = float(os.getenv("PDF_OCR_PAGE_TIMEOUT", "30"))
+PDF_OCR_LANGUAGES = os.getenv("PDF_OCR_LANGUAGES", "ind+eng")
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", "200"))
+# Used to price skipped OCR for PDFs where no page needed OCR
+PDF_OCR_PAGE_SECONDS_ESTIMATE = float(os.getenv("PDF_OCR_PAGE_SECONDS_ESTIMATE", "3"))
+
+# --- Directory watcher (python -m app.worker.watcher) ---
+# Comma-separated directories ingested into DEFAULT_COLLECTION_NAME on change
+WATCH_DIRECTORIES = [path.strip() for path in os.getenv("WATCH_DIRECTORIES", "public/data").split(",") if path.strip()]
+# Changes are collected until none arrived for this long (a copy writes many events),
+# but for no longer than WATCH_MAX_WAIT_MS in total
+WATCH_DEBOUNCE_MS = int(os.getenv("WATCH_DEBOUNCE_MS", "2000"))
+WATCH_MAX_WAIT_MS = int(os.getenv("WATCH_MAX_WAIT_MS", "10000"))
+
+# --- Worker embedding client: batching, concurrency and shared rate limits ---
+# Tokens (tiktoken) and inputs packed into one embeddings request
+EMBEDDING_REQUEST_MAX_TOKENS = int(os.getenv("EMBEDDING_REQUEST_MAX_TOKENS", "50000"))
+EMBEDDING_REQUEST_MAX_INPUTS = int(os.getenv("EMBEDDING_REQUEST_MAX_INPUTS", "512"))
+# Embedding requests in flight per worker process
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+# Budgets shared by all workers through Redis (per minute); 0 disables the limit
+EMBEDDING_RPM_LIMIT = int(os.getenv("EMBEDDING_RPM_LIMIT", "3000"))
+EMBEDDING_TPM_LIMIT = int(os.getenv("EMBEDDING_TPM_LIMIT", "1000000"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+# --- Ingestion progress ---
+# Seconds between updates on the ingestion progress event stream
+INGEST_PROGRESS_POLL_INTERVAL = float(os.getenv("INGEST_PROGRESS_POLL_INTERVAL", "1"))
@@ -0,0 +1,62 @@
+import importlib.util
+
+import httpx
+
+from app.core.config import (
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_READ_TIMEOUT,
+)
+
+# httpx needs the `h2` extra for HTTP/2; fall back to HTTP/1.1 keep-alive without it
+USE_HTTP2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+_async_client = None
+_sync_client = None
+
+
+def _client_options() -> dict:
+    return {
+        "http2": USE_HTTP2,
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    }
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client for every async OpenAI call (chat + embeddings)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def get_http_client() -> httpx.Client:
+    """Sync counterpart, used by the Celery worker and sync LangChain code paths."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def open_http_clients() -> None:
+    get_async_http_client()
+    get_http_client()
+    print(f"Shared HTTP clients ready (http2={USE_HTTP2}, max_connections={HTTP_MAX_CONNECTIONS}).")
+
+
+async def close_http_clients() -> None:
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
@@ -0,0 +1,53 @@
+import threading
+from collections import defaultdict
+
+class Metrics:
+    """
+    Minimal in-process metrics: monotonic counters, last-value gauges and
+    summaries (count / sum / max). Exposed as JSON on GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._summaries = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def average(self, name: str) -> float:
+        with self._lock:
+            summary = self._summaries.get(name)
+            return summary["sum"] / summary["count"] if summary and summary["count"] else 0.0
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            summaries = {
+                name: {**s, "avg": s["sum"] / s["count"] if s["count"] else 0.0}
+                for name, s in self._summaries.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+
+metrics = Metrics()
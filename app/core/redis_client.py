@@ -0,0 +1,20 @@
+import redis
+import redis.asyncio as aioredis
+from app.core.config import REDIS_URL
+
+# One connection pool per process for each flavour of client
+_redis_client = None
+_async_redis_client = None
+
+def get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(REDIS_URL)
+    return _async_redis_client
@@ -0,0 +1,49 @@
+import importlib
+import time
+from contextlib import contextmanager
+
+# Taken as early as possible: app.main imports this module first
+PROCESS_STARTED = time.perf_counter()
+
+
+class StartupReport:
+    """
+    Records how long each import and initialization step took during startup,
+    and whether the warm-up finished (served on GET /ready and GET /startup).
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.ready = False
+        self.error = None
+        self.ready_after = None
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append({"step": name, "seconds": round(time.perf_counter() - started, 4)})
+
+    def import_module(self, module_name: str):
+        with self.step(f"import {module_name}"):
+            return importlib.import_module(module_name)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.ready_after = round(time.perf_counter() - PROCESS_STARTED, 4)
+        print(f"Startup finished in {self.ready_after}s:")
+        for step in sorted(self.steps, key=lambda s: s["seconds"], reverse=True):
+            print(f"  {step['seconds']:>8.3f}s  {step['step']}")
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_after_seconds": self.ready_after,
+            "error": self.error,
+            "steps": self.steps,
+        }
+
+
+startup_report = StartupReport()
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.core.config import DISCONNECT_POLL_INTERVAL_MS
+
+T = TypeVar("T")
+
+# nginx convention for "client closed the connection before we answered"
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def wait_for_disconnect(request: Request, interval: float = DISCONNECT_POLL_INTERVAL_MS / 1000) -> None:
+    """Returns once the client has closed the connection."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Runs `awaitable` but cancels it as soon as the client disconnects, so
+    retrieval or a non-streamed generation is not finished for nobody.
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+
+        task.cancel()
+        await asyncio.wait({task})
+        print("Client disconnected before the answer started, request cancelled.")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
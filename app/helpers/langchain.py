@@ -1,12 +1,15 @@
 import os
-import asyncio
 from dotenv import load_dotenv
-from langchain.document_loaders import DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
+from app.helpers.sse import coalesce
+from app.core.http import get_async_http_client, get_http_client
+from app.worker.chunking import merge_elements
+from app.worker.loaders import load_file
+from app.worker.manifest import scan_directory
 
 load_dotenv()
 
@@ -19,27 +22,25 @@ def langchain_directory(query: str):
   else:
       print(f"Loading documents from: {directory_path}")
     
-  # Use a glob pattern to load specific file types
-  # This pattern says "look in the directory for any file that ends with .pdf, .docx, or .doc"
-  loader = DirectoryLoader(directory_path, glob="**/*[.pdf,.docx,.doc]", use_multithreading=True)
-  
-  # Load the documents  
+  # Load only the file types that have a registered loader (.pdf, .docx, .doc)
   try:
-      documents = loader.load()
+      documents = [document for path in scan_directory(directory_path) for document in merge_elements(load_file(path))]
 
       # Print a summary of what was loaded
       print(f"Successfully loaded {len(documents)} documents.")
       text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
       texts = text_splitter.split_documents(documents)
     
-      embeddings = OpenAIEmbeddings() # Requires an OpenAI API key
+      embeddings = OpenAIEmbeddings(http_client=get_http_client()) # Requires an OpenAI API key
       
       api_key = os.getenv("OPENAI_API_KEY")
       
       llm = ChatOpenAI(
         model_name="gpt-4.1-mini",
         temperature=0.7,
-        openai_api_key=api_key
+        openai_api_key=api_key,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
       )
       
       # Create a Chroma vector store from the text chunks and embeddings
@@ -92,8 +93,10 @@ def langchain_directory(query: str):
   # return response
   
 async def chat_response_generator(response:str):
-    words = response.split()
-      
-    for word in words:
-        yield word + " "
-        await asyncio.sleep(0.02)
+    async def words():
+        for word in response.split():
+            yield word + " "
+
+    # Same flush policy as the chat stream instead of a fixed sleep per word
+    async for text in coalesce(words()):
+        yield text
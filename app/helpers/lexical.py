@@ -0,0 +1,331 @@
+import json
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Bump when tokenization or the file layout changes; older builds are then ignored
+INDEX_FORMAT = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Incremental updates add a segment each; past this many, or once this share of
+# the indexed documents is deleted, the segments are merged back into one
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.2
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+# Frequent Indonesian function words carry no lexical signal
+STOPWORDS = frozenset(
+    """
+    ada adalah agar akan aku anda antara apa apabila atas atau bagi bahwa baik banyak belum bila
+    bisa boleh dalam dan dapat dari demikian dengan di dia hal harus hingga ia ini itu jadi jika
+    juga kami kamu karena ke kepada ketika kita lagi lain maka masih mereka namun oleh pada para
+    saat saja sampai sangat sebagai secara sedang sehingga sejak semua serta setelah seperti
+    sudah supaya tapi telah tentang tersebut tetapi tidak untuk yaitu yakni yang
+    """.split()
+)
+
+# The particle "-pun" and the possessive "-nya": "walaupun", "cutinya". "-lah",
+# "-kah" and "-tah" are left alone because they also end plain words, and cutting
+# them merges unrelated terms ("masalah" -> "masa", "langkah" -> "lang",
+# "pemerintah" -> "pemerin"). "-ku"/"-mu" likewise ("berlaku", "ilmu").
+_PARTICLES = ("pun",)
+_POSSESSIVES = ("nya",)
+
+
+def _strip_suffixes(token: str) -> str:
+    """Light Indonesian stemming: strips "-pun" and then "-nya" from words of 7+ letters."""
+    if not token.isalpha():
+        # Codes such as "deep46" are kept exactly as written
+        return token
+    for suffixes in (_PARTICLES, _POSSESSIVES):
+        for suffix in suffixes:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+                token = token[: -len(suffix)]
+                break
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric tokens with Indonesian stopwords removed and
+    "-pun"/"-nya" stripped. Reduplicated words ("karyawan-karyawan")
+    become their base word twice, which is what BM25 should count.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        tokens.append(_strip_suffixes(token))
+    return tokens
+
+
+def index_path(root: str, collection_name: str) -> str:
+    return os.path.join(root, "lexical", collection_name)
+
+
+def _write_segment(path: str, documents: Iterable[Tuple[str, str]]) -> Tuple[str, dict]:
+    """Tokenizes (id, text) pairs into a new immutable segment directory under `path`."""
+    ids: List[str] = []
+    doc_lengths: List[int] = []
+    postings = defaultdict(list)
+    for doc_index, (id_, text) in enumerate(documents):
+        counts = Counter(tokenize(text or ""))
+        ids.append(id_)
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((doc_index, tf))
+    return _save_segment(path, ids, doc_lengths, postings)
+
+
+def _save_segment(path: str, ids: List[str], doc_lengths: List[int], postings: dict) -> Tuple[str, dict]:
+    terms = {}
+    doc_column = []
+    tf_column = []
+    for term in sorted(postings):
+        entries = postings[term]
+        terms[term] = [len(doc_column), len(entries)]
+        doc_column.extend(doc for doc, _ in entries)
+        tf_column.extend(min(tf, 65535) for _, tf in entries)
+
+    name = f"segment-{time.time_ns()}"
+    segment_dir = os.path.join(path, name)
+    os.makedirs(segment_dir)
+    np.save(os.path.join(segment_dir, "postings.npy"), np.asarray(doc_column, dtype=np.int32))
+    np.save(os.path.join(segment_dir, "tf.npy"), np.asarray(tf_column, dtype=np.uint16))
+    np.save(os.path.join(segment_dir, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+    with open(os.path.join(segment_dir, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(segment_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f, separators=(",", ":"))
+    return name, {"documents": len(ids), "terms": len(terms)}
+
+
+def _read_state(path: str) -> Optional[dict]:
+    """The state `path/CURRENT` points at, or None if there is none or it is outdated."""
+    try:
+        with open(os.path.join(path, "CURRENT"), encoding="utf-8") as f:
+            with open(os.path.join(path, f.read().strip()), encoding="utf-8") as state_file:
+                state = json.load(state_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return state if state.get("format") == INDEX_FORMAT else None
+
+
+def _write_state(path: str, segments: List[str], deleted: dict, keep_states: int) -> None:
+    """
+    Publishes a new state (segments + deleted documents per segment) with an
+    atomic rename of `path/CURRENT`, so readers never see a half-written index.
+    Segments only referenced by states older than the last `keep_states` are
+    removed; processes that still map them keep working.
+    """
+    state = {"format": INDEX_FORMAT, "segments": segments, "deleted": deleted}
+    name = f"state-{time.time_ns()}.json"
+    with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    pointer = os.path.join(path, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+
+    states = sorted(entry for entry in os.listdir(path) if entry.startswith("state-"))
+    kept = set()
+    for entry in states[-keep_states:]:
+        with open(os.path.join(path, entry), encoding="utf-8") as f:
+            kept.update(json.load(f)["segments"])
+    for entry in states[:-keep_states]:
+        os.remove(os.path.join(path, entry))
+    for entry in os.listdir(path):
+        # Also clears builds of older index formats
+        if entry.startswith(("segment-", "build-")) and entry not in kept:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def build_index(path: str, documents: Iterable[Tuple[str, str]], keep_states: int = 2) -> dict:
+    """
+    Writes a BM25 inverted index of (id, text) pairs as a single fresh
+    segment under `path` and publishes it (see `_write_state`).
+    """
+    started = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+    segment, meta = _write_segment(path, documents)
+    _write_state(path, [segment], {}, keep_states)
+    return {**meta, "segments": 1, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def update_index(path: str, documents: Iterable[Tuple[str, str]], deleted_ids: Iterable[str], keep_states: int = 2) -> Optional[dict]:
+    """
+    Adds (id, text) pairs as a new segment and marks `deleted_ids` deleted in
+    the segments holding them, without touching the documents that did not
+    change. Segments are merged once there are more than MAX_SEGMENTS or more
+    than MAX_DELETED_RATIO of their documents are deleted. Returns None if
+    there is no current index to update; build one with `build_index`.
+    """
+    started = time.perf_counter()
+    state = _read_state(path)
+    if state is None:
+        return None
+    segments = list(state["segments"])
+    deleted = {segment: set(indices) for segment, indices in state["deleted"].items()}
+
+    deleted_ids = set(deleted_ids)
+    live = set()
+    total = 0
+    newly_deleted = 0
+    for segment in segments:
+        with open(os.path.join(path, segment, "ids.json"), encoding="utf-8") as f:
+            ids = json.load(f)
+        total += len(ids)
+        gone = deleted.setdefault(segment, set())
+        for doc_index, id_ in enumerate(ids):
+            if doc_index in gone:
+                continue
+            if id_ in deleted_ids:
+                gone.add(doc_index)
+                newly_deleted += 1
+            else:
+                live.add(id_)
+
+    # Chunk IDs are content-addressed: one that is still indexed needs no new posting
+    added, meta = _write_segment(path, ((id_, text) for id_, text in documents if id_ not in live))
+    if meta["documents"]:
+        segments.append(added)
+        total += meta["documents"]
+    else:
+        shutil.rmtree(os.path.join(path, added), ignore_errors=True)
+
+    removed = sum(len(indices) for indices in deleted.values())
+    merged = len(segments) > MAX_SEGMENTS or (total > 0 and removed / total > MAX_DELETED_RATIO)
+    if merged:
+        segments, deleted = [_merge_segments(path, segments, deleted)], {}
+    _write_state(path, segments, {segment: sorted(indices) for segment, indices in deleted.items() if indices}, keep_states)
+    return {
+        "documents": total - removed,
+        "added": meta["documents"],
+        "deleted": newly_deleted,
+        "segments": len(segments),
+        "merged": merged,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _merge_segments(path: str, segments: List[str], deleted: dict) -> str:
+    """Rewrites the live documents of `segments` into one segment, from their postings alone."""
+    ids: List[str] = []
+    doc_lengths: List[int] = []
+    postings = defaultdict(list)
+    for segment in segments:
+        reader = _Segment(os.path.join(path, segment), deleted.get(segment, ()))
+        # Old doc index -> new one, -1 for deleted documents
+        remap = np.full(len(reader.ids), -1, dtype=np.int64)
+        for doc_index, id_ in enumerate(reader.ids):
+            if reader.live is None or reader.live[doc_index]:
+                remap[doc_index] = len(ids)
+                ids.append(id_)
+                doc_lengths.append(int(reader.doc_lengths[doc_index]))
+        for term, (start, df) in reader.terms.items():
+            docs = remap[np.asarray(reader.postings[start:start + df])]
+            tf = np.asarray(reader.tf[start:start + df])
+            postings[term].extend((doc, count) for doc, count in zip(docs.tolist(), tf.tolist()) if doc >= 0)
+    return _save_segment(path, ids, doc_lengths, postings)[0]
+
+
+class _Segment:
+    """
+    One memory-mapped segment. Posting lists, term frequencies and document
+    lengths stay on disk, so opening it costs only the term dictionary and a
+    lookup touches just the postings of the query terms.
+    """
+
+    def __init__(self, segment_dir: str, deleted: Iterable[int] = ()):
+        with open(os.path.join(segment_dir, "terms.json"), encoding="utf-8") as f:
+            self.terms = json.load(f)
+        with open(os.path.join(segment_dir, "ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.postings = np.load(os.path.join(segment_dir, "postings.npy"), mmap_mode="r")
+        self.tf = np.load(os.path.join(segment_dir, "tf.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(segment_dir, "doc_lengths.npy"), mmap_mode="r")
+        deleted = list(deleted)
+        # Mask of documents that are not deleted; None when all of them are live
+        self.live = None
+        if deleted:
+            self.live = np.ones(len(self.ids), dtype=bool)
+            self.live[deleted] = False
+
+    def postings_of(self, term: str):
+        """(doc indices, term frequencies) of the live documents containing `term`."""
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        start, df = entry
+        docs = np.asarray(self.postings[start:start + df])
+        tf = np.asarray(self.tf[start:start + df], dtype=np.float32)
+        if self.live is not None:
+            keep = self.live[docs]
+            docs, tf = docs[keep], tf[keep]
+        return docs, tf
+
+
+class LexicalIndex:
+    """
+    Read side of `build_index` / `update_index`: the segments of the current
+    state, scored as one index. Document count, average length and document
+    frequencies leave out deleted documents, so scores match a full rebuild.
+    """
+
+    def __init__(self, path: str, state: dict):
+        self.segments = [
+            _Segment(os.path.join(path, segment), state["deleted"].get(segment, ()))
+            for segment in state["segments"]
+        ]
+        documents = 0
+        total_length = 0
+        for segment in self.segments:
+            lengths = np.asarray(segment.doc_lengths)
+            if segment.live is not None:
+                lengths = lengths[segment.live]
+            documents += len(lengths)
+            total_length += int(lengths.sum())
+        self.meta = {
+            "format": INDEX_FORMAT,
+            "documents": documents,
+            "segments": len(self.segments),
+            "avg_doc_length": total_length / documents if documents else 0.0,
+        }
+
+    @classmethod
+    def open(cls, path: str) -> Optional["LexicalIndex"]:
+        """The current state under `path`, or None if there is none (yet) or it is outdated."""
+        state = _read_state(path)
+        return cls(path, state) if state is not None else None
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top `k` (id, BM25 score) pairs for the query."""
+        documents = self.meta["documents"]
+        if not documents:
+            return []
+        avg_doc_length = self.meta["avg_doc_length"] or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            hits = [(segment, segment.postings_of(term)) for segment in self.segments]
+            hits = [(segment, found) for segment, found in hits if found is not None and len(found[0])]
+            df = sum(len(docs) for _, (docs, _) in hits)
+            if not df:
+                continue
+            idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+            for segment, (docs, tf) in hits:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lengths[docs] / avg_doc_length)
+                for doc, score in zip(docs.tolist(), (idf * tf * (BM25_K1 + 1) / (tf + norm)).tolist()):
+                    key = segment.ids[doc]
+                    scores[key] = scores.get(key, 0.0) + score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,120 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from app.core.config import STREAM_FLUSH_INTERVAL_MS, STREAM_FLUSH_MAX_BYTES
+from app.helpers.disconnect import wait_for_disconnect
+
+# Headers that stop proxies (nginx) from buffering the event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(data: str, event: Optional[str] = None) -> str:
+    """Builds one `text/event-stream` frame; multi-line data becomes several `data:` lines."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def coalesce(
+    chunks: AsyncIterator[str],
+    max_bytes: int = STREAM_FLUSH_MAX_BYTES,
+    interval: float = STREAM_FLUSH_INTERVAL_MS / 1000,
+    stop: Optional[asyncio.Event] = None,
+) -> AsyncIterator[str]:
+    """
+    Groups small LLM chunks into larger writes.
+
+    A buffer is flushed once it holds `max_bytes`, or once `interval` seconds
+    have passed since the previous flush. A chunk that arrives after the
+    interval already elapsed is sent right away, so a model that is slower
+    than the client never gets extra delay.
+
+    When `stop` is set the upstream iterator is cancelled and closed at once,
+    without waiting for its next chunk.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    pending = None
+    stop_waiter = asyncio.ensure_future(stop.wait()) if stop else None
+    buffer = []
+    size = 0
+    last_flush = float("-inf")
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            timeout = None
+            if buffer:
+                timeout = max(last_flush + interval - loop.time(), 0)
+            waiting = {pending, stop_waiter} if stop_waiter else {pending}
+            done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if stop_waiter in done:
+                return
+            if not done:
+                # Interval elapsed while waiting for the next token
+                yield "".join(buffer)
+                buffer, size, last_flush = [], 0, loop.time()
+                continue
+
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            buffer.append(chunk)
+            size += len(chunk.encode("utf-8"))
+            if size >= max_bytes or loop.time() - last_flush >= interval:
+                yield "".join(buffer)
+                buffer, size, last_flush = [], 0, loop.time()
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if stop_waiter is not None:
+            stop_waiter.cancel()
+        # Cancel and close the upstream so the LLM request stops right away
+        # instead of whenever the generator gets garbage collected.
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.wait({pending})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def event_stream(chunks: AsyncIterator[str], request: Optional[Request] = None) -> AsyncIterator[str]:
+    """
+    Coalesces text chunks into SSE `data` frames and ends with a `done` event.
+    With `request`, the upstream is cancelled as soon as the client disconnects.
+    """
+    disconnected = asyncio.Event()
+    watcher = None
+    if request is not None:
+        async def watch():
+            await wait_for_disconnect(request)
+            disconnected.set()
+        watcher = asyncio.ensure_future(watch())
+
+    try:
+        async for text in coalesce(chunks, stop=disconnected):
+            yield format_sse(text)
+    except Exception as e:
+        print(f"Error during RAG stream: {e}")
+        yield format_sse(f"[ERROR] Terjadi kesalahan: {e}", event="error")
+        return
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+    if not disconnected.is_set():
+        yield format_sse("[DONE]", event="done")
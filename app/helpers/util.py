@@ -1,2 +1,33 @@
+import numpy as np
+
+# Encoders are expensive to build, so keep one per model
+_encoders = {}
+
 def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
\ No newline at end of file
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def encode_vector(vector, dtype: str = "float32") -> bytes:
+    """Packs an embedding into raw float32/float16 bytes for compact storage."""
+    return np.asarray(vector, dtype=dtype).tobytes()
+
+
+def decode_vector(data: bytes, dtype: str = "float32") -> list:
+    return np.frombuffer(data, dtype=dtype).astype(np.float32).tolist()
+
+
+def get_encoder(model: str = "gpt-4o-mini"):
+    encoder = _encoders.get(model)
+    if encoder is None:
+        import tiktoken  # deferred: loading the BPE tables is slow
+
+        try:
+            encoder = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoder = tiktoken.get_encoding("cl100k_base")
+        _encoders[model] = encoder
+    return encoder
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    return len(get_encoder(model).encode(text, disallowed_special=()))
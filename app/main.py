@@ -1,8 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+from app.core.startup import startup_report
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers.chat import router as chat_router
 
-app = FastAPI(title="ONBI API")
+# Routers and services only import light modules at this point; the heavy
+# LangChain / Chroma / OpenAI stack is loaded by the warm-up below.
+with startup_report.step("import app modules"):
+  from app.core.http import close_http_clients, open_http_clients
+  from app.routers.chat import router as chat_router
+  from app.routers.system import router as system_router
+  from app.services.chat import init_models, warm_up
+
+# Imported (and timed) during warm-up, in this order
+WARM_UP_MODULES = (
+  "langchain_core.runnables",
+  "langchain_openai",
+  "langchain_community.vectorstores",
+  "chromadb",
+  "tiktoken",
+  # Celery is only needed to dispatch ingestion tasks
+  "app.worker.celery_app",
+)
+
+async def warm_up_app():
+  """Loads heavy modules, builds the clients and opens the default collection.
+  GET /ready reports 503 until this has finished."""
+  try:
+    with startup_report.step("open http clients"):
+      open_http_clients()
+    for module_name in WARM_UP_MODULES:
+      await asyncio.to_thread(startup_report.import_module, module_name)
+    with startup_report.step("init models"):
+      init_models()
+    with startup_report.step("open default collection"):
+      await warm_up()
+    startup_report.mark_ready()
+  except Exception as e:
+    startup_report.error = str(e)
+    print(f"FATAL: Warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # The server starts accepting connections right away; the warm-up runs in the
+  # background so the orchestrator can poll /ready instead of waiting on a slow boot.
+  warm_up_task = asyncio.create_task(warm_up_app())
+  yield
+  warm_up_task.cancel()
+  await close_http_clients()
+
+app = FastAPI(title="ONBI API", lifespan=lifespan)
 
 origins = ["*"]
 
@@ -15,3 +62,4 @@ app.add_middleware(
 )
 
 app.include_router(chat_router)
+app.include_router(system_router)
@@ -1,5 +1,9 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class Chat(BaseModel):
   message: str
-  
\ No newline at end of file
+  # When false, /chat/send returns the whole answer as JSON instead of streaming it
+  stream: bool = True
+  # Corpus to answer from (one per business unit); defaults to DEFAULT_COLLECTION_NAME
+  collection_name: Optional[str] = None
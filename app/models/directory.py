@@ -1,4 +1,10 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class Directory(BaseModel):
-    path: str
\ No newline at end of file
+    path: str
+    # Collection to ingest into; defaults to DEFAULT_COLLECTION_NAME
+    collection_name: Optional[str] = None
+    # Build a new collection version and swap to it when complete, instead of
+    # updating the live collection file by file
+    reindex: bool = False
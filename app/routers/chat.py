@@ -1,22 +1,47 @@
+import asyncio
+import json
 import os
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.models.chat import Chat
-from app.services.chat import run_conversation, stream_conversation_generator
+from app.services.chat import prepare_conversation, run_conversation, stream_conversation_generator
 from fastapi.responses import JSONResponse
 from app.models.directory import Directory
-from app.helpers.langchain import chat_response_generator
+from app.helpers.sse import SSE_HEADERS, event_stream, format_sse
+from app.helpers.disconnect import cancel_on_disconnect
+from app.core.admission import AdmissionController, hold_slot
+from app.core.collections import validate_collection_name
+from app.core.config import (
+    CHAT_MAX_IN_FLIGHT,
+    CHAT_MAX_QUEUE,
+    CHAT_QUEUE_TIMEOUT,
+    CHAT_RETRY_AFTER,
+    DEFAULT_COLLECTION_NAME,
+    INGEST_PROGRESS_POLL_INTERVAL,
+)
 
-# Import the celery task we defined
-from app.worker.tasks import process_directory
-
-# --- Configuration - MUST MATCH THE WORKER ---
-CHROMA_PERSIST_DIR = "chroma_db_persistent"
-# We'll use a default collection name for this example
-DEFAULT_COLLECTION_NAME = "default_collection"
+from app.worker.progress import get_ingestion_status
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+def dispatch_ingestion(task_name: str, *args):
+    """
+    Sends an `app.worker.tasks` task by name. Importing the task module would
+    load the whole ingestion stack (loaders, chunkers, OpenAI SDK) into the API.
+    """
+    from app.worker.celery_app import celery_app
+
+    return celery_app.send_task(f"app.worker.tasks.{task_name}", args=args)
+
+# Bounds concurrent chat requests so the ones we accept stay fast
+chat_admission = AdmissionController(
+    "chat",
+    max_in_flight=CHAT_MAX_IN_FLIGHT,
+    max_queue=CHAT_MAX_QUEUE,
+    queue_timeout=CHAT_QUEUE_TIMEOUT,
+    retry_after=CHAT_RETRY_AFTER,
+)
+
 @router.post("/process-directory")
 async def trigger_directory_processing(request: Directory):
     """
@@ -25,29 +50,77 @@ async def trigger_directory_processing(request: Directory):
     directory_path = request.path
     if not os.path.isdir(directory_path):
         raise HTTPException(status_code=404, detail=f"Directory not found: {directory_path}")
+    collection_name = request.collection_name or DEFAULT_COLLECTION_NAME
+    try:
+        validate_collection_name(collection_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Dispatch the background task to Celery
-    dir = process_directory.delay(directory_path, DEFAULT_COLLECTION_NAME)
+    task = dispatch_ingestion("reindex_directory" if request.reindex else "process_directory", directory_path, collection_name)
     return JSONResponse(
         status_code=202, # Accepted
         content={
             "message": "Directory processing started in the background.",
+            "task_id": task.id,
+            "status_url": router.url_path_for("get_directory_processing_status", task_id=task.id),
             "directory_path": directory_path,
-            "collection_name": DEFAULT_COLLECTION_NAME
-        }
+            "collection_name": collection_name,
+            "reindex": request.reindex,
+        },
+        headers={"Location": router.url_path_for("get_directory_processing_status", task_id=task.id)},
     )
 
+@router.get("/process-directory/{task_id}")
+async def get_directory_processing_status(task_id: str):
+    """
+    Progress of a directory processing task while it runs, and its result once done.
+    """
+    # The result backend client is blocking
+    return await asyncio.to_thread(get_ingestion_status, task_id)
+
+@router.get("/process-directory/{task_id}/events")
+async def stream_directory_processing_status(task_id: str, http_request: Request):
+    """
+    Same as the status endpoint, pushed as server-sent events until the task is done.
+    """
+    async def progress_events():
+        while not await http_request.is_disconnected():
+            status = await asyncio.to_thread(get_ingestion_status, task_id)
+            yield format_sse(json.dumps(status), event="progress")
+            if status["ready"]:
+                yield format_sse("[DONE]", event="done")
+                return
+            await asyncio.sleep(INGEST_PROGRESS_POLL_INTERVAL)
+
+    return StreamingResponse(progress_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/send")
-async def chat(request: Chat):
-    # response = langchain_directory(request.message)
-    response = run_conversation(request)
-
-    return StreamingResponse(stream_conversation_generator(request), media_type="text/event-stream")
-    
-    # return StreamingResponse(chat_response_generator(response), media_type="text/plain")
-    # return JSONResponse(
-    #     status_code=202,
-    #     content={
-    #         "message": response
-    #     }
-    # )
\ No newline at end of file
+async def chat(request: Chat, http_request: Request):
+    # Wait for a free slot (or get a fast 429/503) before doing any work
+    slot = await chat_admission.acquire()
+    try:
+        # Validation and retrieval happen before the response starts, so errors
+        # still map to HTTP status codes and the stream begins with the first token.
+        # Every stage is cancelled if the client disconnects.
+        conversation = await cancel_on_disconnect(http_request, prepare_conversation(request))
+
+        if not request.stream:
+            answer = await cancel_on_disconnect(http_request, run_conversation(conversation))
+            slot.release()
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "message": answer
+                }
+            )
+    except BaseException:
+        slot.release()
+        raise
+
+    # The slot is released when the stream finishes or the client disconnects
+    return StreamingResponse(
+        hold_slot(slot, event_stream(stream_conversation_generator(conversation), request=http_request)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
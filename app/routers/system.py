@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.metrics import metrics
+from app.core.startup import startup_report
+
+router = APIRouter(tags=["system"])
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Snapshot of the in-process counters (cache hit rates, queue depth, ...).
+    """
+    return metrics.snapshot()
+
+@router.get("/collections")
+async def open_collections():
+    """
+    Collections this process holds open, with estimated memory and per-collection latency.
+    """
+    from app.services.chat import collection_registry
+
+    return collection_registry.stats()
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 200 only once the clients, models and default collection are warm.
+    """
+    if not startup_report.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "error": startup_report.error})
+    return {"status": "ready"}
+
+@router.get("/startup")
+async def startup_times():
+    """
+    Per-step import and initialization times of this process.
+    """
+    return startup_report.as_dict()
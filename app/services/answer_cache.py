@@ -0,0 +1,101 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.metrics import metrics
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    # Prompt + completion tokens a replay avoids paying for
+    tokens: int
+    expires_at: float
+
+
+class _Bucket:
+    """Cached answers for one version of one collection."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: List[CachedAnswer] = []
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed by the query embedding.
+
+    A new question hits when its cosine distance to the closest unexpired
+    cached question of the same collection version is at most `max_distance`.
+    Entries are bucketed by collection version, so re-ingesting a collection
+    invalidates its answers. The closest distance of every lookup is recorded
+    as `answer_cache.best_distance` to tune `max_distance` against.
+    """
+
+    def __init__(self, max_distance: float, max_entries: int, ttl: int):
+        self.max_distance = max_distance
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, collection_name: str, version: int, vector) -> Optional[CachedAnswer]:
+        query = _normalize(vector)
+        now = time.monotonic()
+        hit = None
+        with self._lock:
+            bucket = self._current_bucket(collection_name, version)
+            if bucket and bucket.entries:
+                similarities = bucket.vectors @ query
+                # An expired entry must not hide a valid one that is slightly further away
+                expired = np.fromiter((entry.expires_at <= now for entry in bucket.entries), dtype=bool)
+                similarities[expired] = -np.inf
+                best = int(np.argmax(similarities))
+                if not expired[best]:
+                    distance = 1.0 - float(similarities[best])
+                    metrics.observe("answer_cache.best_distance", distance)
+                    if distance <= self.max_distance:
+                        hit = bucket.entries[best]
+
+        if hit:
+            metrics.incr("answer_cache.hits")
+            metrics.incr("answer_cache.saved_tokens", hit.tokens)
+        else:
+            metrics.incr("answer_cache.misses")
+        hits, misses = metrics.get("answer_cache.hits"), metrics.get("answer_cache.misses")
+        metrics.set("answer_cache.hit_rate", hits / (hits + misses))
+        return hit
+
+    def store(self, collection_name: str, version: int, vector, question: str, answer: str, tokens: int) -> None:
+        row = _normalize(vector)[np.newaxis, :]
+        entry = CachedAnswer(question=question, answer=answer, tokens=tokens, expires_at=time.monotonic() + self.ttl)
+        with self._lock:
+            bucket = self._current_bucket(collection_name, version)
+            if bucket is None:
+                return
+            bucket.vectors = row if bucket.vectors is None else np.vstack([bucket.vectors, row])
+            bucket.entries.append(entry)
+            if len(bucket.entries) > self.max_entries:
+                overflow = len(bucket.entries) - self.max_entries
+                bucket.entries = bucket.entries[overflow:]
+                bucket.vectors = bucket.vectors[overflow:]
+
+    def _current_bucket(self, collection_name: str, version: int) -> Optional[_Bucket]:
+        # Caller holds the lock. A newer version means the collection was re-ingested,
+        # an older one comes from a request that still holds the previous handle.
+        bucket = self._buckets.get(collection_name)
+        if bucket is None or bucket.version < version:
+            bucket = _Bucket(version)
+            self._buckets[collection_name] = bucket
+        return bucket if bucket.version == version else None
+
+
+def _normalize(vector) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
@@ -1,145 +1,362 @@
 # /app/services/chat_service.py (or similar file)
 
-import os
 import asyncio
+import gc
+import time
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from app.helpers.util import format_docs
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+from app.helpers.lexical import LexicalIndex, index_path
+from app.helpers.util import count_tokens, format_docs
+from app.core.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_DISTANCE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    CHAT_COLLECTIONS,
+    CHROMA_PERSIST_DIR,
+    COLLECTION_BYTES_PER_VECTOR,
+    COLLECTION_CACHE_MAX_BYTES,
+    COLLECTION_CACHE_SIZE,
+    COLLECTION_VERSION_CHECK_INTERVAL,
+    DEFAULT_COLLECTION_NAME,
+    DENSE_K,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_MODEL,
+    HYBRID_RETRIEVAL_ENABLED,
+    LEXICAL_K,
+    QUERY_EMBEDDING_CACHE_DTYPE,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    RETRIEVER_K,
+    RRF_K,
+    require_api_key,
+)
+from app.core.collections import validate_collection_name
+from app.core.http import get_async_http_client, get_http_client
+from app.core.metrics import metrics
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.collection_registry import CollectionRegistry
+from app.services.embedding_batcher import EmbeddingBatcher
 from app.models.chat import Chat
 
-# --- Assume you have a Pydantic model like this ---
-# from pydantic import BaseModel
-# class Chat(BaseModel):
-#     message: str
-#     collection_name: str = "default_collection"
+# langchain_openai, langchain_community, chromadb and everything built on
+# langchain_core are imported inside the functions below: they are slow to
+# import and only needed once the lifespan warm-up runs (see app.main).
 
 # --- 1. Load Environment Variables ---
 load_dotenv()
 
-# --- 2. Configuration (Global Constants) ---
-# This ensures ChromaDB persists data to disk in the 'chroma_db_persistent' directory
-CHROMA_PERSIST_DIR = "chroma_db_persistent"
-DEFAULT_COLLECTION_NAME = "default_collection"
+# --- 2. Configuration ---
+# CHROMA_PERSIST_DIR and DEFAULT_COLLECTION_NAME come from app.core.config, shared with the worker
+
+# Template prompt yang akan digunakan oleh RAG chain
+RAG_PROMPT_TEMPLATE = """
+Gunakan potongan konteks berikut untuk menjawab pertanyaan.
+Jika Anda tidak tahu jawabannya, katakan saja Anda tidak tahu, jangan mencoba mengarang jawaban.
+
+KONTEKS:
+{context}
+
+PERTANYAAN:
+{question}
+
+JAWABAN:
+"""
 
 # --- 3. Initialize Expensive Objects ONCE at Startup ---
-# These models will be created only when the application boots up
-# and will be reused for every request, which is much more efficient.
-try:
-    embeddings_model = OpenAIEmbeddings()
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7, streaming=True)
-    
-    # Template prompt yang akan digunakan oleh RAG chain
-    RAG_PROMPT_TEMPLATE = """
-    Gunakan potongan konteks berikut untuk menjawab pertanyaan.
-    Jika Anda tidak tahu jawabannya, katakan saja Anda tidak tahu, jangan mencoba mengarang jawaban.
-
-    KONTEKS:
-    {context}
-
-    PERTANYAAN:
-    {question}
-
-    JAWABAN:
+# These models are created by `init_models()` from the FastAPI lifespan, after the
+# shared HTTP clients exist, and are reused for every request.
+rag_prompt = None
+embeddings_model = None
+embedding_batcher = None
+query_embeddings = None
+llm = None
+answer_chain = None
+
+def init_models() -> None:
+    global rag_prompt, embeddings_model, embedding_batcher, query_embeddings, llm, answer_chain
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    from app.services.query_embedding_cache import CachedQueryEmbeddings
+
+    try:
+        require_api_key()
+        rag_prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
+        # Every OpenAI call goes through the process-wide pooled HTTP clients
+        http_clients = {"http_client": get_http_client(), "http_async_client": get_async_http_client()}
+
+        embeddings_model = OpenAIEmbeddings(model=EMBEDDING_MODEL, **http_clients)
+        # Cache misses from concurrent requests are sent as one batched embeddings call
+        embedding_batcher = EmbeddingBatcher(
+            embeddings_model,
+            model_name=embeddings_model.model,
+            window=EMBEDDING_BATCH_WINDOW_MS / 1000,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+            max_tokens=EMBEDDING_BATCH_MAX_TOKENS,
+        )
+        # Users keep asking the same onboarding questions, so query embeddings are cached
+        query_embeddings = CachedQueryEmbeddings(
+            embeddings_model,
+            model_name=embeddings_model.model,
+            max_size=QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=QUERY_EMBEDDING_CACHE_TTL,
+            dtype=QUERY_EMBEDDING_CACHE_DTYPE,
+            batch_embed_query=embedding_batcher.embed_query,
+        )
+        llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7, streaming=True, **http_clients)
+
+        # Generation half of the RAG pipeline. Retrieval happens once per request in
+        # `prepare_conversation`, so the chain only needs the formatted context.
+        answer_chain = rag_prompt | llm | StrOutputParser()
+
+        print("LLM and Embeddings models initialized successfully.")
+    except Exception as e:
+        # If models fail to load (e.g., missing API key), requests get a 503.
+        print(f"FATAL: Could not initialize models: {e}")
+        llm = None
+        embeddings_model = None
+        query_embeddings = None
+        answer_chain = None
+
+# Paraphrased questions against the same collection version replay a stored answer
+answer_cache = SemanticAnswerCache(
+    max_distance=ANSWER_CACHE_MAX_DISTANCE,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl=ANSWER_CACHE_TTL,
+) if ANSWER_CACHE_ENABLED else None
+
+# --- 4. Define the Core Logic ---
+# A request goes through one pipeline: validate -> embed -> answer cache -> retrieve once -> generate.
+# Streaming and JSON mode share everything up to the generation step.
+@dataclass
+class Conversation:
+    """Validated query plus the documents retrieved for it (or a cached answer)."""
+    query: str
+    collection_name: str
+    version: int = 0
+    query_vector: list = None
+    docs: list = field(default_factory=list)
+    cached_answer: str = None
+
+    def chain_input(self) -> dict:
+        return {"context": format_docs(self.docs), "question": self.query}
+
+
+def remember_answer(conversation: Conversation, answer: str) -> None:
+    """Stores a freshly generated answer so near-duplicate questions can replay it."""
+    if not answer_cache or conversation.cached_answer is not None or not answer:
+        return
+    prompt = rag_prompt.format(**conversation.chain_input())
+    answer_cache.store(
+        conversation.collection_name,
+        conversation.version,
+        conversation.query_vector,
+        question=conversation.query,
+        answer=answer,
+        tokens=count_tokens(prompt) + count_tokens(answer),
+    )
+
+
+def validate_request(request: Chat) -> str:
     """
-    rag_prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
-    
-    print("LLM and Embeddings models initialized successfully.")
-except Exception as e:
-    # If models fail to load (e.g., missing API key), the app shouldn't start.
-    print(f"FATAL: Could not initialize models: {e}")
-    llm = None
-    embeddings_model = None
-
-# --- 4. Define the Core Logic Function ---
-# The function now uses the globally initialized models.
-def run_conversation(request: Chat): # Assuming request_body is a dict like {"message": "...", "collection_name": "..."}
-  """
-  Handles the chat logic by connecting to the persistent vector store
-  and using a QA chain to answer questions.
-  """
-  if not llm or not embeddings_model:
-      raise HTTPException(
-          status_code=503, # Service Unavailable
-          detail="Models are not available. Please check server logs."
-      )
-  
-  query = request.message
-  collection_name = DEFAULT_COLLECTION_NAME
-
-  if not query:
-      raise HTTPException(status_code=400, detail="The 'message' field is required.")
-
-  try:
-      # 1. CONNECT to the existing persistent vector store
-      vectorstore = Chroma(
-          persist_directory=CHROMA_PERSIST_DIR,
-          embedding_function=embeddings_model,
-          collection_name=collection_name
-      )
-      # 2. CREATE the retriever and QA chain
-      retriever = vectorstore.as_retriever()
-      qa_chain = RetrievalQA.from_chain_type(
-          llm=llm,
-          chain_type="stuff",
-          retriever=retriever,
-          return_source_documents=True # Optional: useful for debugging
-      )
-
-      # 3. RUN the query using the modern .invoke() method
-      # .invoke() is more flexible and part of the standard LCEL interface
-      result = qa_chain.invoke({"query": query})
-      # The result is a dictionary, e.g., {"query": "...", "result": "...", "source_documents": [...]}
-
-      return result['result']
-  
-  except Exception as e:
-      # This can happen if the collection doesn't exist or other runtime errors.
-      # It's good practice to log the actual error for debugging.
-      print(f"An error occurred during conversation: {e}")
-      raise HTTPException(status_code=500, detail=f"An error occurred while processing your request. It's possible the data source '{collection_name}' has not been processed yet.")
-    
-async def stream_conversation_generator(request: Chat):
+    Rejects bad requests before any retrieval or streaming starts, so the
+    client gets a proper HTTP status instead of an error inside the stream.
+    """
+    if not llm or not embeddings_model:
+        raise HTTPException(
+            status_code=503, # Service Unavailable
+            detail="Models are not available. Please check server logs."
+        )
+
+    query = (request.message or "").strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="The 'message' field is required.")
+
+    return query
+
+
+def validate_collection(request: Chat) -> str:
+    """The logical collection a request asks for, defaulting to DEFAULT_COLLECTION_NAME."""
+    collection_name = request.collection_name or DEFAULT_COLLECTION_NAME
+    try:
+        validate_collection_name(collection_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if CHAT_COLLECTIONS and collection_name not in CHAT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown collection '{collection_name}'.")
+    return collection_name
+
+
+def open_vectorstore(collection_name: str):
     """
-    Generator asinkron yang menangani logika RAG dan streaming.
-    Ini adalah pengganti modern untuk fungsi 'run_conversation' Anda.
+    CONNECT to an existing persistent collection. Raises LookupError instead of
+    creating an empty one, so a mistyped name cannot fill the disk or the pool.
     """
-    query = request.message
-    collection_name = DEFAULT_COLLECTION_NAME
+    import chromadb
+    from langchain_community.vectorstores import Chroma
 
+    client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
     try:
-        # 1. SETUP RETRIEVER (sama seperti sebelumnya)
-        vectorstore = Chroma(
-            persist_directory=CHROMA_PERSIST_DIR,
-            embedding_function=embeddings_model,
-            collection_name=collection_name,
-        )
-        retriever = vectorstore.as_retriever()
-
-        # 2. MEMBUAT RAG CHAIN DENGAN LCEL
-        # Ini adalah bagian inti dari refaktor.
-        # Menggantikan `RetrievalQA.from_chain_type`
-        rag_chain = (
-            # RunnableParallel untuk mengambil konteks dan pertanyaan secara bersamaan
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | rag_prompt
-            | llm
-            | StrOutputParser()
-        )
+        client.get_collection(collection_name)
+    except Exception as e:
+        raise LookupError(f"Collection '{collection_name}' does not exist: {e}")
+    return Chroma(client=client, embedding_function=query_embeddings, collection_name=collection_name)
+
+
+def release_chroma_storage() -> None:
+    """
+    Drops the Chroma System shared by all clients of CHROMA_PERSIST_DIR. It
+    keeps every collection segment it ever opened in memory, and only frees
+    them once the System itself is collected (it is full of reference cycles,
+    hence the gc.collect()). Handles still serving a request keep the old
+    System alive until they finish; the next `open_vectorstore` starts a new one.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    SharedSystemClient._identifier_to_system.pop(CHROMA_PERSIST_DIR, None)
+    gc.collect()
+
+
+def estimate_collection_bytes(vectorstore) -> int:
+    return vectorstore._collection.count() * COLLECTION_BYTES_PER_VECTOR
+
+
+def make_retriever(collection_name: str, physical_name: str, vectorstore):
+    """Hybrid BM25 + dense retriever over the collection and its memory-mapped lexical index."""
+    if not HYBRID_RETRIEVAL_ENABLED:
+        return vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
+    from app.services.hybrid_retriever import HybridRetriever
+
+    lexical_index = LexicalIndex.open(index_path(CHROMA_PERSIST_DIR, physical_name))
+    if lexical_index is None:
+        print(f"No lexical index for '{physical_name}' yet, using dense retrieval only.")
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        lexical_index=lexical_index,
+        collection_name=collection_name,
+        k=RETRIEVER_K,
+        dense_k=DENSE_K,
+        lexical_k=LEXICAL_K,
+        rrf_k=RRF_K,
+    )
+
+
+# Open collections are reused across requests instead of reconnecting every time
+collection_registry = CollectionRegistry(
+    open_vectorstore,
+    max_size=COLLECTION_CACHE_SIZE,
+    check_interval=COLLECTION_VERSION_CHECK_INTERVAL,
+    max_bytes=COLLECTION_CACHE_MAX_BYTES,
+    estimate_bytes=estimate_collection_bytes,
+    make_retriever=make_retriever,
+    release_storage=release_chroma_storage,
+)
+
+
+async def warm_up() -> None:
+    """Opens the default collection and loads the tokenizer before the first request."""
+    if not embeddings_model:
+        raise RuntimeError("Models are not initialized.")
+    try:
+        await asyncio.to_thread(collection_registry.get, DEFAULT_COLLECTION_NAME)
+    except LookupError as e:
+        print(f"Default collection not opened during warm-up: {e}")
+    count_tokens("warm-up")
+
+
+async def prepare_conversation(request: Chat) -> Conversation:
+    """
+    Validates the request and runs retrieval exactly once.
+    Looking up the handle may open Chroma (SQLite + HNSW), so it runs off the event loop.
+    """
+    query = validate_request(request)
+    collection_name = validate_collection(request)
+    started = time.perf_counter()
+
+    try:
+        handle = await asyncio.to_thread(collection_registry.get, collection_name)
+        conversation = Conversation(query=query, collection_name=collection_name, version=handle.version)
+        conversation.query_vector = await query_embeddings.aembed_query(query)
 
-        # 3. STREAMING HASIL MENGGUNAKAN .astream()
-        async for chunk in rag_chain.astream(query):
-            # Format sebagai Server-Sent Event (SSE) untuk kemudahan di frontend
-            # formatted_chunk = chunk.replace('\n', '<br>')
-            yield f"{chunk}"
-            await asyncio.sleep(0.02) # Jeda kecil untuk kelancaran stream
+        if answer_cache:
+            cached = answer_cache.lookup(collection_name, handle.version, conversation.query_vector)
+            if cached:
+                conversation.cached_answer = cached.answer
+                metrics.observe(f"collection.{collection_name}.prepare_seconds", time.perf_counter() - started)
+                return conversation
 
+        # The retriever embeds the query again, which is now a local cache hit
+        retrieval_started = time.perf_counter()
+        conversation.docs = await handle.retriever.ainvoke(query)
+        metrics.observe(f"collection.{collection_name}.retrieval_seconds", time.perf_counter() - retrieval_started)
+    except LookupError:
+        raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' has not been processed yet.")
     except Exception as e:
-        print(f"Error during RAG stream: {e}")
-        yield f"data: [ERROR] Terjadi kesalahan: {e}\n\n"
+        # This can happen if the collection doesn't exist or other runtime errors.
+        print(f"An error occurred during retrieval: {e}")
+        raise HTTPException(status_code=500, detail=f"An error occurred while processing your request. It's possible the data source '{collection_name}' has not been processed yet.")
+
+    metrics.observe(f"collection.{collection_name}.prepare_seconds", time.perf_counter() - started)
+    return conversation
+
+
+async def run_conversation(conversation: Conversation) -> str:
+    """
+    Non-streaming mode: same retrieval result and the same chain as the
+    stream, just collected into a single string.
+    """
+    if conversation.cached_answer is not None:
+        return conversation.cached_answer
+
+    started = time.perf_counter()
+    try:
+        answer = await answer_chain.ainvoke(conversation.chain_input())
+    except Exception as e:
+        print(f"An error occurred during conversation: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while generating the answer.")
+    metrics.observe(f"collection.{conversation.collection_name}.generation_seconds", time.perf_counter() - started)
+
+    remember_answer(conversation, answer)
+    return answer
+
+
+async def stream_conversation_generator(conversation: Conversation):
+    """
+    Generator asinkron yang men-stream potongan teks jawaban LLM.
+    Framing SSE dan penggabungan token dilakukan oleh `app.helpers.sse.event_stream`.
+    """
+    # Jawaban dari cache diputar ulang lewat stream yang sama
+    if conversation.cached_answer is not None:
+        yield conversation.cached_answer
+        return
+
+    # STREAMING HASIL MENGGUNAKAN .astream()
+    chunks = []
+    started = time.perf_counter()
+    try:
+        async for chunk in answer_chain.astream(conversation.chain_input()):
+            chunks.append(chunk)
+            yield chunk
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client went away: the OpenAI stream is closed together with this generator
+        log_abandoned_stream(conversation, "".join(chunks))
+        raise
+
+    answer = "".join(chunks)
+    metrics.observe(f"collection.{conversation.collection_name}.generation_seconds", time.perf_counter() - started)
+    metrics.observe("chat.completion_tokens", count_tokens(answer))
+    remember_answer(conversation, answer)
+
+
+def log_abandoned_stream(conversation: Conversation, partial_answer: str) -> None:
+    # The remaining length is unknown, so estimate it from the average finished answer
+    emitted = count_tokens(partial_answer)
+    saved = max(round(metrics.average("chat.completion_tokens")) - emitted, 0)
+    metrics.incr("chat.abandoned_streams")
+    metrics.incr("chat.abandoned_tokens_saved", saved)
+    print(f"Stream abandoned by client after {emitted} tokens, ~{saved} completion tokens saved. Query: {conversation.query[:80]!r}")
@@ -7,24 +7,24 @@ from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.chains import RetrievalQA
 from app.models.chat import Chat
+from app.core.collections import resolve_collection
+from app.core.config import CHROMA_PERSIST_DIR, DEFAULT_COLLECTION_NAME
+from app.core.http import get_async_http_client, get_http_client
 
 load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
 
-# --- Configuration - MUST MATCH THE WORKER ---
-CHROMA_PERSIST_DIR = "chroma_db_persistent"
-# We'll use a default collection name for this example
-DEFAULT_COLLECTION_NAME = "default_collection"
-
 def run_conversation(request: Chat):
   # --- Initialize models once to be reused across requests ---
-  embeddings = OpenAIEmbeddings()
+  embeddings = OpenAIEmbeddings(http_client=get_http_client(), http_async_client=get_async_http_client())
 
   llm = ChatOpenAI(
     model_name="gpt-4.1-mini",
     temperature=0.7,
-    openai_api_key=api_key
+    openai_api_key=api_key,
+    http_client=get_http_client(),
+    http_async_client=get_async_http_client()
   )
   # response = langchain_directory(message)
   
@@ -37,7 +37,7 @@ def run_conversation(request: Chat):
       vectorstore = Chroma(
           persist_directory=CHROMA_PERSIST_DIR,
           embedding_function=embeddings,
-          collection_name=request.collection_name
+          collection_name=resolve_collection(request.collection_name or DEFAULT_COLLECTION_NAME)
       )
 
       # 2. CREATE the retriever and QA chain
@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+from redis import RedisError
+
+from app.core.collections import get_collection_state
+from app.core.metrics import metrics
+
+
+@dataclass
+class CollectionHandle:
+    """An opened Chroma collection together with its compiled retriever."""
+    name: str
+    version: int
+    # Versioned collection the logical name pointed at when opened
+    physical_name: str
+    vectorstore: Any
+    retriever: Any
+    checked_at: float
+    # Estimated memory of the collection once its index is loaded
+    bytes: int = 0
+
+
+@dataclass
+class _OpenLock:
+    """Held while one collection is being opened; dropped once nobody waits on it."""
+    lock: threading.Lock
+    users: int = 0
+
+
+class CollectionRegistry:
+    """
+    Process-wide cache of open collections, bounded by count (`max_size`) and
+    by estimated memory (`max_bytes`); least recently used handles go first.
+
+    Opening a persisted Chroma collection reloads the SQLite metadata and the
+    HNSW segment, so handles are kept across requests. A handle is reopened
+    when the worker publishes a newer collection version, following the
+    logical name to whichever physical collection it points at by then.
+
+    Closing a handle does not free the segment: the Chroma client keeps every
+    collection it has opened. Once the collections opened through the current
+    client exceed `max_bytes`, `release_storage` drops that client and all
+    handles; collections still in use are reopened on a fresh client.
+    """
+
+    def __init__(
+        self,
+        open_vectorstore: Callable[[str], Any],
+        max_size: int,
+        check_interval: float,
+        max_bytes: int = 0,
+        estimate_bytes: Callable[[Any], int] = None,
+        make_retriever: Callable[[str, str, Any], Any] = None,
+        release_storage: Callable[[], None] = None,
+    ):
+        self._open_vectorstore = open_vectorstore
+        self._max_size = max(1, max_size)
+        self._check_interval = check_interval
+        self._max_bytes = max_bytes
+        self._estimate_bytes = estimate_bytes
+        # (logical name, physical name, vectorstore) -> retriever
+        self._make_retriever = make_retriever or (lambda name, physical_name, vectorstore: vectorstore.as_retriever())
+        self._release_storage = release_storage
+        self._handles: "OrderedDict[str, CollectionHandle]" = OrderedDict()
+        # Physical collections opened through the current storage client -> estimated bytes
+        self._resident: Dict[str, int] = {}
+        self._storage_generation = 0
+        self._lock = threading.Lock()
+        # Collection name -> lock held while it is being opened. Names come from
+        # requests, so an entry only lives while some request is opening that name
+        self._open_locks: Dict[str, _OpenLock] = {}
+
+    def get(self, collection_name: str) -> CollectionHandle:
+        """Blocking: may open a collection, call it from a worker thread."""
+        now = time.monotonic()
+        with self._lock:
+            handle = self._handles.get(collection_name)
+            if handle and now - handle.checked_at < self._check_interval:
+                self._handles.move_to_end(collection_name)
+                return handle
+
+        version, physical_name = self._current_state(collection_name, handle)
+
+        with self._lock:
+            handle = self._current_handle(collection_name, version, physical_name, now)
+            if handle:
+                return handle
+            open_lock = self._open_locks.setdefault(collection_name, _OpenLock(threading.Lock()))
+            open_lock.users += 1
+
+        # Opening loads SQLite metadata and the HNSW index, so it happens outside the
+        # registry lock: only requests for this same collection wait for it
+        try:
+            with open_lock.lock:
+                return self._open(collection_name, version, physical_name, now)
+        finally:
+            with self._lock:
+                open_lock.users -= 1
+                if not open_lock.users:
+                    del self._open_locks[collection_name]
+
+    def _open(self, collection_name: str, version: int, physical_name: str, now: float) -> CollectionHandle:
+        """Opens `physical_name` unless another request just did; call with its open lock held."""
+        with self._lock:
+            handle = self._current_handle(collection_name, version, physical_name, now)
+            if handle:
+                return handle
+            previous = self._handles.get(collection_name)
+            release = self._storage_over_budget()
+            if release:
+                self._handles.clear()
+                self._resident.clear()
+                self._storage_generation += 1
+            generation = self._storage_generation
+
+        if release:
+            started = time.perf_counter()
+            self._release_storage()
+            metrics.incr("collections.storage_releases")
+            print(f"Released collection storage ({release // 2 ** 20} MiB resident) in {time.perf_counter() - started:.2f}s.")
+        if previous:
+            print(
+                f"Collection '{collection_name}' changed (v{previous.version} -> v{version}),"
+                f" reopening as '{physical_name}'."
+            )
+        started = time.perf_counter()
+        vectorstore = self._open_vectorstore(physical_name)
+        handle = CollectionHandle(
+            name=collection_name,
+            version=version,
+            physical_name=physical_name,
+            vectorstore=vectorstore,
+            retriever=self._make_retriever(collection_name, physical_name, vectorstore),
+            checked_at=now,
+            bytes=self._estimate_bytes(vectorstore) if self._estimate_bytes else 0,
+        )
+        metrics.observe(f"collection.{collection_name}.open_seconds", time.perf_counter() - started)
+
+        with self._lock:
+            if generation != self._storage_generation:
+                # Opened on a storage client released meanwhile; serve it once, do not keep it
+                return handle
+            self._resident[physical_name] = handle.bytes
+            self._handles[collection_name] = handle
+            self._handles.move_to_end(collection_name)
+            self._evict()
+        return handle
+
+    def _storage_over_budget(self) -> int:
+        """
+        Resident bytes if closed collections push the storage client over
+        `max_bytes` (so releasing it frees memory), else 0. Lock held.
+        """
+        if not self._release_storage or not self._max_bytes:
+            return 0
+        resident = sum(self._resident.values())
+        open_names = {handle.physical_name for handle in self._handles.values()}
+        closed = resident - sum(size for name, size in self._resident.items() if name in open_names)
+        return resident if closed and resident > self._max_bytes else 0
+
+    def _current_handle(self, collection_name: str, version: int, physical_name: str, now: float):
+        """The open handle if it is still at `version`; call with the lock held."""
+        handle = self._handles.get(collection_name)
+        if handle and handle.version == version and handle.physical_name == physical_name:
+            handle.checked_at = now
+            self._handles.move_to_end(collection_name)
+            return handle
+        return None
+
+    def _evict(self) -> None:
+        """Closes least recently used handles until both limits hold; the newest always stays."""
+        total = sum(handle.bytes for handle in self._handles.values())
+        while len(self._handles) > 1 and (
+            len(self._handles) > self._max_size or (self._max_bytes and total > self._max_bytes)
+        ):
+            evicted, handle = self._handles.popitem(last=False)
+            total -= handle.bytes
+            metrics.incr("collections.evictions")
+            print(f"Closing least recently used collection '{evicted}' (~{handle.bytes // 2 ** 20} MiB).")
+        metrics.set("collections.open", len(self._handles))
+        metrics.set("collections.bytes", total)
+        metrics.set("collections.resident_bytes", sum(self._resident.values()))
+
+    def stats(self) -> list:
+        """Open handles, most recently used first, with their latency summaries."""
+        with self._lock:
+            handles = list(reversed(self._handles.values()))
+        summaries = metrics.snapshot()["summaries"]
+        return [
+            {
+                "name": handle.name,
+                "physical_name": handle.physical_name,
+                "version": handle.version,
+                "bytes": handle.bytes,
+                "latency": {
+                    name[len(f"collection.{handle.name}."):]: summary
+                    for name, summary in summaries.items()
+                    if name.startswith(f"collection.{handle.name}.")
+                },
+            }
+            for handle in handles
+        ]
+
+    def invalidate(self, collection_name: str) -> None:
+        with self._lock:
+            self._handles.pop(collection_name, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._handles.clear()
+
+    def _current_state(self, collection_name: str, handle: CollectionHandle = None) -> tuple:
+        try:
+            return get_collection_state(collection_name)
+        except RedisError as e:
+            # Keep serving from the handle we have rather than failing the request
+            print(f"Could not read version of collection '{collection_name}': {e}")
+            return (handle.version, handle.physical_name) if handle else (0, collection_name)
@@ -0,0 +1,85 @@
+import asyncio
+from typing import TYPE_CHECKING, List, Set
+
+from app.core.metrics import metrics
+from app.helpers.util import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+
+class _PendingQuery:
+    def __init__(self, text: str, tokens: int, future: asyncio.Future):
+        self.text = text
+        self.tokens = tokens
+        self.future = future
+
+
+class EmbeddingBatcher:
+    """
+    Collects `embed_query` calls that arrive within `window` seconds and sends
+    them to the embeddings API as one batched request, then fans the vectors
+    back out to the waiting coroutines.
+
+    A batch is sent early when it reaches `max_batch_size` texts or when the
+    next query would push it over `max_tokens`.
+    """
+
+    def __init__(self, embeddings: "Embeddings", model_name: str, window: float, max_batch_size: int, max_tokens: int):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.window = window
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_tokens = max_tokens
+        self._batch: List[_PendingQuery] = []
+        self._batch_tokens = 0
+        self._timer = None
+        # The event loop only keeps weak references to tasks; in-flight batches live here
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def embed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        tokens = count_tokens(text, self.model_name)
+        if self._batch and self._batch_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        pending = _PendingQuery(text, tokens, loop.create_future())
+        self._batch.append(pending)
+        self._batch_tokens += tokens
+
+        if len(self._batch) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await pending.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._batch, self._batch_tokens = self._batch, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[_PendingQuery]) -> None:
+        # Identical questions in the same window share one input
+        texts = list(dict.fromkeys(p.text for p in batch))
+        metrics.incr("embedding_batcher.requests")
+        metrics.incr("embedding_batcher.queries", len(batch))
+        metrics.observe("embedding_batcher.batch_size", len(batch))
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for p in batch:
+            # A waiter that was cancelled (client gone) no longer wants the result
+            if not p.future.done():
+                p.future.set_result(by_text[p.text])
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Any, List
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.core.metrics import metrics
+
+
+def _fusion_key(document: Document):
+    # Chunks written by the ingestion pipeline are identified by file + position;
+    # older chunks only by their text
+    metadata = document.metadata or {}
+    if "chunk_index" in metadata:
+        return metadata.get("source"), metadata["chunk_index"]
+    return document.page_content
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int) -> List[Document]:
+    """Merges ranked lists by summing 1 / (rrf_k + rank); a document found by both lists rises to the top."""
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _fusion_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense search in Chroma and BM25 search in the collection's lexical index
+    (see `app.helpers.lexical`), run concurrently and fused with reciprocal
+    rank fusion. Exact tokens such as form names and codes ("DEEP46") are
+    found lexically even when their embedding is not close to the query's.
+
+    Without a lexical index (a collection not rebuilt yet) it is a plain
+    dense retriever.
+    """
+
+    vectorstore: Any
+    lexical_index: Any = None
+    collection_name: str = ""
+    k: int = 4
+    dense_k: int = 4
+    lexical_k: int = 8
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.vectorstore.similarity_search(query, k=self.dense_k)
+        return reciprocal_rank_fusion([dense, self._lexical_search(query)], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        dense, lexical = await asyncio.gather(
+            self.vectorstore.asimilarity_search(query, k=self.dense_k),
+            asyncio.to_thread(self._lexical_search, query),
+        )
+        return reciprocal_rank_fusion([dense, lexical], self.k, self.rrf_k)
+
+    def _lexical_search(self, query: str) -> List[Document]:
+        if self.lexical_index is None:
+            return []
+        started = time.perf_counter()
+        hits = self.lexical_index.search(query, self.lexical_k)
+        metrics.observe(f"collection.{self.collection_name}.lexical_seconds", time.perf_counter() - started)
+        if not hits:
+            return []
+
+        # The index only stores chunk IDs; texts and metadata come from Chroma
+        ids = [id_ for id_, _ in hits]
+        found = self.vectorstore._collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            id_: Document(page_content=text or "", metadata=metadata or {})
+            for id_, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [by_id[id_] for id_ in ids if id_ in by_id]
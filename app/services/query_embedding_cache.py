@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from redis import RedisError
+
+from app.core.metrics import metrics
+from app.core.redis_client import get_async_redis, get_redis
+from app.helpers.util import decode_vector, encode_vector
+
+REDIS_KEY_PREFIX = "onbi:query_embedding:"
+
+
+def normalize_query(text: str) -> str:
+    """Case and whitespace differences should not produce separate cache entries."""
+    return " ".join(text.lower().split())
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model and caches `embed_query` results in two tiers:
+    an in-process LRU (tier one) and Redis shared by all processes (tier two).
+    A hit in either tier skips the embedding API call entirely.
+
+    Document embedding is passed through untouched; that is the worker's job.
+
+    Async misses go through `batch_embed_query` when given, so concurrent
+    misses share one embeddings request.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_size: int,
+        ttl: int,
+        dtype: str = "float32",
+        batch_embed_query: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+    ):
+        self.embeddings = embeddings
+        self.batch_embed_query = batch_embed_query or embeddings.aembed_query
+        self.model_name = model_name
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.dtype = dtype
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"{digest}:{self.dtype}"
+
+    # --- Embeddings interface ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+
+        try:
+            data = get_redis().get(REDIS_KEY_PREFIX + key)
+        except RedisError as e:
+            print(f"Query embedding cache: Redis unavailable: {e}")
+            data = None
+        if data is not None:
+            metrics.incr("query_embedding_cache.hits_redis")
+            self._put_local(key, data)
+            return decode_vector(data, self.dtype)
+
+        metrics.incr("query_embedding_cache.misses")
+        vector = self.embeddings.embed_query(text)
+        data = encode_vector(vector, self.dtype)
+        self._put_local(key, data)
+        try:
+            get_redis().set(REDIS_KEY_PREFIX + key, data, ex=self.ttl)
+        except RedisError as e:
+            print(f"Query embedding cache: could not store entry: {e}")
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+
+        try:
+            data = await get_async_redis().get(REDIS_KEY_PREFIX + key)
+        except RedisError as e:
+            print(f"Query embedding cache: Redis unavailable: {e}")
+            data = None
+        if data is not None:
+            metrics.incr("query_embedding_cache.hits_redis")
+            self._put_local(key, data)
+            return decode_vector(data, self.dtype)
+
+        metrics.incr("query_embedding_cache.misses")
+        vector = await self.batch_embed_query(text)
+        data = encode_vector(vector, self.dtype)
+        self._put_local(key, data)
+        try:
+            await get_async_redis().set(REDIS_KEY_PREFIX + key, data, ex=self.ttl)
+        except RedisError as e:
+            print(f"Query embedding cache: could not store entry: {e}")
+        return vector
+
+    # --- Tier one: in-process LRU with TTL ---
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        metrics.incr("query_embedding_cache.hits_local")
+        return decode_vector(data, self.dtype)
+
+    def _put_local(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, data)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+            metrics.set("query_embedding_cache.local_size", len(self._local))
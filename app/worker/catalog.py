@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import time
+from typing import List, Tuple
+
+from app.core.config import INGEST_STATE_DIR
+
+CATALOG_PATH = os.path.join(INGEST_STATE_DIR, "collections.sqlite3")
+
+
+class CollectionCatalog:
+    """
+    Versioned physical collections behind each logical collection name.
+
+    A full reindex builds `<name>__v<N>` next to the live collection; once it
+    is complete the logical name is swapped to it (see
+    `app.core.collections.swap_collection_alias`) and the previous version is
+    retired. Retired versions are deleted after a grace period, so API
+    processes still reading them can finish and follow the swap.
+    """
+
+    def __init__(self, db_path: str = CATALOG_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_versions (
+                    physical TEXT PRIMARY KEY,
+                    logical TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    retired_at REAL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def create(self, logical: str) -> str:
+        """Registers the next version of `logical` as building and returns its physical name."""
+        with self._connect() as conn:
+            latest = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM collection_versions WHERE logical = ?", (logical,)
+            ).fetchone()[0]
+            version = latest + 1
+            physical = f"{logical}__v{version}"
+            conn.execute(
+                "INSERT INTO collection_versions VALUES (?, ?, ?, 'building', ?, NULL)",
+                (physical, logical, version, time.time()),
+            )
+        return physical
+
+    def activate(self, logical: str, physical: str, previous: str) -> None:
+        """Records the swap from `previous` (retired from now on) to `physical`."""
+        now = time.time()
+        with self._connect() as conn:
+            # The collection in use before versioning existed has no row yet
+            conn.execute(
+                "INSERT OR IGNORE INTO collection_versions VALUES (?, ?, 0, 'active', ?, NULL)",
+                (previous, logical, now),
+            )
+            conn.execute(
+                "UPDATE collection_versions SET status = 'retired', retired_at = ? WHERE physical = ? AND physical != ?",
+                (now, previous, physical),
+            )
+            conn.execute("UPDATE collection_versions SET status = 'active' WHERE physical = ?", (physical,))
+
+    def abandon(self, physical: str) -> None:
+        """A version that will not be swapped in; it is garbage-collected like a retired one."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE collection_versions SET status = 'retired', retired_at = ? WHERE physical = ?",
+                (time.time(), physical),
+            )
+
+    def retired(self, grace_seconds: float) -> List[Tuple[str, str]]:
+        """(logical, physical) of versions retired more than `grace_seconds` ago."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT logical, physical FROM collection_versions WHERE status = 'retired' AND retired_at < ?",
+                (time.time() - grace_seconds,),
+            ).fetchall()
+
+    def mark_deleted(self, physical: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE collection_versions SET status = 'deleted' WHERE physical = ?", (physical,))
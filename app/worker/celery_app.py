@@ -1,4 +1,5 @@
 from celery import Celery
+from app.core.config import CHROMA_WRITE_QUEUE, REDIS_URL
 
 # Configure the Celery app
 # The first argument is the name of the current module.
@@ -6,15 +7,41 @@ from celery import Celery
 # The `backend` argument specifies the URL of the result backend (also Redis).
 celery_app = Celery(
   "worker",
-  broker="redis://localhost:6379/0",
-  backend="redis://localhost:6379/0",
+  broker=REDIS_URL,
+  backend=REDIS_URL,
+)
+
+# Chroma's PersistentClient is not safe with several processes writing to the
+# same directory, and the API only reads its own local CHROMA_PERSIST_DIR. So
+# every task that opens a collection for writing (planning, which deletes
+# removed files, per-file writes and commits, the finalize callback, GC) goes
+# to CHROMA_WRITE_QUEUE, consumed by ONE worker process on the API host:
+#
+#   celery -A app.worker.celery_app worker -Q chroma_writes --concurrency 1
+#
+# That queue is FIFO with a single consumer, so the writes a file sends run
+# before its commit and every commit before the run's finalize. Parsing,
+# chunking and embedding (`ingest_file`) stay on the default queue, which any
+# number of workers on any node may consume:
+#
+#   celery -A app.worker.celery_app worker -Q celery --concurrency 8
+WRITER_TASKS = (
+    "process_directory",
+    "ingest_paths",
+    "reindex_directory",
+    "rebuild_collection",
+    "write_chunks",
+    "commit_file",
+    "finalize_ingestion",
+    "gc_collections",
 )
 
 # Optional configuration
 celery_app.conf.update(
     task_track_started=True,
+    task_routes={f"app.worker.tasks.{name}": {"queue": CHROMA_WRITE_QUEUE} for name in WRITER_TASKS},
 )
 
 # It's good practice to have the task definitions in a separate file (tasks.py)
 # This line tells Celery to look for tasks in the 'worker.tasks' module.
-celery_app.autodiscover_tasks(['worker.tasks'])
\ No newline at end of file
+celery_app.autodiscover_tasks(['worker.tasks'])
@@ -0,0 +1,151 @@
+import re
+from typing import Iterable, Iterator, List
+
+from langchain_core.documents import Document
+
+from app.helpers.util import count_tokens, get_encoder
+
+# Metadata that identifies one loaded unit (a file, or a page of a PDF)
+_UNIT_KEYS = ("source", "page_number")
+
+_BLANK_LINE = re.compile(r"\n\s*\n")
+
+
+def _unit(document: Document) -> dict:
+    return {key: document.metadata[key] for key in _UNIT_KEYS if key in document.metadata}
+
+
+def merge_elements(documents: Iterable[Document]) -> Iterator[Document]:
+    """
+    Joins consecutive element Documents of the same file (or PDF page) back
+    into one Document, the way the loaders produced them before they emitted
+    elements. Lazy: a unit is yielded as soon as the next one starts.
+    """
+    unit, texts = None, []
+    for document in documents:
+        if unit is not None and _unit(document) != unit:
+            yield Document(page_content="\n\n".join(texts), metadata=unit)
+            texts = []
+        unit = _unit(document)
+        texts.append(document.page_content)
+    if texts:
+        yield Document(page_content="\n\n".join(texts), metadata=unit)
+
+
+class CharacterChunker:
+    """The original splitter: fixed-size character chunks with a fixed overlap."""
+
+    name = "character"
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for document in merge_elements(documents):
+            yield from self.splitter.split_documents([document])
+
+
+class StructureChunker:
+    """
+    Packs whole elements (headings, list items, paragraphs, table rows) into
+    chunks of at most `max_tokens` tiktoken tokens.
+
+    A chunk never spans two sections, files or PDF pages: every heading starts
+    a new chunk and the heading path is kept as `section` metadata. Elements
+    are never cut, except a single element longer than `max_tokens`, which is
+    split into token windows overlapping by `overlap_tokens`. No other text is
+    repeated between chunks, so nothing is embedded twice. A heading always
+    stays with the element after it, even if that goes over `max_tokens`.
+
+    Documents without element categories (PDF pages, unstructured output) are
+    broken into paragraphs at blank lines, and into lines if still too long.
+    """
+
+    name = "structure"
+
+    def __init__(self, max_tokens: int, overlap_tokens: int, model: str):
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.model = model
+
+    def split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        headings: List[tuple] = []  # (level, text) of the current section path
+        unit = None
+        texts: List[str] = []
+        tokens = 0
+        has_body = False
+
+        def flush():
+            # A chunk holding nothing but headings is dropped; the path is in `section`
+            nonlocal texts, tokens, has_body
+            if has_body:
+                yield self._chunk("\n\n".join(texts), unit, headings, tokens)
+            texts, tokens, has_body = [], 0, False
+
+        for document in documents:
+            if _unit(document) != unit:
+                yield from flush()
+                if unit is None or document.metadata.get("source") != unit.get("source"):
+                    headings = []
+                unit = _unit(document)
+
+            category = document.metadata.get("category")
+            if category == "Title":
+                yield from flush()
+                level = document.metadata.get("heading_level", 1)
+                headings = [heading for heading in headings if heading[0] < level]
+                headings.append((level, document.page_content))
+                blocks = [document.page_content]
+            elif category:
+                blocks = [document.page_content]
+            else:
+                blocks = [block.strip() for block in _BLANK_LINE.split(document.page_content) if block.strip()]
+
+            for block in blocks:
+                for piece, piece_tokens in self._fit(block):
+                    if has_body and tokens + piece_tokens > self.max_tokens:
+                        yield from flush()
+                    texts.append(piece)
+                    tokens += piece_tokens
+                    has_body = has_body or category != "Title"
+        yield from flush()
+
+    def _fit(self, block: str) -> Iterator[tuple]:
+        """Yields (text, tokens) pieces of a block, none longer than `max_tokens`."""
+        block_tokens = count_tokens(block, self.model)
+        if block_tokens <= self.max_tokens:
+            yield block, block_tokens
+            return
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if len(lines) > 1:
+            for line in lines:
+                yield from self._fit(line)
+            return
+
+        encoder = get_encoder(self.model)
+        ids = encoder.encode(block, disallowed_special=())
+        step = self.max_tokens - self.overlap_tokens
+        for start in range(0, len(ids), step):
+            window = ids[start:start + self.max_tokens]
+            yield encoder.decode(window), len(window)
+            if start + self.max_tokens >= len(ids):
+                break
+
+    def _chunk(self, text: str, unit: dict, headings: List[tuple], tokens: int) -> Document:
+        metadata = dict(unit or {})
+        metadata["section"] = " > ".join(heading for _, heading in headings)
+        metadata["tokens"] = tokens
+        return Document(page_content=text, metadata=metadata)
+
+
+CHUNKERS = ("character", "structure")
+
+
+def get_chunker(mode: str, max_tokens: int, overlap_tokens: int, model: str):
+    if mode == "character":
+        return CharacterChunker()
+    if mode == "structure":
+        return StructureChunker(max_tokens, overlap_tokens, model)
+    raise ValueError(f"Unknown chunker '{mode}', expected one of {CHUNKERS}")
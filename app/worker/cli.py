@@ -0,0 +1,161 @@
+"""
+Maintenance commands for ingested collections.
+
+    python -m app.worker.cli dedupe <collection_name>
+    python -m app.worker.cli benchmark-loaders <directory>
+    python -m app.worker.cli compare-chunkers <directory>
+    python -m app.worker.cli rebuild <collection_name>
+    python -m app.worker.cli gc-collections
+    python -m app.worker.cli build-lexical-index <collection_name>
+"""
+import argparse
+import json
+import os
+import time
+
+from app.core.collections import bump_collection_version, resolve_collection
+from app.core.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL
+from app.helpers.util import count_tokens
+from app.worker.chunking import CharacterChunker, StructureChunker
+from app.worker.loaders import get_loader, load_file, load_unstructured
+from app.worker.manifest import Manifest, scan_directory
+from app.worker.progress import get_ingestion_status
+from app.worker.tasks import build_lexical_index, gc_collections, open_vectorstore, rebuild_collection
+from app.worker.vectorstore import dedupe_collection
+
+
+def dedupe(args) -> None:
+    physical_name = resolve_collection(args.collection_name)
+    vectorstore = open_vectorstore(physical_name)
+    keep_ids = {
+        chunk_id
+        for record in Manifest().records(physical_name).values()
+        for chunk_id in record.chunk_ids
+    }
+    removed = dedupe_collection(vectorstore, keep_ids)
+    if removed:
+        build_lexical_index(physical_name)
+        bump_collection_version(args.collection_name)
+    print(f"Removed {removed} duplicate chunks from '{args.collection_name}'.")
+
+
+def benchmark_loaders(args) -> None:
+    """Times the registered loader against the generic unstructured loader, per file."""
+    fast_total = generic_total = 0.0
+    print(f"{'file':<60} {'loader':<18} {'fast s':>8} {'unstr. s':>9} {'speedup':>8}")
+    for path in scan_directory(args.directory):
+        loader = get_loader(path)
+
+        started = time.perf_counter()
+        list(loader(path))
+        fast = time.perf_counter() - started
+
+        started = time.perf_counter()
+        load_unstructured(path)
+        generic = time.perf_counter() - started
+
+        fast_total += fast
+        generic_total += generic
+        speedup = generic / fast if fast else float("inf")
+        print(f"{os.path.basename(path)[:60]:<60} {loader.__name__:<18} {fast:>8.2f} {generic:>9.2f} {speedup:>7.1f}x")
+
+    if fast_total:
+        print(f"{'TOTAL':<60} {'':<18} {fast_total:>8.2f} {generic_total:>9.2f} {generic_total / fast_total:>7.1f}x")
+
+
+def compare_chunkers(args) -> None:
+    """
+    Chunks and embedding tokens per file for the character and structure
+    chunkers, plus the prompt tokens `top_k` average chunks would cost.
+    """
+    chunkers = [CharacterChunker(), StructureChunker(args.max_tokens, args.overlap_tokens, EMBEDDING_MODEL)]
+    totals = {chunker.name: {"chunks": 0, "tokens": 0} for chunker in chunkers}
+    print(f"{'file':<50} {'char chunks':>11} {'char tokens':>11} {'struct chunks':>13} {'struct tokens':>13}")
+    for path in scan_directory(args.directory):
+        documents = list(load_file(path))
+        row = []
+        for chunker in chunkers:
+            chunks = list(chunker.split_documents(documents))
+            tokens = sum(count_tokens(chunk.page_content, EMBEDDING_MODEL) for chunk in chunks)
+            totals[chunker.name]["chunks"] += len(chunks)
+            totals[chunker.name]["tokens"] += tokens
+            row += [len(chunks), tokens]
+        print(f"{os.path.basename(path)[:50]:<50} {row[0]:>11} {row[1]:>11} {row[2]:>13} {row[3]:>13}")
+
+    character, structure = totals["character"], totals["structure"]
+    print(f"{'TOTAL':<50} {character['chunks']:>11} {character['tokens']:>11} {structure['chunks']:>13} {structure['tokens']:>13}")
+    if not character["chunks"] or not structure["chunks"]:
+        return
+    for name, total in totals.items():
+        average = total["tokens"] / total["chunks"]
+        print(f"{name:>9}: {average:.0f} tokens per chunk, ~{average * args.top_k:.0f} prompt tokens for top {args.top_k}")
+    print(f"Embedding tokens: {structure['tokens'] / character['tokens'] - 1:+.1%}, chunks: {structure['chunks'] / character['chunks'] - 1:+.1%}")
+
+
+def rebuild(args) -> None:
+    """Runs `rebuild_collection` on the workers and prints its progress until done."""
+    task = rebuild_collection.delay(args.collection_name)
+    print(f"Rebuilding '{args.collection_name}' from the parse cache into a new version (task {task.id})")
+    while True:
+        status = get_ingestion_status(task.id)
+        if status["ready"]:
+            break
+        progress = status.get("progress") or {}
+        if progress:
+            print(
+                f"  files {progress.get('files_done', 0)}/{progress.get('files_total', 0)}"
+                f", vectors {progress.get('vectors_written', 0)}, ETA {progress.get('eta_seconds')}s"
+            )
+        time.sleep(2)
+    print(json.dumps(status.get("result", status), indent=2))
+
+
+def collect_garbage(args) -> None:
+    deleted = gc_collections()
+    print(f"Deleted {len(deleted)} retired collection versions.")
+
+
+def lexical_index(args) -> None:
+    """Builds the BM25 index of a collection ingested before indexes were built at ingestion."""
+    stats = build_lexical_index(resolve_collection(args.collection_name))
+    bump_collection_version(args.collection_name)
+    print(f"Indexed {stats['documents']} chunks, {stats['terms']} terms in {stats['seconds']}s.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.worker.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dedupe_parser = commands.add_parser("dedupe", help="Remove duplicate chunks left by earlier ingestion runs")
+    dedupe_parser.add_argument("collection_name")
+    dedupe_parser.set_defaults(func=dedupe)
+
+    benchmark_parser = commands.add_parser("benchmark-loaders", help="Compare loader timings on a directory")
+    benchmark_parser.add_argument("directory")
+    benchmark_parser.set_defaults(func=benchmark_loaders)
+
+    compare_parser = commands.add_parser("compare-chunkers", help="Compare chunk counts and tokens of the two chunkers")
+    compare_parser.add_argument("directory")
+    compare_parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    compare_parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    # Chroma's retriever returns 4 documents by default
+    compare_parser.add_argument("--top-k", type=int, default=4)
+    compare_parser.set_defaults(func=compare_chunkers)
+
+    rebuild_parser = commands.add_parser("rebuild", help="Re-chunk and re-embed a collection from the parse cache")
+    rebuild_parser.add_argument("collection_name")
+    rebuild_parser.set_defaults(func=rebuild)
+
+    gc_parser = commands.add_parser("gc-collections", help="Delete collection versions retired past the grace period")
+    gc_parser.set_defaults(func=collect_garbage)
+
+    lexical_parser = commands.add_parser("build-lexical-index", help="(Re)build the BM25 index of a collection")
+    lexical_parser.add_argument("collection_name")
+    lexical_parser.set_defaults(func=lexical_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
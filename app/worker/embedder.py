@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import openai
+from langchain_core.embeddings import Embeddings
+from redis import RedisError
+
+from app.core.redis_client import get_redis
+from app.helpers.util import count_tokens
+
+# Errors worth retrying: throttling, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class RedisRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by every worker
+    through Redis counters on fixed one-minute windows.
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until the request fits in the current window. Returns seconds waited."""
+        if not self.rpm and not self.tpm:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            window = int(time.time() // 60)
+            requests_key = f"onbi:ratelimit:{self.name}:rpm:{window}"
+            tokens_key = f"onbi:ratelimit:{self.name}:tpm:{window}"
+            try:
+                pipe = get_redis().pipeline()
+                pipe.incr(requests_key)
+                pipe.incrby(tokens_key, tokens)
+                pipe.expire(requests_key, 120)
+                pipe.expire(tokens_key, 120)
+                used_requests, used_tokens, _, _ = pipe.execute()
+            except RedisError as e:
+                # Without Redis we cannot coordinate; rely on the API's 429s and backoff
+                print(f"Rate limiter unavailable, continuing without it: {e}")
+                return waited
+
+            within_rpm = not self.rpm or used_requests <= self.rpm
+            # A window always admits its first request, even one larger than the budget
+            within_tpm = not self.tpm or used_tokens <= self.tpm or used_tokens == tokens
+            if within_rpm and within_tpm:
+                return waited
+
+            # Over budget: give the reservation back and wait for the next window
+            try:
+                pipe = get_redis().pipeline()
+                pipe.decr(requests_key)
+                pipe.decrby(tokens_key, tokens)
+                pipe.execute()
+            except RedisError:
+                pass
+            pause = 60 - time.time() % 60 + random.uniform(0, 1)
+            time.sleep(pause)
+            waited += pause
+
+
+class BudgetedEmbeddings(Embeddings):
+    """
+    Embedding client for ingestion. Packs texts into requests by tiktoken
+    count, keeps up to `concurrency` requests in flight, respects the shared
+    RPM/TPM budget and retries transient errors with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        client: openai.OpenAI,
+        model: str,
+        max_request_tokens: int,
+        max_request_inputs: int,
+        concurrency: int,
+        rate_limiter: RedisRateLimiter,
+        max_retries: int,
+    ):
+        self.client = client
+        self.model = model
+        self.max_request_tokens = max_request_tokens
+        self.max_request_inputs = max_request_inputs
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.tokens = 0
+            self.retries = 0
+            self.throttle_seconds = 0.0
+            self.seconds = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "retries": self.retries,
+                "seconds": round(self.seconds, 3),
+                "throttle_seconds": round(self.throttle_seconds, 3),
+                "tokens_per_second": round(self.tokens / self.seconds, 1) if self.seconds else 0.0,
+            }
+
+    def pack(self, texts: List[str]) -> List[Tuple[int, List[str], int]]:
+        """Splits texts into (start index, texts, tokens) requests within the token and input limits."""
+        requests = []
+        start, batch, batch_tokens = 0, [], 0
+        for index, text in enumerate(texts):
+            tokens = count_tokens(text, self.model)
+            if batch and (batch_tokens + tokens > self.max_request_tokens or len(batch) >= self.max_request_inputs):
+                requests.append((start, batch, batch_tokens))
+                start, batch, batch_tokens = index, [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            requests.append((start, batch, batch_tokens))
+        return requests
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        vectors: List[List[float]] = [None] * len(texts)
+        futures = [
+            (start, self._executor.submit(self._embed_request, batch, tokens))
+            for start, batch, tokens in self.pack(texts)
+        ]
+        for start, future in futures:
+            for offset, vector in enumerate(future.result()):
+                vectors[start + offset] = vector
+        with self._lock:
+            self.seconds += time.perf_counter() - started
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _embed_request(self, texts: List[str], tokens: int) -> List[List[float]]:
+        attempt = 0
+        while True:
+            throttled = self.rate_limiter.acquire(tokens)
+            try:
+                response = self.client.embeddings.create(model=self.model, input=texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Full jitter, but never sooner than the server asked for
+                delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after:
+                    delay = max(delay, retry_after)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                    self.throttle_seconds += throttled + delay
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self.requests += 1
+                self.tokens += response.usage.total_tokens if response.usage else tokens
+                self.throttle_seconds += throttled
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
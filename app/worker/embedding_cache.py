@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import INGEST_EMBEDDING_CACHE_DTYPE, INGEST_EMBEDDING_CACHE_MAX_BYTES, INGEST_STATE_DIR
+from app.helpers.util import decode_vector, encode_vector
+
+EMBEDDING_CACHE_PATH = os.path.join(INGEST_STATE_DIR, "embedding_cache.sqlite3")
+
+# Keeps the number of SQL variables per statement well under SQLite's limit
+LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of chunk embeddings on local disk (SQLite).
+
+    Keys are sha256(model name + chunk text), values are raw float32/float16
+    bytes. When the stored vectors exceed `max_bytes`, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH, max_bytes: int = INGEST_EMBEDDING_CACHE_MAX_BYTES, dtype: str = INGEST_EMBEDDING_CACHE_DTYPE):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def key(self, model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest() + f":{self.dtype}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                for key, data in rows:
+                    found[key] = decode_vector(data, self.dtype)
+                conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *batch])
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            data = encode_vector(vector, self.dtype)
+            rows.append((key, data, len(data), now))
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+        self.evict()
+
+    def evict(self) -> int:
+        """Drops least recently used vectors until the cache fits in `max_bytes`."""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM embeddings").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            for key, size in conn.execute("SELECT key, bytes FROM embeddings ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        return removed
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper for ingestion: chunks whose text was embedded before
+    (with the same model) come from the disk cache and skip the OpenAI call.
+    Safe to call from several threads at once.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            # UTF-8 bytes of chunk text that did not have to be sent to the embeddings API
+            self.bytes_saved = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache.key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys)))
+
+        missing = {}
+        hits = bytes_saved = 0
+        for key, text in zip(keys, texts):
+            if key in cached:
+                hits += 1
+                bytes_saved += len(text.encode("utf-8"))
+            elif key not in missing:
+                missing[key] = text
+        with self._lock:
+            self.hits += hits
+            self.bytes_saved += bytes_saved
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,219 @@
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from langchain_core.documents import Document
+
+from app.core.config import PDF_OCR_DPI, PDF_OCR_LANGUAGES, PDF_OCR_PAGE_SECONDS_ESTIMATE, PDF_OCR_PAGE_TIMEOUT
+
+# Bump when any loader's output changes, so parsed documents cached by an
+# older version are not reused
+PARSER_VERSION = 2
+
+# A page with fewer extractable characters than this has no usable text layer
+MIN_PDF_TEXT_CHARS = 20
+# Text layers that are mostly symbols or replacement characters are broken encodings
+MIN_PDF_TEXT_READABLE_RATIO = 0.6
+
+
+def load_unstructured(path: str) -> List[Document]:
+    """Generic `unstructured` partitioner: slow, but handles anything (.doc, scanned PDFs)."""
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    return UnstructuredFileLoader(path).load()
+
+
+def has_text_layer(text: str) -> bool:
+    """Whether a page's extracted text is usable as is, so the page needs no OCR."""
+    text = "".join(text.split())
+    if len(text) < MIN_PDF_TEXT_CHARS:
+        return False
+    readable = sum(1 for char in text if char.isalnum() or char in ".,;:!?()-/%'\"")
+    return readable / len(text) >= MIN_PDF_TEXT_READABLE_RATIO
+
+
+def ocr_page(page) -> str:
+    """
+    OCRs one rendered page with tesseract. Raises RuntimeError past
+    PDF_OCR_PAGE_TIMEOUT and OSError when tesseract is missing.
+    """
+    import unstructured_pytesseract as pytesseract
+
+    image = page.render(scale=PDF_OCR_DPI / 72).to_pil()
+    return pytesseract.image_to_string(image, lang=PDF_OCR_LANGUAGES, timeout=PDF_OCR_PAGE_TIMEOUT)
+
+
+def load_pdf(path: str) -> Iterator[Document]:
+    """
+    Reads a PDF lazily with pypdfium2, one Document per page, so a large PDF
+    never has to be held in memory as a whole.
+
+    Every page is triaged on its own: pages with a usable text layer are
+    extracted directly, and only image-only pages are rendered and OCRed,
+    each within PDF_OCR_PAGE_TIMEOUT seconds. A page whose OCR fails or
+    times out is skipped rather than indexed with the text layer it was
+    rejected for. Returns the triage counters when exhausted (see `load_file`).
+    """
+    import pypdfium2 as pdfium
+
+    triage = {"pages": 0, "text_pages": 0, "ocr_pages": 0, "ocr_failed": 0, "ocr_seconds": 0.0}
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for index in range(len(pdf)):
+            triage["pages"] += 1
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                if has_text_layer(text):
+                    triage["text_pages"] += 1
+                    extraction = "text"
+                else:
+                    started = time.perf_counter()
+                    try:
+                        text = ocr_page(page)
+                        triage["ocr_pages"] += 1
+                    except Exception as e:
+                        # Timed out, tesseract missing or crashed, page not renderable:
+                        # the text layer is unusable too, so go on with the next page
+                        print(f"OCR failed on page {index + 1} of {path}: {e}")
+                        triage["ocr_failed"] += 1
+                        text = ""
+                    triage["ocr_seconds"] += time.perf_counter() - started
+                    extraction = "ocr"
+            finally:
+                page.close()
+            if not text.strip():
+                continue
+
+            yield Document(
+                page_content=text,
+                metadata={"source": path, "page_number": index + 1, "extraction": extraction},
+            )
+    finally:
+        pdf.close()
+    return triage
+
+
+def _docx_category(paragraph) -> tuple:
+    """Element category (unstructured's names) and heading level of a python-docx paragraph."""
+    style = paragraph.style.name if paragraph.style is not None else ""
+    if style == "Title":
+        return "Title", 0
+    if style.startswith("Heading"):
+        level = style.rsplit(" ", 1)[-1]
+        return "Title", int(level) if level.isdigit() else 1
+    properties = paragraph._p.pPr
+    if style.startswith("List") or (properties is not None and properties.numPr is not None):
+        return "ListItem", None
+    return "NarrativeText", None
+
+
+def load_docx(path: str) -> List[Document]:
+    """
+    Reads paragraphs and tables in document order with python-docx, one
+    Document per element (heading, list item, paragraph, table row) so the
+    structure-aware chunker can break at them.
+    """
+    import docx
+    from docx.table import Table
+
+    elements = []
+    for block in docx.Document(path).iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells = [cell.text.strip() for cell in row.cells]
+                if any(cells):
+                    elements.append(Document(page_content=" | ".join(cells), metadata={"source": path, "category": "Table"}))
+        elif block.text.strip():
+            category, level = _docx_category(block)
+            metadata = {"source": path, "category": category}
+            if level is not None:
+                metadata["heading_level"] = level
+            elements.append(Document(page_content=block.text.strip(), metadata=metadata))
+    return elements
+
+
+# Loader per file extension. Files with any other extension are skipped.
+LOADERS: Dict[str, Callable[[str], Iterable[Document]]] = {
+    ".pdf": load_pdf,
+    ".docx": load_docx,
+    ".doc": load_unstructured,
+}
+
+SUPPORTED_EXTENSIONS = tuple(LOADERS)
+
+
+def get_loader(path: str) -> Callable[[str], Iterable[Document]]:
+    return LOADERS.get(os.path.splitext(path)[1].lower())
+
+
+def parser_version(path: str) -> str:
+    """Identifies the loader (and its settings) that parses `path`, for the parse cache."""
+    loader = get_loader(path)
+    if loader is load_pdf:
+        return f"{loader.__name__}/{PARSER_VERSION}/ocr:{PDF_OCR_LANGUAGES}@{PDF_OCR_DPI}"
+    return f"{loader.__name__}/{PARSER_VERSION}"
+
+
+class LoaderStats:
+    """Files and seconds spent per loader, and PDF page triage per file, for the ingestion report."""
+
+    def __init__(self):
+        self.loaders = defaultdict(lambda: {"files": 0, "seconds": 0.0})
+        self.pdf_pages = {}
+
+    def record(self, loader_name: str, seconds: float) -> None:
+        self.loaders[loader_name]["files"] += 1
+        self.loaders[loader_name]["seconds"] += seconds
+
+    def record_pages(self, path: str, triage: dict) -> None:
+        """
+        Keeps a PDF's triage counters plus the OCR seconds saved by extracting
+        its text pages directly, priced at this file's measured OCR seconds per
+        page (or PDF_OCR_PAGE_SECONDS_ESTIMATE if it had no OCR pages).
+        """
+        ocr_attempts = triage["ocr_pages"] + triage["ocr_failed"]
+        per_page = triage["ocr_seconds"] / ocr_attempts if ocr_attempts else PDF_OCR_PAGE_SECONDS_ESTIMATE
+        self.pdf_pages[path] = {
+            **triage,
+            "ocr_seconds": round(triage["ocr_seconds"], 3),
+            "ocr_seconds_saved": round(triage["text_pages"] * per_page, 1),
+        }
+
+    def as_dict(self) -> dict:
+        return {name: {**stats, "seconds": round(stats["seconds"], 3)} for name, stats in self.loaders.items()}
+
+
+def load_file(path: str, stats: LoaderStats = None) -> Iterator[Document]:
+    """
+    Lazily loads one file with the loader registered for its extension. Only
+    time spent inside the loader is recorded, not time the caller spends
+    between documents. A generator loader may return a dict of page triage
+    counters, which is recorded too.
+    """
+    loader = get_loader(path)
+    if loader is None:
+        raise ValueError(f"Unsupported file type: {path}")
+
+    seconds = 0.0
+    try:
+        started = time.perf_counter()
+        iterator = iter(loader(path))
+        seconds += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            try:
+                document = next(iterator)
+            except StopIteration as stop:
+                seconds += time.perf_counter() - started
+                if stats is not None and stop.value:
+                    stats.record_pages(path, stop.value)
+                break
+            seconds += time.perf_counter() - started
+            yield document
+    finally:
+        if stats is not None:
+            stats.record(loader.__name__, seconds)
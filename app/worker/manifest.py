@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.core.config import INGEST_STATE_DIR
+from app.worker.loaders import SUPPORTED_EXTENSIONS
+
+MANIFEST_PATH = os.path.join(INGEST_STATE_DIR, "manifest.sqlite3")
+
+
+@dataclass
+class FileRecord:
+    """What the manifest knows about one ingested file."""
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class IngestionPlan:
+    unchanged: List[FileRecord] = field(default_factory=list)
+    # Files whose mtime moved but whose content is identical; only the manifest row is refreshed
+    touched: List[FileRecord] = field(default_factory=list)
+    added: List[FileRecord] = field(default_factory=list)
+    # (previous record, new record) pairs
+    updated: List[tuple] = field(default_factory=list)
+    deleted: List[FileRecord] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        return {
+            "unchanged": len(self.unchanged) + len(self.touched),
+            "added": len(self.added),
+            "updated": len(self.updated),
+            "deleted": len(self.deleted),
+        }
+
+
+class Manifest:
+    """
+    Per-collection record of every ingested file: path, size, mtime, content
+    hash and the chunk IDs it produced. Stored in SQLite so several worker
+    processes can update it safely.
+    """
+
+    def __init__(self, db_path: str = MANIFEST_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    collection TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (collection, path)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def records(self, collection_name: str) -> Dict[str, FileRecord]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime, sha256, chunk_ids FROM files WHERE collection = ?",
+                (collection_name,),
+            ).fetchall()
+        return {
+            path: FileRecord(path, size, mtime, sha256, json.loads(chunk_ids))
+            for path, size, mtime, sha256, chunk_ids in rows
+        }
+
+    def upsert(self, collection_name: str, record: FileRecord) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    collection_name,
+                    record.path,
+                    record.size,
+                    record.mtime,
+                    record.sha256,
+                    json.dumps(record.chunk_ids),
+                    time.time(),
+                ),
+            )
+
+    def delete(self, collection_name: str, path: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE collection = ? AND path = ?", (collection_name, path))
+
+    def delete_collection(self, collection_name: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE collection = ?", (collection_name,))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_document(path: str) -> bool:
+    """Supported files only, skipping Office lock files (~$name.docx) and hidden files."""
+    name = os.path.basename(path)
+    return name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith(("~$", "."))
+
+
+def scan_directory(directory_path: str) -> List[str]:
+    """Absolute paths of the documents under `directory_path` (see `is_document`)."""
+    paths = []
+    for root, _, files in os.walk(directory_path):
+        for name in files:
+            if is_document(name):
+                paths.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(paths)
+
+
+def _plan_file(plan: IngestionPlan, path: str, previous: FileRecord) -> None:
+    stat = os.stat(path)
+    if previous and previous.size == stat.st_size and previous.mtime == stat.st_mtime:
+        plan.unchanged.append(previous)
+        return
+
+    record = FileRecord(path, stat.st_size, stat.st_mtime, file_sha256(path))
+    if previous is None:
+        plan.added.append(record)
+    elif previous.sha256 == record.sha256:
+        record.chunk_ids = previous.chunk_ids
+        plan.touched.append(record)
+    else:
+        plan.updated.append((previous, record))
+
+
+def plan_directory(directory_path: str, known: Dict[str, FileRecord]) -> IngestionPlan:
+    """
+    Compares the directory with the manifest. Size + mtime decide quickly that
+    a file is unchanged; otherwise the content hash decides.
+    """
+    plan = IngestionPlan()
+    root = os.path.abspath(directory_path)
+    seen = set()
+
+    for path in scan_directory(root):
+        seen.add(path)
+        _plan_file(plan, path, known.get(path))
+
+    # Only files under this directory can be "deleted"; a collection may be fed from several
+    for path, previous in known.items():
+        if path.startswith(root + os.sep) and path not in seen:
+            plan.deleted.append(previous)
+
+    return plan
+
+
+def plan_paths(paths: List[str], known: Dict[str, FileRecord]) -> IngestionPlan:
+    """Like `plan_directory`, for a few given files only; a path that no longer exists is deleted."""
+    plan = IngestionPlan()
+    for path in sorted({os.path.abspath(path) for path in paths}):
+        if not is_document(path):
+            continue
+        if os.path.isfile(path):
+            _plan_file(plan, path, known.get(path))
+        elif path in known:
+            plan.deleted.append(known[path])
+    return plan
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable, Iterator, Optional
+
+from langchain_core.documents import Document
+
+from app.core.config import INGEST_STATE_DIR, PARSE_CACHE_MAX_BYTES, PARSE_CACHE_ZSTD_LEVEL
+from app.worker.loaders import LoaderStats, load_file, parser_version
+
+PARSE_CACHE_PATH = os.path.join(INGEST_STATE_DIR, "parse_cache.sqlite3")
+
+
+class ParseCache:
+    """
+    Parsed document elements per file content, on local disk.
+
+    Keys are (sha256 of the file, parser version); each entry is a file of
+    the loader's Documents as zstd-compressed JSON lines, written and read as
+    a stream so no entry is ever held in memory as a whole. SQLite only keeps
+    the index. The `source` path is not stored, so a renamed or copied file
+    is still a hit. When the compressed entries exceed `max_bytes`, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, db_path: str = PARSE_CACHE_PATH, max_bytes: int = PARSE_CACHE_MAX_BYTES, level: int = PARSE_CACHE_ZSTD_LEVEL):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.level = level
+        self.directory = os.path.splitext(db_path)[0]
+        os.makedirs(self.directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Entries used to be stored inline as one BLOB each
+            conn.execute("DROP TABLE IF EXISTS parsed")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parsed_files (
+                    sha256 TEXT NOT NULL,
+                    parser_version TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    raw_bytes INTEGER NOT NULL,
+                    documents INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (sha256, parser_version)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS parsed_files_last_used ON parsed_files (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, sha256: str, version: str, source: str) -> Optional[Iterator[Document]]:
+        """The cached Documents as a lazy iterator, or None on a miss."""
+        import zstandard
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file FROM parsed_files WHERE sha256 = ? AND parser_version = ?", (sha256, version)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                # Opened right away: an entry evicted meanwhile stays readable through the handle
+                f = open(os.path.join(self.directory, row[0]), "rb")
+            except FileNotFoundError:
+                conn.execute("DELETE FROM parsed_files WHERE sha256 = ? AND parser_version = ?", (sha256, version))
+                return None
+            conn.execute(
+                "UPDATE parsed_files SET last_used = ? WHERE sha256 = ? AND parser_version = ?",
+                (time.time(), sha256, version),
+            )
+
+        def documents() -> Iterator[Document]:
+            with f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                    page_content, metadata = json.loads(line)
+                    yield Document(page_content=page_content, metadata={"source": source, **metadata})
+
+        return documents()
+
+    def put(self, sha256: str, version: str, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Passes `documents` through while writing them to a new entry, which is
+        committed only once they are all read. An entry left unfinished
+        (the caller stopped early or the loader failed) is discarded.
+        """
+        import zstandard
+
+        # Parser versions hold "/" and ":", so they are hashed into the file name
+        name = f"{sha256}-{hashlib.sha256(version.encode('utf-8')).hexdigest()[:16]}.jsonl.zst"
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.{os.getpid()}.{time.time_ns()}.tmp"
+        raw_bytes = count = 0
+        complete = False
+        try:
+            with open(partial, "wb") as f, zstandard.ZstdCompressor(level=self.level).stream_writer(f) as writer:
+                for document in documents:
+                    metadata = {key: value for key, value in document.metadata.items() if key != "source"}
+                    line = (json.dumps([document.page_content, metadata], ensure_ascii=False) + "\n").encode("utf-8")
+                    writer.write(line)
+                    raw_bytes += len(line)
+                    count += 1
+                    yield document
+            os.replace(partial, path)
+            complete = True
+        finally:
+            if not complete:
+                try:
+                    os.remove(partial)
+                except FileNotFoundError:
+                    pass
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, version, name, os.path.getsize(path), raw_bytes, count, time.time()),
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        """Drops least recently used entries until the cache fits in `max_bytes`."""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM parsed_files").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            for sha256, version, name, size in conn.execute(
+                "SELECT sha256, parser_version, file, bytes FROM parsed_files ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM parsed_files WHERE sha256 = ? AND parser_version = ?", (sha256, version))
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+
+def _timed(documents: Iterator[Document], stats: LoaderStats = None) -> Iterator[Document]:
+    """Records the time spent reading `documents` from the cache, not the caller's time between them."""
+    seconds = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            document = next(documents, None)
+            seconds += time.perf_counter() - started
+            if document is None:
+                return
+            yield document
+    finally:
+        if stats is not None:
+            stats.record("parse_cache", seconds)
+
+
+def load_file_cached(path: str, sha256: str, cache: ParseCache, stats: LoaderStats = None) -> Iterator[Document]:
+    """
+    `load_file` with the parse cache in front: a file parsed before (same
+    content, same parser version) is streamed from the cache, otherwise it is
+    parsed, streamed to the caller and cached as it goes.
+    """
+    version = parser_version(path)
+    documents = cache.get(sha256, version, source=path)
+    if documents is not None:
+        yield from _timed(documents, stats)
+        return
+    yield from cache.put(sha256, version, load_file(path, stats))
+
+
+def load_from_cache(path: str, sha256: str, cache: ParseCache, stats: LoaderStats = None) -> Iterator[Document]:
+    """Cached documents of a file, without ever opening the file itself. Raises LookupError on a miss."""
+    documents = cache.get(sha256, parser_version(path), source=path)
+    if documents is None:
+        raise LookupError(f"Not in the parse cache (content or parser changed): {path}")
+    return _timed(documents, stats)
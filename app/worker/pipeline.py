@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AbstractSet, Iterable, Iterator, List
+
+from app.worker.vectorstore import chunk_id, content_hash
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """Another stage failed; this one stops quietly."""
+
+
+class StageTimer:
+    """Seconds spent doing work in each stage, excluding time blocked on queues."""
+
+    def __init__(self):
+        self.seconds = {"load_split": 0.0, "embed": 0.0, "write": 0.0}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    def as_dict(self) -> dict:
+        return {stage: round(seconds, 3) for stage, seconds in self.seconds.items()}
+
+
+def _put(q: queue.Queue, item, failed: threading.Event) -> None:
+    while True:
+        if failed.is_set():
+            raise _Aborted()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: queue.Queue, failed: threading.Event):
+    while True:
+        if failed.is_set():
+            raise _Aborted()
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_ingestion_pipeline(documents: Iterable, source: str, splitter, embeddings, write_batch, batch_size: int, queue_batches: int, known_ids: AbstractSet[str] = frozenset(), embed_concurrency: int = 1, on_batch=None) -> dict:
+    """
+    Streams one file through load -> split -> embed -> write.
+
+    `splitter.split_documents` must accept an iterable of documents and yield
+    chunks lazily (see `app.worker.chunking`).
+
+    Each stage runs in its own thread and hands work on through bounded queues,
+    so only a few batches are in memory at any time whatever the file size.
+    Up to `embed_concurrency` batches are embedded at once, so a client that
+    keeps several requests in flight gets enough work to do so. Batches are
+    still passed to `write_batch(ids, chunks, vectors)` in order, each as soon
+    as it and the batches before it are embedded. Chunks whose ID is in
+    `known_ids` (stored by an earlier run) are neither embedded nor written again.
+
+    `on_batch(chunks_done, chunks_written)` is called after every written batch.
+    Returns the chunk IDs in order plus counters and per-stage timings.
+    """
+    batch_size = max(1, batch_size)
+    embed_concurrency = max(1, embed_concurrency)
+    chunk_queue: queue.Queue = queue.Queue(maxsize=batch_size * queue_batches)
+    vector_queue: queue.Queue = queue.Queue(maxsize=queue_batches)
+    failed = threading.Event()
+    errors: List[BaseException] = []
+    timer = StageTimer()
+
+    def load_and_split():
+        # Loaders are lazy (e.g. one PDF page at a time); time only the work, not the waiting
+        index = 0
+        iterator = iter(splitter.split_documents(documents))
+        while True:
+            started = time.perf_counter()
+            chunk = next(iterator, _DONE)
+            if chunk is _DONE:
+                break
+            chunk.metadata["chunk_index"] = index
+            chunk.metadata["chunk_hash"] = content_hash(chunk.page_content)
+            index += 1
+            timer.add("load_split", time.perf_counter() - started)
+            _put(chunk_queue, chunk, failed)
+        _put(chunk_queue, _DONE, failed)
+
+    def embed():
+        def chunks():
+            while True:
+                chunk = _get(chunk_queue, failed)
+                if chunk is _DONE:
+                    return
+                yield chunk
+
+        def embed_batch(batch: list) -> tuple:
+            started = time.perf_counter()
+            ids = [chunk_id(source, chunk.metadata["chunk_index"], chunk.page_content) for chunk in batch]
+            # Same ID means same content: already stored, nothing to embed
+            pending = [(chunk, id_) for chunk, id_ in zip(batch, ids) if id_ not in known_ids]
+            vectors = embeddings.embed_documents([chunk.page_content for chunk, _ in pending]) if pending else []
+            timer.add("embed", time.perf_counter() - started)
+            return ids, pending, vectors
+
+        pool = ThreadPoolExecutor(max_workers=embed_concurrency, thread_name_prefix="embed-batch")
+        in_flight = deque()
+        try:
+            for batch in _batches(chunks(), batch_size):
+                in_flight.append(pool.submit(embed_batch, batch))
+                if len(in_flight) >= embed_concurrency:
+                    _put(vector_queue, in_flight.popleft().result(), failed)
+            while in_flight:
+                _put(vector_queue, in_flight.popleft().result(), failed)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        _put(vector_queue, _DONE, failed)
+
+    def run(stage):
+        try:
+            stage()
+        except _Aborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+
+    threads = [threading.Thread(target=run, args=(stage,), daemon=True) for stage in (load_and_split, embed)]
+    for thread in threads:
+        thread.start()
+
+    all_ids: List[str] = []
+    written = 0
+
+    def write():
+        nonlocal written
+        while True:
+            item = _get(vector_queue, failed)
+            if item is _DONE:
+                return
+            ids, pending, vectors = item
+            started = time.perf_counter()
+            if pending:
+                write_batch([id_ for _, id_ in pending], [chunk for chunk, _ in pending], vectors)
+            timer.add("write", time.perf_counter() - started)
+            all_ids.extend(ids)
+            written += len(pending)
+            if on_batch is not None:
+                on_batch(len(all_ids), written)
+
+    run(write)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    return {
+        "chunk_ids": all_ids,
+        "chunks": len(all_ids),
+        "chunks_written": written,
+        "stage_seconds": timer.as_dict(),
+    }
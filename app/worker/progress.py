@@ -0,0 +1,80 @@
+import time
+
+from redis import RedisError
+
+from app.core.redis_client import get_redis
+
+# Counters shared by all per-file tasks of one ingestion run
+PROGRESS_KEY = "onbi:ingest_progress:{run_id}"
+PROGRESS_TTL = 24 * 3600
+
+COUNTERS = ("files_total", "files_done", "files_failed", "chunks_embedded", "vectors_written", "tokens_embedded")
+
+
+def start_progress(run_id: str, files_total: int) -> None:
+    key = PROGRESS_KEY.format(run_id=run_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={"files_total": files_total, "started_at": time.time()})
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except RedisError as e:
+        print(f"Could not record ingestion progress: {e}")
+
+
+def add_progress(run_id: str, **counters: int) -> None:
+    key = PROGRESS_KEY.format(run_id=run_id)
+    try:
+        pipe = get_redis().pipeline()
+        for name, value in counters.items():
+            if value:
+                pipe.hincrby(key, name, value)
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except RedisError as e:
+        print(f"Could not record ingestion progress: {e}")
+
+
+def read_progress(run_id: str) -> dict:
+    """Counters plus derived throughput and ETA (estimated from the share of files done)."""
+    try:
+        raw = get_redis().hgetall(PROGRESS_KEY.format(run_id=run_id))
+    except RedisError as e:
+        print(f"Could not read ingestion progress: {e}")
+        raw = {}
+    values = {key.decode(): float(value) for key, value in raw.items()}
+
+    progress = {name: int(values.get(name, 0)) for name in COUNTERS}
+    elapsed = time.time() - values["started_at"] if "started_at" in values else 0.0
+    finished = progress["files_done"] + progress["files_failed"]
+    remaining = progress["files_total"] - finished
+
+    progress["elapsed_seconds"] = round(elapsed, 1)
+    progress["tokens_per_second"] = round(progress["tokens_embedded"] / elapsed, 1) if elapsed else 0.0
+    progress["eta_seconds"] = round(elapsed / finished * remaining, 1) if finished else None
+    return progress
+
+
+def publish_progress(task, run_id: str, stage: str) -> None:
+    """Publishes the run's progress as the Celery state of the run's task id."""
+    task.update_state(task_id=run_id, state="PROGRESS", meta={"stage": stage, **read_progress(run_id)})
+
+
+def get_ingestion_status(task_id: str) -> dict:
+    """Celery state of an ingestion run, with live progress while it runs and the result when done."""
+    from celery.result import AsyncResult
+
+    from .celery_app import celery_app
+
+    result = AsyncResult(task_id, app=celery_app)
+    status = {"task_id": task_id, "state": result.state, "ready": result.ready()}
+    if result.state == "PROGRESS":
+        status["progress"] = result.info
+    elif result.state == "STARTED":
+        status["progress"] = {"stage": "planning", **read_progress(task_id)}
+    elif result.successful():
+        status["result"] = result.result
+    elif result.failed():
+        status["error"] = str(result.result)
+    return status
@@ -1,66 +1,584 @@
+import base64
 import os
+import shutil
+import time
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+import numpy as np
+from celery.exceptions import Ignore
 from dotenv import load_dotenv
-from langchain_community.document_loaders import DirectoryLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
 
+from app.core.collections import bump_collection_version, resolve_collection, swap_collection_alias
+from app.core.config import (
+    CHROMA_PERSIST_DIR,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    COLLECTION_GC_GRACE_SECONDS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_MODEL,
+    EMBEDDING_REQUEST_MAX_INPUTS,
+    EMBEDDING_REQUEST_MAX_TOKENS,
+    EMBEDDING_RPM_LIMIT,
+    EMBEDDING_TPM_LIMIT,
+    INGEST_BATCH_SIZE,
+    INGEST_CHUNKER,
+    INGEST_QUEUE_BATCHES,
+    require_api_key,
+)
+from app.core.http import get_http_client
+from app.helpers.lexical import build_index, index_path, update_index
+from .catalog import CollectionCatalog
 from .celery_app import celery_app
+from .chunking import get_chunker
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .loaders import LoaderStats
+from .manifest import FileRecord, IngestionPlan, Manifest, plan_directory, plan_paths
+from .parse_cache import ParseCache, load_file_cached, load_from_cache
+from .pipeline import run_ingestion_pipeline
+from .progress import add_progress, publish_progress, read_progress, start_progress
+from .vectorstore import delete_ids, existing_ids, get_documents, iter_documents, max_batch_size
+
+if TYPE_CHECKING:
+    from .embedder import BudgetedEmbeddings
 
 # Load environment variables from .env file
 load_dotenv()
 
-# --- Configuration for Vector Store ---
-# This ensures ChromaDB persists data to disk in the 'chroma_db' directory
-CHROMA_PERSIST_DIR = "chroma_db_persistent"
+# --- Initialize components once (on first use) ---
+# The CLI and the directory watcher import this module to dispatch tasks, so
+# the embeddings client and Chroma are only created when a task needs them.
+_embedding_client = None
+_embeddings = None
+_text_splitter = None
 
-# --- Initialize components once ---
-embeddings = OpenAIEmbeddings()
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+def get_embedding_client() -> "BudgetedEmbeddings":
+    global _embedding_client
+    if _embedding_client is None:
+        import openai
 
-@celery_app.task
-def process_directory(directory_path: str, collection_name: str):
+        from .embedder import BudgetedEmbeddings, RedisRateLimiter
+
+        # The worker is synchronous, so it shares the pooled sync HTTP client.
+        # Retries are done by BudgetedEmbeddings, which knows about the shared budget.
+        client = openai.OpenAI(api_key=require_api_key(), http_client=get_http_client(), max_retries=0)
+        _embedding_client = BudgetedEmbeddings(
+            client,
+            model=EMBEDDING_MODEL,
+            max_request_tokens=EMBEDDING_REQUEST_MAX_TOKENS,
+            max_request_inputs=EMBEDDING_REQUEST_MAX_INPUTS,
+            concurrency=EMBEDDING_CONCURRENCY,
+            rate_limiter=RedisRateLimiter("embeddings", rpm=EMBEDDING_RPM_LIMIT, tpm=EMBEDDING_TPM_LIMIT),
+            max_retries=EMBEDDING_MAX_RETRIES,
+        )
+    return _embedding_client
+
+
+def get_embeddings() -> CachedEmbeddings:
+    global _embeddings
+    if _embeddings is None:
+        # Chunks embedded before (any collection, any run) are served from disk
+        _embeddings = CachedEmbeddings(get_embedding_client(), EMBEDDING_MODEL, EmbeddingCache())
+    return _embeddings
+
+
+def get_text_splitter():
+    global _text_splitter
+    if _text_splitter is None:
+        _text_splitter = get_chunker(INGEST_CHUNKER, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_MODEL)
+    return _text_splitter
+
+
+def open_vectorstore(collection_name: str):
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(
+        persist_directory=CHROMA_PERSIST_DIR,
+        embedding_function=get_embeddings(),
+        collection_name=collection_name,
+    )
+
+def pack_vectors(vectors: list) -> str:
+    """Embeddings as base64 float32, about a fifth of their JSON size in a task message."""
+    return base64.b64encode(np.asarray(vectors, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def unpack_vectors(data: str, count: int) -> list:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(count, -1).tolist()
+
+
+def build_lexical_index(physical_name: str) -> dict:
+    """Rebuilds the BM25 index next to the Chroma collection from the chunks it holds."""
+    vectorstore = open_vectorstore(physical_name)
+    return build_index(index_path(CHROMA_PERSIST_DIR, physical_name), iter_documents(vectorstore))
+
+
+def update_lexical_index(physical_name: str, added_ids: list, deleted_ids: list) -> dict:
     """
-    Celery task to load all documents from a directory, process them,
-    and save them to a persistent ChromaDB collection.
+    Indexes only the chunks written and deleted by one run; only their texts
+    are read from Chroma. Builds the whole index if the collection has none.
     """
+    vectorstore = open_vectorstore(physical_name)
+    path = index_path(CHROMA_PERSIST_DIR, physical_name)
+    stats = update_index(path, get_documents(vectorstore, added_ids), deleted_ids)
+    return stats if stats is not None else build_index(path, iter_documents(vectorstore))
+
+
+def merge_loader_stats(stats: list) -> dict:
+    merged = {}
+    for item in stats:
+        for name, loader in item.items():
+            total = merged.setdefault(name, {"files": 0, "seconds": 0.0})
+            total["files"] += loader["files"]
+            total["seconds"] = round(total["seconds"] + loader["seconds"], 3)
+    return merged
+
+
+def merge_pdf_pages(stats: list) -> dict:
+    files = {path: triage for item in stats for path, triage in item.items()}
+    return {
+        "ocr_pages": sum(triage["ocr_pages"] for triage in files.values()),
+        "ocr_seconds_saved": round(sum(triage["ocr_seconds_saved"] for triage in files.values()), 1),
+        "files": files,
+    }
+
+
+def merge_stage_seconds(stats: list) -> dict:
+    merged = {}
+    for item in stats:
+        for stage, seconds in item.items():
+            merged[stage] = round(merged.get(stage, 0.0) + seconds, 3)
+    return merged
+
+
+def merge_client_stats(stats: list) -> dict:
+    merged = {key: sum(item[key] for item in stats) for key in ("requests", "tokens", "retries", "seconds", "throttle_seconds")}
+    merged["seconds"] = round(merged["seconds"], 3)
+    merged["throttle_seconds"] = round(merged["throttle_seconds"], 3)
+    # Files are embedded in parallel, so this is tokens per second of embedding time per worker
+    merged["tokens_per_second"] = round(merged["tokens"] / merged["seconds"], 1) if merged["seconds"] else 0.0
+    return merged
+
+
+def merge_cache_stats(stats: list) -> dict:
+    hits = sum(item.get("hits", 0) for item in stats)
+    misses = sum(item.get("misses", 0) for item in stats)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "bytes_saved": sum(item.get("bytes_saved", 0) for item in stats),
+    }
+
+
+def apply_plan(task, collection_name: str, plan, started: float, target: str, swap: bool = False, from_cache: bool = False):
+    """
+    Deletes the vectors of removed files, refreshes touched manifest rows and
+    fans out one `ingest_file` task per new or changed file, followed by
+    `finalize_ingestion`. Returns what the calling task should return.
+
+    Data is written to the physical collection `target`. With `swap`, the
+    logical `collection_name` is switched to `target` once every file made it.
+    """
+    from celery import chord
+
+    run_id = task.request.id
+    print(f"Ingestion plan for '{collection_name}' ({target}): {plan.summary()}")
+
+    # DELETE the vectors of removed files
+    manifest = Manifest()
+    stale_ids = [chunk_id for record in plan.deleted for chunk_id in record.chunk_ids]
+    if stale_ids:
+        delete_ids(open_vectorstore(target), stale_ids)
+    for record in plan.deleted:
+        manifest.delete(target, record.path)
+
+    for record in plan.touched:
+        manifest.upsert(target, record)
+
+    summary = {
+        "files": plan.summary(),
+        "chunks_deleted": len(stale_ids),
+        # Taken out of the lexical index at the end of the run
+        "deleted_ids": stale_ids,
+        # Every chunk of an unchanged file is an embedding call we did not make
+        "embedding_calls_saved": sum(len(record.chunk_ids) for record in plan.unchanged + plan.touched),
+        "changed": bool(plan.deleted),
+        "plan_seconds": round(time.perf_counter() - started, 3),
+        "started_at": time.time(),
+        "target": target,
+        "swap": swap,
+    }
+
+    # FAN OUT one task per new or changed file. Only file references travel
+    # through Redis; each task parses and embeds the file itself, and the
+    # writer commits it once the vectors it sent are stored.
+    header = [
+        ingest_file.s(target, asdict(record), [], run_id, from_cache) | commit_file.s(target, run_id)
+        for record in plan.added
+    ] + [
+        ingest_file.s(target, asdict(new), previous.chunk_ids, run_id, from_cache) | commit_file.s(target, run_id)
+        for previous, new in plan.updated
+    ]
+    start_progress(run_id, files_total=len(header))
+    if not header:
+        return finalize_ingestion([], collection_name, summary, run_id)
+
+    publish_progress(task, run_id, "ingesting")
+    # The chord callback inherits this task's id, so its result is the task result
+    return task.replace(chord(header, finalize_ingestion.s(collection_name, summary, run_id)))
+
+
+@celery_app.task(bind=True)
+def process_directory(self, directory_path: str, collection_name: str):
+    """
+    Celery task that brings a persistent ChromaDB collection up to date with a
+    directory. It only plans the work: every new or changed file becomes its own
+    `ingest_file` task, so parsing and embedding spread over all worker
+    processes, and `finalize_ingestion` runs once they are all done.
+    """
+    started = time.perf_counter()
     try:
         print(f"Starting to process directory: {directory_path} for collection: {collection_name}")
         # Check if the directory exists
         if not os.path.exists(directory_path):
             raise FileNotFoundError(f"Directory not found: {directory_path}")
-        
-        # 1. LOAD all documents from the directory
-        # Using the same DirectoryLoader logic you provided
-        loader = DirectoryLoader(directory_path, glob="**/*[.pdf,.docx,.doc]", use_multithreading=True)
-        documents = loader.load()
-
-        if not documents:
-            print(f"No documents found in {directory_path}")
-            return "No documents found to process."
-        
-        print(f"Successfully loaded {len(documents)} documents.")
-
-        # 2. SPLIT the documents into chunks
-        texts = text_splitter.split_documents(documents)
-        print(f"Documents split into {len(texts)} chunks.")
-
-        # 3. STORE the chunks in a persistent Chroma vector store
-        # This is the most important change. Instead of `from_documents` (which is for in-memory),
-        # we initialize Chroma with a persistent directory and collection name,
-        # then use `add_documents` to save the new chunks.
-        print(f"Storing chunks in ChromaDB collection: {collection_name}")
-        Chroma.from_documents(
-            documents=texts, 
-            embedding=embeddings,
-            persist_directory=CHROMA_PERSIST_DIR,
-            collection_name=collection_name
-        )
 
-        print(f"Successfully processed directory and saved to collection '{collection_name}'")
-        return f"Successfully processed {len(documents)} documents."
+        # Compare the directory with what was ingested last time
+        target = resolve_collection(collection_name)
+        plan = plan_directory(directory_path, Manifest().records(target))
+        return apply_plan(self, collection_name, plan, started, target)
 
+    except Ignore:
+        # Raised by `task.replace` once the chord is dispatched
+        raise
     except Exception as e:
         print(f"Error processing directory {directory_path}: {e}")
         # Add more robust error handling as needed
-        return f"Error processing directory: {e}"
\ No newline at end of file
+        return {"status": "error", "collection_name": collection_name, "error": str(e)}
+
+
+@celery_app.task(bind=True)
+def ingest_paths(self, paths: list, collection_name: str):
+    """
+    Targeted `process_directory` for a few files (used by the directory
+    watcher): only the given paths are checked, each new or changed one is
+    ingested and each one that no longer exists is deleted.
+    """
+    started = time.perf_counter()
+    try:
+        target = resolve_collection(collection_name)
+        plan = plan_paths(paths, Manifest().records(target))
+        return apply_plan(self, collection_name, plan, started, target)
+
+    except Ignore:
+        raise
+    except Exception as e:
+        print(f"Error ingesting {len(paths)} changed files: {e}")
+        return {"status": "error", "collection_name": collection_name, "error": str(e)}
+
+
+@celery_app.task(bind=True)
+def ingest_file(self, collection_name: str, record: dict, previous_ids: list, run_id: str = None, from_cache: bool = False):
+    """
+    Streams a single file through load -> split -> embed in bounded batches
+    and sends every embedded batch to `write_chunks` on the writer queue; this
+    task never opens Chroma itself. Its result goes to `commit_file`. Errors
+    are returned instead of raised so one bad file does not block the chord.
+
+    Parsed elements are cached by content hash; with `from_cache` the file
+    itself is never opened and a cache miss is an error.
+    """
+    record = FileRecord(**record)
+    try:
+        embeddings = get_embeddings()
+        embeddings.reset_stats()
+        get_embedding_client().reset_stats()
+        loader_stats = LoaderStats()
+
+        # Progress counters of the whole run are bumped after every embedded batch
+        reported = {"chunks": 0, "tokens": 0}
+        def on_batch(chunks_done: int, chunks_written: int):
+            if not run_id:
+                return
+            tokens = get_embedding_client().stats()["tokens"]
+            add_progress(
+                run_id,
+                chunks_embedded=chunks_done - reported["chunks"],
+                tokens_embedded=tokens - reported["tokens"],
+            )
+            reported.update(chunks=chunks_done, tokens=tokens)
+            publish_progress(self, run_id, "ingesting")
+
+        def write_batch(ids: list, chunks: list, vectors: list):
+            write_chunks.delay(
+                collection_name,
+                ids,
+                [chunk.page_content for chunk in chunks],
+                [chunk.metadata for chunk in chunks],
+                pack_vectors(vectors),
+                run_id,
+            )
+
+        if from_cache:
+            documents = load_from_cache(record.path, record.sha256, ParseCache(), loader_stats)
+        else:
+            documents = load_file_cached(record.path, record.sha256, ParseCache(), loader_stats)
+
+        # Chunk IDs are content-addressed, so unchanged chunks of a changed file are kept as they are.
+        stats = run_ingestion_pipeline(
+            documents,
+            source=record.path,
+            splitter=get_text_splitter(),
+            embeddings=embeddings,
+            write_batch=write_batch,
+            batch_size=INGEST_BATCH_SIZE,
+            queue_batches=INGEST_QUEUE_BATCHES,
+            known_ids=set(previous_ids),
+            # Enough batches at once to keep EMBEDDING_CONCURRENCY requests in flight
+            embed_concurrency=EMBEDDING_CONCURRENCY,
+            on_batch=on_batch,
+        )
+        record.chunk_ids = stats["chunk_ids"]
+        new_ids = set(record.chunk_ids)
+        known_ids = set(previous_ids)
+        print(f"Embedded {stats['chunks_written']} of {stats['chunks']} chunks from {record.path}")
+        return {
+            "path": record.path,
+            # Consumed by `commit_file`
+            "record": asdict(record),
+            # Chunks this run adds and removes, for the lexical index
+            "written_ids": [chunk_id for chunk_id in record.chunk_ids if chunk_id not in known_ids],
+            "stale_ids": [chunk_id for chunk_id in previous_ids if chunk_id not in new_ids],
+            "chunks": stats["chunks"],
+            "chunks_written": stats["chunks_written"],
+            "stage_seconds": stats["stage_seconds"],
+            "embedding_cache": embeddings.stats(),
+            "embedding_client": get_embedding_client().stats(),
+            "loaders": loader_stats.as_dict(),
+            "pdf_pages": loader_stats.pdf_pages,
+        }
+
+    except Exception as e:
+        print(f"Error ingesting file {record.path}: {e}")
+        if run_id:
+            add_progress(run_id, files_failed=1)
+        return {"path": record.path, "error": str(e)}
+
+
+@celery_app.task
+def write_chunks(collection_name: str, ids: list, documents: list, metadatas: list, vectors: str, run_id: str = None):
+    """Writer queue: upserts one embedded batch sent by `ingest_file`."""
+    vectorstore = open_vectorstore(collection_name)
+    vectors = unpack_vectors(vectors, len(ids))
+    size = max_batch_size(vectorstore)
+    for start in range(0, len(ids), size):
+        vectorstore._collection.upsert(
+            ids=ids[start:start + size],
+            embeddings=vectors[start:start + size],
+            documents=documents[start:start + size],
+            metadatas=metadatas[start:start + size],
+        )
+    if run_id:
+        add_progress(run_id, vectors_written=len(ids))
+
+
+@celery_app.task(bind=True)
+def commit_file(self, result: dict, collection_name: str, run_id: str = None):
+    """
+    Writer queue, after every `write_chunks` of the file: checks that all of
+    the file's chunks are stored, deletes its stale chunks and records it in
+    the manifest. A file with missing chunks is reported as failed and left
+    out of the manifest, so the next run ingests it again.
+    """
+    if "error" in result:
+        return result
+    record = FileRecord(**result.pop("record"))
+    stale_ids = result["stale_ids"]
+    try:
+        vectorstore = open_vectorstore(collection_name)
+        missing = set(record.chunk_ids) - existing_ids(vectorstore, record.chunk_ids)
+        if missing:
+            # Chunks the manifest still lists would be skipped as stored next time
+            manifest = Manifest()
+            previous = manifest.records(collection_name).get(record.path)
+            if previous:
+                previous.chunk_ids = [chunk_id for chunk_id in previous.chunk_ids if chunk_id not in missing]
+                manifest.upsert(collection_name, previous)
+            raise RuntimeError(f"{len(missing)} of {len(record.chunk_ids)} chunks were not written")
+        delete_ids(vectorstore, stale_ids)
+        Manifest().upsert(collection_name, record)
+    except Exception as e:
+        print(f"Error committing file {record.path}: {e}")
+        if run_id:
+            add_progress(run_id, files_failed=1)
+        return {"path": record.path, "error": str(e)}
+
+    print(f"Stored {result['chunks_written']} of {result['chunks']} chunks from {record.path}")
+    if run_id:
+        add_progress(run_id, files_done=1)
+        publish_progress(self, run_id, "ingesting")
+    return {**result, "chunks_deleted": len(stale_ids)}
+
+
+@celery_app.task(bind=True)
+def reindex_directory(self, directory_path: str, collection_name: str):
+    """
+    Full reindex of a directory into a new version of the collection. Chat
+    keeps reading the current version until the new one is complete, then the
+    logical name is swapped to it. Parsed documents and embeddings come from
+    the worker caches where possible.
+
+    The new version only holds this directory, even if the collection was
+    also fed from others.
+    """
+    started = time.perf_counter()
+    try:
+        if not os.path.exists(directory_path):
+            raise FileNotFoundError(f"Directory not found: {directory_path}")
+
+        target = CollectionCatalog().create(collection_name)
+        plan = plan_directory(directory_path, {})
+        return apply_plan(self, collection_name, plan, started, target, swap=True)
+
+    except Ignore:
+        raise
+    except Exception as e:
+        print(f"Error reindexing directory {directory_path}: {e}")
+        return {"status": "error", "collection_name": collection_name, "error": str(e)}
+
+
+@celery_app.task(bind=True)
+def rebuild_collection(self, collection_name: str):
+    """
+    Re-chunks and re-embeds every file of a collection from the parse cache
+    alone, e.g. after changing the chunker or the embedding model; the source
+    files are not read. Like `reindex_directory`, it builds a new version and
+    swaps to it, so it is only swapped in if every file was in the cache.
+    """
+    started = time.perf_counter()
+    try:
+        records = Manifest().records(resolve_collection(collection_name))
+        target = CollectionCatalog().create(collection_name)
+        plan = IngestionPlan(added=[
+            FileRecord(record.path, record.size, record.mtime, record.sha256) for record in records.values()
+        ])
+        return apply_plan(self, collection_name, plan, started, target, swap=True, from_cache=True)
+
+    except Ignore:
+        raise
+    except Exception as e:
+        print(f"Error rebuilding collection {collection_name}: {e}")
+        return {"status": "error", "collection_name": collection_name, "error": str(e)}
+
+
+@celery_app.task
+def gc_collections():
+    """
+    Deletes collection versions retired more than COLLECTION_GC_GRACE_SECONDS
+    ago, with their lexical index and manifest rows. The version a logical
+    name currently points at is never deleted.
+    """
+    catalog = CollectionCatalog()
+    deleted = []
+    for logical, physical in catalog.retired(COLLECTION_GC_GRACE_SECONDS):
+        if resolve_collection(logical) == physical:
+            continue
+        try:
+            open_vectorstore(physical).delete_collection()
+        except Exception as e:
+            # Never created (e.g. an empty abandoned version) or already gone
+            print(f"Could not delete collection '{physical}': {e}")
+        shutil.rmtree(index_path(CHROMA_PERSIST_DIR, physical), ignore_errors=True)
+        Manifest().delete_collection(physical)
+        catalog.mark_deleted(physical)
+        deleted.append(physical)
+    if deleted:
+        print(f"Deleted retired collections: {', '.join(deleted)}")
+    return deleted
+
+
+@celery_app.task
+def finalize_ingestion(results: list, collection_name: str, summary: dict, run_id: str = None):
+    """Chord callback: publishes the new collection version and builds the task result."""
+    started = time.perf_counter()
+    succeeded = [result for result in results if "error" not in result]
+    failed = [result for result in results if "error" in result]
+    chunks_written = sum(result["chunks_written"] for result in succeeded)
+
+    target = summary.get("target", collection_name)
+    if summary.get("swap") and not failed and not sum(result["chunks"] for result in succeeded):
+        # No files (a directory without documents, or a rebuild of a collection the
+        # manifest does not know) or no text: swapping would wipe the live version
+        CollectionCatalog().abandon(target)
+        gc_collections.apply_async(countdown=COLLECTION_GC_GRACE_SECONDS)
+        print(f"Not swapping '{collection_name}' to '{target}': the new version is empty.", summary["files"])
+        return {
+            "status": "error",
+            "collection_name": collection_name,
+            "physical_collection": target,
+            "swapped": False,
+            "files": summary["files"],
+            "error": f"The new version of '{collection_name}' has no chunks; the current version is kept.",
+        }
+
+    # Updated before readers are pointed at the new data, so both change together
+    lexical_index = None
+    if summary.get("swap"):
+        if not failed:
+            lexical_index = build_lexical_index(target)
+    else:
+        added_ids = [chunk_id for result in succeeded for chunk_id in result["written_ids"]]
+        deleted_ids = summary["deleted_ids"] + [chunk_id for result in succeeded for chunk_id in result["stale_ids"]]
+        if added_ids or deleted_ids:
+            lexical_index = update_lexical_index(target, added_ids, deleted_ids)
+
+    swapped = False
+    if summary.get("swap"):
+        if failed:
+            # An incomplete version is never served; it is garbage-collected instead
+            CollectionCatalog().abandon(summary["target"])
+        else:
+            previous = resolve_collection(collection_name)
+            # Readers follow the alias on their next version check
+            swap_collection_alias(collection_name, summary["target"])
+            CollectionCatalog().activate(collection_name, summary["target"], previous)
+            swapped = True
+        gc_collections.apply_async(countdown=COLLECTION_GC_GRACE_SECONDS)
+    elif summary["changed"] or succeeded:
+        # Tell API processes holding this collection open to reload it
+        bump_collection_version(collection_name)
+
+    progress = read_progress(run_id) if run_id else {}
+    result = {
+        "status": "completed",
+        "message": f"Successfully processed directory into collection '{collection_name}'.",
+        "collection_name": collection_name,
+        "physical_collection": target,
+        "swapped": swapped,
+        "lexical_index": lexical_index,
+        "files": summary["files"],
+        "chunks_written": chunks_written,
+        "chunks_deleted": summary["chunks_deleted"] + sum(result["chunks_deleted"] for result in succeeded),
+        # Chunks already stored with the same ID were not embedded again either
+        "embedding_calls_saved": summary["embedding_calls_saved"]
+        + sum(result["chunks"] - result["chunks_written"] for result in succeeded),
+        # Worker seconds per pipeline stage, summed over all files
+        "stage_seconds": merge_stage_seconds([result["stage_seconds"] for result in succeeded]),
+        "embedding_cache": merge_cache_stats([result["embedding_cache"] for result in succeeded]),
+        "embedding_client": merge_client_stats([result["embedding_client"] for result in succeeded]),
+        # Files parsed and seconds spent per loader (pypdfium2, python-docx, unstructured)
+        "loaders": merge_loader_stats([result["loaders"] for result in succeeded]),
+        # Per PDF: pages read from the text layer vs OCRed, and OCR seconds saved
+        "pdf_pages": merge_pdf_pages([result["pdf_pages"] for result in succeeded]),
+        "failed_files": failed,
+        "tokens_embedded": progress.get("tokens_embedded", 0),
+        "timings": {
+            "plan_seconds": summary["plan_seconds"],
+            # Wall-clock time from the end of planning until every file was done
+            "ingest_wall_seconds": round(time.time() - summary["started_at"], 3),
+            "finalize_seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+    print(result["message"], result["files"])
+    return result
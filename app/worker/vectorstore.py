@@ -0,0 +1,104 @@
+import hashlib
+import os
+from typing import Iterable, List, Set
+
+# Used when the Chroma client cannot tell us its limit
+DEFAULT_MAX_BATCH_SIZE = 5000
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, index: int, text: str) -> str:
+    """
+    Content-addressed chunk ID: the same chunk of the same file always gets the
+    same ID, so writing it again is an upsert instead of a duplicate.
+    """
+    return hashlib.sha256(f"{source}\0{index}\0{content_hash(text)}".encode("utf-8")).hexdigest()
+
+
+def max_batch_size(vectorstore) -> int:
+    try:
+        return vectorstore._client.get_max_batch_size()
+    except Exception:
+        return DEFAULT_MAX_BATCH_SIZE
+
+
+def _batches(items: list, size: int) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_ids(vectorstore, ids: List[str]) -> Set[str]:
+    found = set()
+    for batch in _batches(ids, max_batch_size(vectorstore)):
+        found.update(vectorstore._collection.get(ids=batch, include=[])["ids"])
+    return found
+
+
+def delete_ids(vectorstore, ids: List[str]) -> None:
+    for batch in _batches(list(ids), max_batch_size(vectorstore)):
+        vectorstore.delete(ids=batch)
+
+
+def get_documents(vectorstore, ids: List[str]) -> Iterable[tuple]:
+    """(id, text) of the given chunks, fetched in batches; IDs not stored are skipped."""
+    for batch in _batches(list(ids), max_batch_size(vectorstore)):
+        page = vectorstore._collection.get(ids=batch, include=["documents"])
+        yield from zip(page["ids"], page["documents"])
+
+
+def iter_documents(vectorstore) -> Iterable[tuple]:
+    """(id, text) of every chunk in the collection, read page by page."""
+    collection = vectorstore._collection
+    page_size = max_batch_size(vectorstore)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield from zip(page["ids"], page["documents"])
+        offset += len(page["ids"])
+
+
+def dedupe_collection(vectorstore, keep_ids: Set[str] = frozenset()) -> int:
+    """
+    Removes chunks that repeat the same text from the same source, left behind
+    by ingestion runs that used random IDs. IDs in `keep_ids` (the ones the
+    manifest knows about) win over their duplicates. Returns how many were removed.
+
+    Chunks of the current pipeline carry a `chunk_index`: the same text at two
+    positions of a file is kept twice. Older chunks have none and duplicate
+    any chunk of the same source and text.
+    """
+    collection = vectorstore._collection
+    page_size = max_batch_size(vectorstore)
+    groups = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for id_, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            metadata = metadata or {}
+            # Older runs stored the source relative to the worker's directory, newer ones absolute
+            source = metadata.get("source")
+            key = (os.path.abspath(source) if source else source, content_hash(document or ""))
+            groups.setdefault(key, {}).setdefault(metadata.get("chunk_index"), []).append(id_)
+        offset += len(page["ids"])
+
+    duplicates = []
+    for positions in groups.values():
+        legacy = positions.pop(None, [])
+        if positions:
+            # An indexed copy exists, so every unindexed one is redundant
+            duplicates.extend(legacy)
+        elif legacy:
+            positions[None] = legacy
+        for ids in positions.values():
+            keep = next((id_ for id_ in ids if id_ in keep_ids), ids[0])
+            duplicates.extend(id_ for id_ in ids if id_ != keep)
+
+    delete_ids(vectorstore, duplicates)
+    return len(duplicates)
@@ -0,0 +1,61 @@
+"""
+Watches document directories and ingests what changes, file by file.
+
+    python -m app.worker.watcher [directory ...] [--collection NAME]
+
+Bursts of filesystem events are debounced into one `ingest_paths` task per
+burst, so a new file becomes searchable within seconds without reprocessing
+the whole directory.
+"""
+import argparse
+import os
+
+from app.core.config import DEFAULT_COLLECTION_NAME, WATCH_DEBOUNCE_MS, WATCH_DIRECTORIES, WATCH_MAX_WAIT_MS
+from app.worker.manifest import is_document
+from app.worker.tasks import ingest_paths, process_directory
+
+
+def watch_filter(change, path: str) -> bool:
+    return is_document(path)
+
+
+def watch_directories(directories: list, collection_name: str, debounce_ms: int = WATCH_DEBOUNCE_MS, max_wait_ms: int = WATCH_MAX_WAIT_MS) -> None:
+    from watchfiles import watch
+
+    # watchfiles yields once no change arrived for `step` ms, or after `debounce` ms at most
+    changes_iter = watch(*directories, watch_filter=watch_filter, step=debounce_ms, debounce=max(max_wait_ms, debounce_ms))
+    for changes in changes_iter:
+        # The task re-checks every path: added, modified and deleted are all just "look again"
+        paths = sorted({os.path.abspath(path) for _, path in changes})
+        task = ingest_paths.delay(paths, collection_name)
+        print(f"Queued {len(paths)} changed files for '{collection_name}' (task {task.id})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.worker.watcher")
+    parser.add_argument("directories", nargs="*", default=WATCH_DIRECTORIES)
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION_NAME)
+    parser.add_argument("--debounce-ms", type=int, default=WATCH_DEBOUNCE_MS)
+    parser.add_argument(
+        "--no-initial-sync",
+        action="store_true",
+        help="Do not process the directories once at start-up to pick up changes made while not watching",
+    )
+    args = parser.parse_args()
+
+    directories = [os.path.abspath(directory) for directory in args.directories]
+    for directory in directories:
+        if not os.path.isdir(directory):
+            parser.error(f"Directory not found: {directory}")
+
+    if not args.no_initial_sync:
+        for directory in directories:
+            task = process_directory.delay(directory, args.collection)
+            print(f"Queued initial sync of {directory} (task {task.id})")
+
+    print(f"Watching {', '.join(directories)} for '{args.collection}'")
+    watch_directories(directories, args.collection, args.debounce_ms)
+
+
+if __name__ == "__main__":
+    main()
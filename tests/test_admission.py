@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import AdmissionController, hold_slot
+
+
+def make_controller(**kwargs):
+    options = {"max_in_flight": 1, "max_queue": 1, "queue_timeout": 5, "retry_after": 3, **kwargs}
+    return AdmissionController("test", **options)
+
+
+def test_queued_request_gets_the_released_slot():
+    async def run():
+        controller = make_controller()
+        first = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        first.release()
+        second = await asyncio.wait_for(waiting, 1)
+        second.release()
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected_with_429():
+    async def run():
+        controller = make_controller()
+        slot = await controller.acquire()
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as rejected:
+            await controller.acquire()
+        slot.release()
+        (await queued).release()
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 429
+    assert rejected.headers == {"Retry-After": "3"}
+
+
+def test_queue_timeout_is_rejected_with_503():
+    async def run():
+        controller = make_controller(queue_timeout=0.01)
+        slot = await controller.acquire()
+        try:
+            with pytest.raises(HTTPException) as rejected:
+                await controller.acquire()
+        finally:
+            slot.release()
+        return rejected.value
+
+    assert asyncio.run(run()).status_code == 503
+
+
+def test_release_is_idempotent_and_hold_slot_releases_when_the_stream_ends():
+    async def stream():
+        yield "a"
+        yield "b"
+
+    async def run():
+        controller = make_controller(max_in_flight=2)
+        slot = await controller.acquire()
+        slot.release()
+        slot.release()
+        assert controller._in_flight == 0
+
+        slot = await controller.acquire()
+        assert [chunk async for chunk in hold_slot(slot, stream())] == ["a", "b"]
+        assert controller._in_flight == 0
+        # Both permits are free again
+        await asyncio.wait_for(controller.acquire(), 1)
+        await asyncio.wait_for(controller.acquire(), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+from app.services import answer_cache
+from app.services.answer_cache import SemanticAnswerCache
+
+
+def make_cache(**kwargs):
+    return SemanticAnswerCache(**{"max_distance": 0.02, "max_entries": 10, "ttl": 60, **kwargs})
+
+
+def test_near_duplicate_question_hits():
+    cache = make_cache()
+    cache.store("docs", 1, [1.0, 0.0], question="q", answer="a", tokens=10)
+
+    assert cache.lookup("docs", 1, [1.0, 0.01]).answer == "a"
+    # Same direction, different length: still the same question
+    assert cache.lookup("docs", 1, [3.0, 0.0]).answer == "a"
+
+
+def test_distant_question_misses():
+    cache = make_cache()
+    cache.store("docs", 1, [1.0, 0.0], question="q", answer="a", tokens=10)
+
+    # Cosine distance ~0.03, over the 0.02 default
+    assert cache.lookup("docs", 1, [1.0, 0.25]) is None
+
+
+def test_expired_best_match_does_not_hide_a_valid_one(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    cache = make_cache(ttl=10)
+    cache.store("docs", 1, [1.0, 0.0], question="old", answer="stale", tokens=10)
+    now[0] = 105.0
+    cache.store("docs", 1, [1.0, 0.1], question="new", answer="fresh", tokens=10)
+
+    now[0] = 111.0
+    assert cache.lookup("docs", 1, [1.0, 0.0]).answer == "fresh"
+    now[0] = 116.0
+    assert cache.lookup("docs", 1, [1.0, 0.0]) is None
+
+
+def test_new_collection_version_invalidates_answers():
+    cache = make_cache()
+    cache.store("docs", 1, [1.0, 0.0], question="q", answer="a", tokens=10)
+
+    assert cache.lookup("docs", 2, [1.0, 0.0]) is None
+    assert cache.lookup("other", 1, [1.0, 0.0]) is None
@@ -0,0 +1,53 @@
+import pytest
+
+from app.worker import catalog
+from app.worker.catalog import CollectionCatalog
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(catalog.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def versions(tmp_path):
+    return CollectionCatalog(db_path=str(tmp_path / "collections.sqlite3"))
+
+
+def test_each_build_gets_the_next_version(versions, clock):
+    assert versions.create("docs") == "docs__v1"
+    assert versions.create("docs") == "docs__v2"
+    assert versions.create("hr") == "hr__v1"
+
+
+def test_swapped_out_versions_are_retired_after_the_grace_period(versions, clock):
+    first = versions.create("docs")
+    # Swapping away from the collection in use before versioning existed
+    versions.activate("docs", first, previous="docs")
+    second = versions.create("docs")
+    clock[0] += 10
+    versions.activate("docs", second, previous=first)
+
+    assert versions.retired(grace_seconds=60) == []
+    clock[0] += 61
+    assert sorted(versions.retired(grace_seconds=60)) == [("docs", "docs"), ("docs", first)]
+
+
+def test_reactivating_the_live_version_does_not_retire_it(versions, clock):
+    first = versions.create("docs")
+    versions.activate("docs", first, previous=first)
+    clock[0] += 60
+
+    assert versions.retired(grace_seconds=0) == []
+
+
+def test_abandoned_versions_are_collected_until_deleted(versions, clock):
+    building = versions.create("docs")
+    versions.abandon(building)
+    clock[0] += 60
+
+    assert versions.retired(grace_seconds=30) == [("docs", building)]
+    versions.mark_deleted(building)
+    assert versions.retired(grace_seconds=30) == []
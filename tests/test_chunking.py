@@ -0,0 +1,120 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.worker import chunking
+from app.worker.chunking import StructureChunker, get_chunker, merge_elements
+
+
+class WordEncoder:
+    """One token per whitespace-separated word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Deterministic token counts without loading a tiktoken encoding
+    monkeypatch.setattr(chunking, "count_tokens", lambda text, model=None: len(text.split()))
+    monkeypatch.setattr(chunking, "get_encoder", lambda model=None: WordEncoder())
+
+
+def element(text, category, source="/data/a.docx", **metadata):
+    return Document(page_content=text, metadata={"source": source, "category": category, **metadata})
+
+
+def heading(text, level, **kwargs):
+    return element(text, "Title", heading_level=level, **kwargs)
+
+
+def chunk(max_tokens, documents, overlap_tokens=0):
+    chunker = StructureChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, model="test")
+    return list(chunker.split_documents(documents))
+
+
+def test_headings_start_chunks_and_are_kept_as_section_path():
+    chunks = chunk(50, [
+        heading("Cuti", 1),
+        element("Karyawan berhak atas cuti tahunan.", "NarrativeText"),
+        heading("Cuti Sakit", 2),
+        element("Wajib surat dokter.", "ListItem"),
+        heading("Lembur", 1),
+        element("Lembur dibayar per jam.", "NarrativeText"),
+    ])
+
+    assert [c.page_content for c in chunks] == [
+        "Cuti\n\nKaryawan berhak atas cuti tahunan.",
+        "Cuti Sakit\n\nWajib surat dokter.",
+        "Lembur\n\nLembur dibayar per jam.",
+    ]
+    assert [c.metadata["section"] for c in chunks] == ["Cuti", "Cuti > Cuti Sakit", "Lembur"]
+    assert [c.metadata["tokens"] for c in chunks] == [6, 5, 5]
+    assert all(c.metadata["source"] == "/data/a.docx" for c in chunks)
+
+
+def test_elements_are_packed_up_to_max_tokens_without_being_cut():
+    chunks = chunk(5, [element(text, "ListItem") for text in ("satu dua", "tiga empat", "lima enam", "tujuh")])
+
+    assert [c.page_content for c in chunks] == ["satu dua\n\ntiga empat", "lima enam\n\ntujuh"]
+    assert all(c.metadata["tokens"] <= 5 for c in chunks)
+
+
+def test_a_heading_without_body_produces_no_chunk():
+    chunks = chunk(50, [heading("Bab 1", 1), heading("Bab 2", 1), element("Isi.", "NarrativeText")])
+
+    assert [c.page_content for c in chunks] == ["Bab 2\n\nIsi."]
+    assert chunks[0].metadata["section"] == "Bab 2"
+
+
+def test_an_oversized_element_is_split_into_overlapping_windows():
+    words = " ".join(f"w{i}" for i in range(10))
+    chunks = chunk(4, [element(words, "NarrativeText")], overlap_tokens=1)
+
+    assert [c.page_content for c in chunks] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+
+def test_sections_and_pages_never_share_a_chunk():
+    chunks = chunk(50, [
+        heading("Bagian A", 1, source="/data/a.docx"),
+        element("Teks A.", "NarrativeText", source="/data/a.docx"),
+        element("Teks B.", "NarrativeText", source="/data/b.docx"),
+        Document(page_content="Halaman satu.\n\nParagraf dua.", metadata={"source": "/data/c.pdf", "page_number": 1}),
+        Document(page_content="Halaman dua.", metadata={"source": "/data/c.pdf", "page_number": 2}),
+    ])
+
+    assert [c.page_content for c in chunks] == [
+        "Bagian A\n\nTeks A.",
+        "Teks B.",
+        "Halaman satu.\n\nParagraf dua.",
+        "Halaman dua.",
+    ]
+    # A new file starts without the previous file's headings
+    assert [c.metadata["section"] for c in chunks] == ["Bagian A", "", "", ""]
+    assert [c.metadata.get("page_number") for c in chunks] == [None, None, 1, 2]
+
+
+def test_uncategorized_text_is_split_at_blank_lines_when_too_long():
+    document = Document(page_content="satu dua tiga\n\nempat lima enam", metadata={"source": "/data/c.pdf"})
+
+    assert [c.page_content for c in chunk(4, [document])] == ["satu dua tiga", "empat lima enam"]
+
+
+def test_merge_elements_joins_elements_per_unit():
+    merged = list(merge_elements([
+        element("a", "Title"),
+        element("b", "NarrativeText"),
+        element("c", "NarrativeText", source="/data/b.docx"),
+    ]))
+
+    assert [(d.page_content, d.metadata) for d in merged] == [
+        ("a\n\nb", {"source": "/data/a.docx"}),
+        ("c", {"source": "/data/b.docx"}),
+    ]
+
+
+def test_unknown_chunker_is_rejected():
+    with pytest.raises(ValueError):
+        get_chunker("sentences", 300, 20, "test")
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from app.services import collection_registry
+from app.services.collection_registry import CollectionRegistry
+
+
+class FakeVectorstore:
+    def __init__(self, name):
+        self.name = name
+
+    def as_retriever(self):
+        return f"retriever:{self.name}"
+
+
+@pytest.fixture(autouse=True)
+def collection_state(monkeypatch):
+    # Every collection is at version 1 under its own name
+    monkeypatch.setattr(collection_registry, "get_collection_state", lambda name: (1, name))
+
+
+def test_open_of_one_collection_does_not_block_others():
+    slow_open_started = threading.Event()
+    release_slow_open = threading.Event()
+    opened = []
+
+    def open_vectorstore(name):
+        opened.append(name)
+        if name == "slow":
+            slow_open_started.set()
+            assert release_slow_open.wait(5)
+        return FakeVectorstore(name)
+
+    registry = CollectionRegistry(open_vectorstore, max_size=4, check_interval=60)
+    slow = threading.Thread(target=registry.get, args=("slow",))
+    slow.start()
+    assert slow_open_started.wait(5)
+
+    # Served while "slow" is still opening
+    assert registry.get("fast").vectorstore.name == "fast"
+
+    release_slow_open.set()
+    slow.join(5)
+    assert registry.get("slow").vectorstore.name == "slow"
+    assert sorted(opened) == ["fast", "slow"]
+
+
+def test_concurrent_misses_open_a_collection_once():
+    opened = []
+    barrier = threading.Barrier(8)
+
+    def open_vectorstore(name):
+        opened.append(name)
+        return FakeVectorstore(name)
+
+    registry = CollectionRegistry(open_vectorstore, max_size=4, check_interval=60)
+    handles = []
+
+    def lookup():
+        barrier.wait()
+        handles.append(registry.get("docs"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert opened == ["docs"]
+    assert len({id(handle) for handle in handles}) == 1
+
+
+def test_open_locks_do_not_outlive_the_open():
+    def open_vectorstore(name):
+        if name.startswith("missing"):
+            raise ValueError(f"Collection {name} does not exist")
+        return FakeVectorstore(name)
+
+    registry = CollectionRegistry(open_vectorstore, max_size=4, check_interval=60)
+    registry.get("docs")
+    for index in range(100):
+        with pytest.raises(ValueError):
+            registry.get(f"missing-{index}")
+
+    assert registry._open_locks == {}
+
+def test_least_recently_used_collection_is_evicted():
+    registry = CollectionRegistry(FakeVectorstore, max_size=2, check_interval=60)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+
+    assert [item["name"] for item in registry.stats()] == ["c", "a"]
+
+
+def test_storage_is_released_once_closed_collections_exceed_the_budget():
+    releases = []
+    registry = CollectionRegistry(
+        FakeVectorstore,
+        max_size=8,
+        check_interval=60,
+        max_bytes=250,
+        estimate_bytes=lambda vectorstore: 100,
+        release_storage=lambda: releases.append(True),
+    )
+    registry.get("a")
+    registry.get("b")
+    # "a" is closed but its segment is still resident: 300 bytes
+    registry.get("c")
+    assert [item["name"] for item in registry.stats()] == ["c", "b"]
+    assert releases == []
+
+    # Over budget with a closed collection: the storage client and every handle go
+    registry.get("d")
+    assert releases == [True]
+    assert [item["name"] for item in registry.stats()] == ["d"]
+
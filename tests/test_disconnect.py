@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.helpers.disconnect import CLIENT_CLOSED_REQUEST, cancel_on_disconnect
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.disconnect_after = disconnect_after
+        self.polls = 0
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.disconnect_after is not None and self.polls > self.disconnect_after
+
+
+def test_result_is_returned_while_the_client_is_connected():
+    async def answer():
+        await asyncio.sleep(0.01)
+        return "Dua belas hari kerja."
+
+    assert asyncio.run(cancel_on_disconnect(FakeRequest(), answer())) == "Dua belas hari kerja."
+
+
+def test_work_is_cancelled_when_the_client_disconnects():
+    cancelled = []
+
+    async def answer():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        return await asyncio.wait_for(cancel_on_disconnect(FakeRequest(disconnect_after=0), answer()), 5)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(run())
+    assert raised.value.status_code == CLIENT_CLOSED_REQUEST
+    assert cancelled == [True]
+
+
+def test_errors_of_the_work_propagate():
+    async def answer():
+        raise ValueError("retrieval failed")
+
+    with pytest.raises(ValueError):
+        asyncio.run(cancel_on_disconnect(FakeRequest(), answer()))
@@ -0,0 +1,175 @@
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from redis import RedisError
+
+from app.worker import embedder
+from app.worker.embedder import BudgetedEmbeddings, RedisRateLimiter
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        if self.redis.down:
+            raise RedisError("connection refused")
+        results = []
+        for name, (key, *args) in self.commands:
+            if name in ("incr", "incrby", "decr", "decrby"):
+                amount = args[0] if args else 1
+                self.redis.data[key] = self.redis.data.get(key, 0) + (-amount if name.startswith("decr") else amount)
+                results.append(self.redis.data[key])
+            else:
+                results.append(True)
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time: sleeping advances it instead of blocking."""
+    now = [600.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(embedder.time, "time", lambda: now[0])
+    monkeypatch.setattr(embedder.time, "sleep", sleep)
+    return sleeps
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(embedder, "get_redis", lambda: redis)
+    return redis
+
+
+def test_requests_over_the_minute_budget_wait_for_the_next_window(redis, clock):
+    limiter = RedisRateLimiter("embeddings", rpm=2, tpm=0)
+
+    assert limiter.acquire(10) == 0.0
+    assert limiter.acquire(10) == 0.0
+    waited = limiter.acquire(10)
+
+    assert len(clock) == 1 and 60 <= waited <= 61
+    # The rejected attempt was given back to the old window
+    assert redis.data["onbi:ratelimit:embeddings:rpm:10"] == 2
+    assert redis.data["onbi:ratelimit:embeddings:rpm:11"] == 1
+
+
+def test_a_window_admits_its_first_request_even_over_the_token_budget(redis, clock):
+    limiter = RedisRateLimiter("embeddings", rpm=0, tpm=100)
+
+    assert limiter.acquire(500) == 0.0
+    assert clock == []
+
+
+def test_rate_limiter_is_skipped_without_redis(redis, clock):
+    redis.down = True
+
+    assert RedisRateLimiter("embeddings", rpm=1, tpm=1).acquire(10) == 0.0
+
+
+class NoLimit:
+    def acquire(self, tokens):
+        return 0.0
+
+
+class FakeClient:
+    """Embeds a text as [its length]; fails with each of `errors` first."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.requests = []
+        self.embeddings = self
+
+    def create(self, model, input):
+        self.requests.append(list(input))
+        if self.errors:
+            raise self.errors.pop(0)
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        # The API does not promise any order
+        return SimpleNamespace(data=data[::-1], usage=SimpleNamespace(total_tokens=sum(len(t) for t in input)))
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+def make_embeddings(client, **kwargs):
+    options = {"max_request_tokens": 10, "max_request_inputs": 3, "concurrency": 2, "max_retries": 2, **kwargs}
+    return BudgetedEmbeddings(client, "text-embedding-ada-002", rate_limiter=NoLimit(), **options)
+
+
+@pytest.fixture(autouse=True)
+def token_counts(monkeypatch):
+    # One token per character, without loading a tiktoken encoding
+    monkeypatch.setattr(embedder, "count_tokens", lambda text, model=None: len(text))
+
+
+def test_texts_are_packed_within_the_token_and_input_limits():
+    embeddings = make_embeddings(FakeClient())
+
+    requests = embeddings.pack(["aaaa", "bbbb", "cc", "ddd", "e", "f", "g", "hhhhhhhhhhhh"])
+
+    assert requests == [
+        (0, ["aaaa", "bbbb", "cc"], 10),
+        (3, ["ddd", "e", "f"], 5),
+        (6, ["g"], 1),
+        # A text over the limit still gets a request of its own
+        (7, ["hhhhhhhhhhhh"], 12),
+    ]
+
+
+def test_vectors_come_back_in_input_order_across_requests():
+    client = FakeClient()
+    texts = ["aaaa", "bbbb", "ccc", "d", "e", "f", "g"]
+
+    vectors = make_embeddings(client).embed_documents(texts)
+
+    assert vectors == [[float(len(text))] for text in texts]
+    assert len(client.requests) == 3
+
+
+def test_transient_errors_are_retried_with_backoff(clock):
+    client = FakeClient(errors=[connection_error(), connection_error()])
+    embeddings = make_embeddings(client)
+
+    assert embeddings.embed_documents(["aa"]) == [[2.0]]
+    assert len(client.requests) == 3
+    assert len(clock) == 2
+    assert embeddings.stats()["retries"] == 2
+
+
+def test_retries_give_up_after_max_retries(clock):
+    client = FakeClient(errors=[connection_error()] * 3)
+
+    with pytest.raises(openai.APIConnectionError):
+        make_embeddings(client, max_retries=2).embed_documents(["aa"])
+    assert len(client.requests) == 3
+
+
+def test_other_errors_are_not_retried(clock):
+    client = FakeClient(errors=[ValueError("bad input")])
+
+    with pytest.raises(ValueError):
+        make_embeddings(client).embed_documents(["aa"])
+    assert len(client.requests) == 1
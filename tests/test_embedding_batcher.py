@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.services import embedding_batcher
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+@pytest.fixture(autouse=True)
+def token_counts(monkeypatch):
+    # One token per character, without loading a tiktoken encoding
+    monkeypatch.setattr(embedding_batcher, "count_tokens", lambda text, model=None: len(text))
+
+
+class FakeEmbeddings:
+    def __init__(self, fail=False):
+        self.requests = []
+        self.fail = fail
+
+    async def aembed_documents(self, texts):
+        self.requests.append(list(texts))
+        if self.fail:
+            raise RuntimeError("embeddings API down")
+        return [[float(len(text))] for text in texts]
+
+
+def make_batcher(embeddings, **kwargs):
+    options = {"window": 0.01, "max_batch_size": 16, "max_tokens": 8000, **kwargs}
+    return EmbeddingBatcher(embeddings, model_name="text-embedding-ada-002", **options)
+
+
+def test_concurrent_queries_share_one_request():
+    embeddings = FakeEmbeddings()
+    batcher = make_batcher(embeddings)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed_query(text) for text in ("a", "bb", "a")))
+
+    assert asyncio.run(run()) == [[1.0], [2.0], [1.0]]
+    # Identical questions in one window are embedded once
+    assert embeddings.requests == [["a", "bb"]]
+    assert not batcher._in_flight
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    embeddings = FakeEmbeddings()
+    batcher = make_batcher(embeddings, window=60, max_batch_size=2)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(batcher.embed_query("a"), batcher.embed_query("b")), 5)
+
+    asyncio.run(run())
+    assert embeddings.requests == [["a", "b"]]
+
+
+def test_token_budget_splits_batches():
+    embeddings = FakeEmbeddings()
+    batcher = make_batcher(embeddings, max_tokens=3)
+
+    async def run():
+        return await asyncio.gather(batcher.embed_query("ab"), batcher.embed_query("cd"))
+
+    asyncio.run(run())
+    assert embeddings.requests == [["ab"], ["cd"]]
+
+
+def test_errors_reach_every_waiter():
+    batcher = make_batcher(FakeEmbeddings(fail=True))
+
+    async def run():
+        return await asyncio.gather(batcher.embed_query("a"), batcher.embed_query("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not batcher._in_flight
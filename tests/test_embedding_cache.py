@@ -0,0 +1,58 @@
+import pytest
+
+from app.worker import embedding_cache
+from app.worker.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+MODEL = "text-embedding-ada-002"
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.requests = []
+
+    def embed_documents(self, texts):
+        self.requests.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(db_path=str(tmp_path / "embedding_cache.sqlite3"), max_bytes=10**9)
+
+
+def test_only_new_texts_are_sent_to_the_model(cache):
+    embeddings = FakeEmbeddings()
+    cached = CachedEmbeddings(embeddings, MODEL, cache)
+
+    assert cached.embed_documents(["cuti", "lembur"]) == [[4.0, 0.5], [6.0, 0.5]]
+    assert cached.embed_documents(["lembur", "gaji", "gaji"]) == [[6.0, 0.5], [4.0, 0.5], [4.0, 0.5]]
+
+    # A text repeated within one call is embedded once too
+    assert embeddings.requests == [["cuti", "lembur"], ["gaji"]]
+    assert cached.stats() == {"hits": 1, "misses": 3, "hit_ratio": 0.25, "bytes_saved": len("lembur")}
+
+
+def test_another_model_does_not_share_vectors(cache):
+    embeddings = FakeEmbeddings()
+    CachedEmbeddings(embeddings, MODEL, cache).embed_documents(["cuti"])
+
+    CachedEmbeddings(embeddings, "text-embedding-3-small", cache).embed_documents(["cuti"])
+
+    assert embeddings.requests == [["cuti"], ["cuti"]]
+
+
+def test_least_recently_used_vectors_are_evicted(cache, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    keys = [cache.key(MODEL, text) for text in ("a", "b", "c")]
+    for key in keys:
+        cache.put_many({key: [1.0, 2.0]})
+        now[0] += 1
+    cache.get_many([keys[0]])
+    now[0] += 1
+
+    # Two float32 vectors of two dimensions
+    cache.max_bytes = 16
+    assert cache.evict() == 1
+
+    assert set(cache.get_many(keys)) == {keys[0], keys[2]}
@@ -0,0 +1,78 @@
+from langchain_core.documents import Document
+
+from app.helpers.lexical import LexicalIndex, build_index
+from app.services.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+
+
+def chunk(index, text="", source="/data/a.pdf"):
+    return Document(page_content=text or f"chunk {index}", metadata={"source": source, "chunk_index": index})
+
+
+def test_documents_found_by_both_rankings_rise_to_the_top():
+    dense = [chunk(1), chunk(2), chunk(3)]
+    lexical = [chunk(4), chunk(3)]
+
+    fused = reciprocal_rank_fusion([dense, lexical], k=3, rrf_k=60)
+
+    assert [d.metadata["chunk_index"] for d in fused] == [3, 1, 4]
+
+
+def test_fusion_keys_on_source_and_position_or_on_text():
+    # Same position of the same file, whatever the metadata object
+    same = reciprocal_rank_fusion([[chunk(1)], [chunk(1)]], k=5, rrf_k=60)
+    # Same index in another file is another chunk
+    different = reciprocal_rank_fusion([[chunk(1)], [chunk(1, source="/data/b.pdf")]], k=5, rrf_k=60)
+    # Chunks from before chunk_index existed are matched by text
+    legacy = reciprocal_rank_fusion([[Document(page_content="x")], [Document(page_content="x")]], k=5, rrf_k=60)
+
+    assert len(same) == 1 and len(different) == 2 and len(legacy) == 1
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def get(self, ids, include):
+        found = [id_ for id_ in ids if id_ in self.documents]
+        return {
+            "ids": found,
+            "documents": [self.documents[id_].page_content for id_ in found],
+            "metadatas": [self.documents[id_].metadata for id_ in found],
+        }
+
+
+class FakeVectorstore:
+    def __init__(self, documents, dense_ids):
+        self._collection = FakeCollection(documents)
+        self.dense_ids = dense_ids
+
+    def similarity_search(self, query, k):
+        return [self._collection.documents[id_] for id_ in self.dense_ids[:k]]
+
+
+def test_hybrid_retriever_adds_exact_matches_the_dense_search_missed(tmp_path):
+    documents = {
+        "id-1": chunk(1, "Cuti tahunan diajukan ke atasan."),
+        "id-2": chunk(2, "Cuti sakit memerlukan surat dokter."),
+        "id-3": chunk(3, "Gunakan formulir DEEP46 untuk klaim."),
+    }
+    build_index(str(tmp_path), ((id_, d.page_content) for id_, d in documents.items()))
+    retriever = HybridRetriever(
+        vectorstore=FakeVectorstore(documents, dense_ids=["id-1", "id-2"]),
+        lexical_index=LexicalIndex.open(str(tmp_path)),
+        collection_name="docs",
+        k=3,
+        dense_k=2,
+        lexical_k=2,
+    )
+
+    found = retriever.invoke("formulir deep46")
+
+    assert "Gunakan formulir DEEP46 untuk klaim." in [d.page_content for d in found]
+
+
+def test_hybrid_retriever_without_lexical_index_is_dense_only():
+    documents = {"id-1": chunk(1), "id-2": chunk(2)}
+    retriever = HybridRetriever(vectorstore=FakeVectorstore(documents, dense_ids=["id-2", "id-1"]), k=2, dense_k=2)
+
+    assert [d.metadata["chunk_index"] for d in retriever.invoke("apa saja")] == [2, 1]
@@ -0,0 +1,118 @@
+import json
+import os
+
+from app.helpers import lexical
+from app.helpers.lexical import LexicalIndex, build_index, index_path, tokenize, update_index
+
+DOCUMENTS = [
+    ("id-cuti", "Pengajuan cuti tahunan dilakukan melalui formulir DEEP46."),
+    ("id-lembur", "Lembur dihitung per jam dan dibayar bersama gaji."),
+    ("id-gaji", "Gaji dibayarkan setiap tanggal 25. Slip gaji dikirim lewat email."),
+    ("id-kosong", ""),
+]
+
+
+def test_tokenize_drops_stopwords_and_strips_particles():
+    assert tokenize("Apakah cutinya bisa diambil sekarang?") == ["apakah", "cuti", "diambil", "sekarang"]
+    assert tokenize("Walaupun prosedurnya untuk karyawan-karyawan") == [
+        "walau", "prosedur", "karyawan", "karyawan",
+    ]
+
+
+def test_tokenize_keeps_words_that_only_look_like_they_end_in_a_particle():
+    assert tokenize("masalah sekolah langkah pemerintah") == ["masalah", "sekolah", "langkah", "pemerintah"]
+    # "masalah" must not collide with "masa" as in "masa kerja"
+    assert "masa" not in tokenize("Masalah gaji") and tokenize("masa kerja") == ["masa", "kerja"]
+
+
+def test_tokenize_keeps_codes_and_short_words_intact():
+    # Codes are not stemmed, "-ku"/"-mu" endings are not stripped
+    assert tokenize("Formulir DEEP46 berlaku untuk ilmu") == ["formulir", "deep46", "berlaku", "ilmu"]
+    assert tokenize("Pasal 5 ayat 2") == ["pasal", "5", "ayat", "2"]
+
+
+def test_search_ranks_by_bm25(tmp_path):
+    path = index_path(str(tmp_path), "docs")
+    meta = build_index(path, DOCUMENTS)
+    index = LexicalIndex.open(path)
+
+    assert meta["documents"] == 4
+    assert index.search("formulir deep46", k=3)[0][0] == "id-cuti"
+    # "gaji" appears twice in id-gaji and once in id-lembur
+    assert [id_ for id_, _ in index.search("gaji", k=3)] == ["id-gaji", "id-lembur"]
+    assert index.search("asuransi", k=3) == []
+
+
+def test_rebuild_switches_readers_to_the_new_build(tmp_path):
+    path = str(tmp_path / "docs")
+    build_index(path, DOCUMENTS[:1])
+    build_index(path, DOCUMENTS[1:2])
+    build_index(path, DOCUMENTS[2:3])
+
+    assert LexicalIndex.open(path).search("gaji", k=3)[0][0] == "id-gaji"
+    # Segments of states older than keep_states are removed
+    assert len([name for name in os.listdir(path) if name.startswith("segment-")]) == 2
+    assert len([name for name in os.listdir(path) if name.startswith("state-")]) == 2
+
+
+def test_missing_or_outdated_index_is_not_opened(tmp_path):
+    path = str(tmp_path / "docs")
+    assert LexicalIndex.open(path) is None
+    assert update_index(path, DOCUMENTS, []) is None
+
+    build_index(path, DOCUMENTS)
+    with open(os.path.join(path, "CURRENT"), encoding="utf-8") as f:
+        state_path = os.path.join(path, f.read().strip())
+    with open(state_path, encoding="utf-8") as f:
+        state = json.load(f)
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump({**state, "format": 0}, f)
+
+    assert LexicalIndex.open(path) is None
+
+
+def scores(index, query):
+    return {id_: round(score, 6) for id_, score in index.search(query, k=10)}
+
+
+def test_updates_score_like_a_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical, "MAX_DELETED_RATIO", 1.0)
+    added = [("id-cuti-2", "Cuti bersama mengurangi jatah cuti tahunan."), ("id-gaji-2", "Gaji ke-13 dibayar bulan Juni.")]
+    path = str(tmp_path / "updated")
+    build_index(path, DOCUMENTS)
+
+    stats = update_index(path, added + [DOCUMENTS[0]], ["id-lembur", "id-unknown"])
+
+    # The unchanged chunk is not indexed twice, the unknown ID is ignored
+    assert (stats["added"], stats["deleted"], stats["documents"], stats["segments"]) == (2, 1, 5, 2)
+    rebuilt = str(tmp_path / "rebuilt")
+    build_index(rebuilt, [DOCUMENTS[0], DOCUMENTS[2], DOCUMENTS[3]] + added)
+    for query in ("cuti tahunan", "gaji", "lembur", "formulir deep46"):
+        assert scores(LexicalIndex.open(path), query) == scores(LexicalIndex.open(rebuilt), query)
+
+
+def test_a_deleted_chunk_can_come_back(tmp_path):
+    path = str(tmp_path / "docs")
+    build_index(path, DOCUMENTS)
+    update_index(path, [], ["id-lembur"])
+    assert "id-lembur" not in scores(LexicalIndex.open(path), "lembur")
+
+    update_index(path, [DOCUMENTS[1]], [])
+    assert "id-lembur" in scores(LexicalIndex.open(path), "lembur")
+
+
+def test_segments_are_merged_past_the_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical, "MAX_SEGMENTS", 2)
+    path = str(tmp_path / "docs")
+    build_index(path, DOCUMENTS[:2])
+    update_index(path, DOCUMENTS[2:3], [])
+    stats = update_index(path, DOCUMENTS[3:], [])
+
+    assert stats["merged"] and stats["segments"] == 1 and stats["documents"] == 4
+    assert [id_ for id_, _ in LexicalIndex.open(path).search("gaji", k=3)] == ["id-gaji", "id-lembur"]
+
+    # Deleting half of the documents merges them away as well
+    stats = update_index(path, [], ["id-cuti", "id-gaji"])
+    assert stats["merged"] and stats["documents"] == 2
+    assert [id_ for id_, _ in LexicalIndex.open(path).search("gaji", k=3)] == ["id-lembur"]
+    assert len([name for name in os.listdir(path) if name.startswith("segment-")]) <= 2
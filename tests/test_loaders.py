@@ -0,0 +1,129 @@
+import sys
+import types
+
+import docx
+import pytest
+
+from app.worker import loaders
+from app.worker.loaders import LoaderStats, has_text_layer, load_file
+
+TEXT_PAGE = "Karyawan berhak atas cuti tahunan selama dua belas hari kerja."
+# What a broken font encoding extracts to
+GARBLED_PAGE = "��#@ �~^ ���� ¤¤¤ ��#@"
+
+
+class FakeTextPage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_text_range(self):
+        return self.text
+
+    def close(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_textpage(self):
+        return FakeTextPage(self.text)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pdf_pages(monkeypatch):
+    """Text layer of each page of every PDF opened through a fake pypdfium2."""
+    pages = []
+    pdfium = types.ModuleType("pypdfium2")
+
+    class PdfDocument:
+        def __init__(self, path):
+            self.pages = [FakePage(text) for text in pages]
+
+        def __len__(self):
+            return len(self.pages)
+
+        def __getitem__(self, index):
+            return self.pages[index]
+
+        def close(self):
+            pass
+
+    pdfium.PdfDocument = PdfDocument
+    monkeypatch.setitem(sys.modules, "pypdfium2", pdfium)
+    return pages
+
+
+def test_has_text_layer_rejects_short_and_garbled_text():
+    assert has_text_layer(TEXT_PAGE)
+    assert not has_text_layer("Lampiran")
+    assert not has_text_layer(GARBLED_PAGE)
+
+
+def test_only_pages_without_a_text_layer_are_ocred(pdf_pages, monkeypatch):
+    pdf_pages += [TEXT_PAGE, "", GARBLED_PAGE]
+    ocred = []
+
+    def ocr_page(page):
+        ocred.append(page.text)
+        return "Hasil OCR halaman."
+
+    monkeypatch.setattr(loaders, "ocr_page", ocr_page)
+    stats = LoaderStats()
+
+    documents = list(load_file("/data/a.pdf", stats))
+
+    assert ocred == ["", GARBLED_PAGE]
+    assert [(d.page_content, d.metadata["page_number"], d.metadata["extraction"]) for d in documents] == [
+        (TEXT_PAGE, 1, "text"),
+        ("Hasil OCR halaman.", 2, "ocr"),
+        ("Hasil OCR halaman.", 3, "ocr"),
+    ]
+    triage = stats.pdf_pages["/data/a.pdf"]
+    assert (triage["pages"], triage["text_pages"], triage["ocr_pages"], triage["ocr_failed"]) == (3, 1, 2, 0)
+
+
+def test_a_page_whose_ocr_fails_is_skipped_not_indexed_with_its_text_layer(pdf_pages, monkeypatch):
+    pdf_pages += [GARBLED_PAGE, TEXT_PAGE]
+
+    def ocr_page(page):
+        raise RuntimeError("tesseract timed out")
+
+    monkeypatch.setattr(loaders, "ocr_page", ocr_page)
+    stats = LoaderStats()
+
+    documents = list(load_file("/data/a.pdf", stats))
+
+    assert [(d.page_content, d.metadata["extraction"]) for d in documents] == [(TEXT_PAGE, "text")]
+    triage = stats.pdf_pages["/data/a.pdf"]
+    assert (triage["ocr_pages"], triage["ocr_failed"]) == (0, 1)
+
+
+def test_docx_elements_come_out_in_document_order(tmp_path):
+    document = docx.Document()
+    document.add_heading("Peraturan Cuti", level=1)
+    document.add_paragraph("Karyawan berhak atas cuti tahunan.")
+    document.add_paragraph("Cuti melahirkan tiga bulan.", style="List Bullet")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Jenis", "Hari"
+    table.cell(1, 0).text, table.cell(1, 1).text = "Tahunan", "12"
+    document.add_paragraph("   ")
+    document.add_paragraph("Lihat juga lampiran.")
+    path = str(tmp_path / "cuti.docx")
+    document.save(path)
+
+    elements = list(load_file(path))
+
+    assert [(e.page_content, e.metadata["category"], e.metadata.get("heading_level")) for e in elements] == [
+        ("Peraturan Cuti", "Title", 1),
+        ("Karyawan berhak atas cuti tahunan.", "NarrativeText", None),
+        ("Cuti melahirkan tiga bulan.", "ListItem", None),
+        ("Jenis | Hari", "Table", None),
+        ("Tahunan | 12", "Table", None),
+        ("Lihat juga lampiran.", "NarrativeText", None),
+    ]
+    assert all(e.metadata["source"] == path for e in elements)
@@ -0,0 +1,69 @@
+import os
+
+from app.worker.manifest import FileRecord, file_sha256, plan_directory, plan_paths
+
+
+def record_of(path, chunk_ids=("chunk-1",)):
+    stat = os.stat(path)
+    return FileRecord(str(path), stat.st_size, stat.st_mtime, file_sha256(str(path)), list(chunk_ids))
+
+
+def test_plan_directory_sorts_files_into_plan_buckets(tmp_path):
+    unchanged = tmp_path / "unchanged.pdf"
+    unchanged.write_bytes(b"sama")
+    touched = tmp_path / "touched.docx"
+    touched.write_bytes(b"isi tetap")
+    updated = tmp_path / "sub" / "updated.doc"
+    updated.parent.mkdir()
+    updated.write_bytes(b"versi lama")
+    (tmp_path / "notes.txt").write_text("no loader for this")
+
+    known = {str(path): record_of(path) for path in (unchanged, touched, updated)}
+    known[str(tmp_path / "deleted.pdf")] = FileRecord(str(tmp_path / "deleted.pdf"), 1, 1.0, "gone", ["old"])
+    # Fed into the same collection from another directory: not ours to delete
+    known["/elsewhere/other.pdf"] = FileRecord("/elsewhere/other.pdf", 1, 1.0, "x", ["other"])
+
+    os.utime(touched, (1, 1))
+    updated.write_bytes(b"versi baru!")
+    added = tmp_path / "added.pdf"
+    added.write_bytes(b"baru")
+
+    plan = plan_directory(str(tmp_path), known)
+
+    assert [record.path for record in plan.unchanged] == [str(unchanged)]
+    assert [record.path for record in plan.touched] == [str(touched)]
+    # Same content: the chunks stay, only the manifest row is refreshed
+    assert plan.touched[0].chunk_ids == ["chunk-1"]
+    assert [record.path for record in plan.added] == [str(added)]
+    assert [(previous.path, new.sha256) for previous, new in plan.updated] == [(str(updated), file_sha256(str(updated)))]
+    assert [record.path for record in plan.deleted] == [str(tmp_path / "deleted.pdf")]
+    assert plan.summary() == {"unchanged": 2, "added": 1, "updated": 1, "deleted": 1}
+
+
+def test_plan_paths_only_looks_at_the_given_files(tmp_path):
+    changed = tmp_path / "changed.pdf"
+    changed.write_bytes(b"lama")
+    known = {str(changed): record_of(changed)}
+    known[str(tmp_path / "removed.pdf")] = FileRecord(str(tmp_path / "removed.pdf"), 1, 1.0, "gone", ["old"])
+    known[str(tmp_path / "untouched.pdf")] = FileRecord(str(tmp_path / "untouched.pdf"), 1, 1.0, "x", ["keep"])
+    changed.write_bytes(b"baru sekali")
+
+    plan = plan_paths(
+        [str(changed), str(tmp_path / "removed.pdf"), str(tmp_path / "new.txt"), str(changed)],
+        known,
+    )
+
+    assert [previous.path for previous, _ in plan.updated] == [str(changed)]
+    assert [record.path for record in plan.deleted] == [str(tmp_path / "removed.pdf")]
+    assert plan.added == [] and plan.unchanged == []
+
+
+def test_office_lock_files_and_hidden_files_are_never_planned(tmp_path):
+    document = tmp_path / "Handbook.docx"
+    document.write_bytes(b"isi")
+    for name in ("~$Handbook.docx", ".Handbook.docx"):
+        (tmp_path / name).write_bytes(b"lock")
+
+    assert [record.path for record in plan_directory(str(tmp_path), {}).added] == [str(document)]
+    plan = plan_paths([str(tmp_path / "~$Handbook.docx"), str(tmp_path / ".Handbook.docx")], {})
+    assert plan.summary() == {"unchanged": 0, "added": 0, "updated": 0, "deleted": 0}
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from app.worker import parse_cache
+from app.worker.loaders import LoaderStats
+from app.worker.parse_cache import ParseCache, load_file_cached, load_from_cache
+
+SHA = "a" * 64
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(db_path=str(tmp_path / "parse_cache.sqlite3"), max_bytes=10**9)
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Pages `load_file` yields, and how many of them were parsed so far."""
+    pages = {"pages": [f"Halaman {i} tentang cuti tahunan." for i in range(5)], "parsed": 0}
+
+    def load_file(path, stats=None):
+        for number, text in enumerate(pages["pages"], start=1):
+            pages["parsed"] += 1
+            yield Document(page_content=text, metadata={"source": path, "page_number": number})
+
+    monkeypatch.setattr(parse_cache, "load_file", load_file)
+    monkeypatch.setattr(parse_cache, "parser_version", lambda path: "load_pdf/2/ocr:ind+eng@300")
+    return pages
+
+
+def entries(cache):
+    return os.listdir(cache.directory)
+
+
+def test_a_cold_parse_is_streamed_and_then_served_from_the_cache(cache, parsed):
+    documents = load_file_cached("/data/a.pdf", SHA, cache)
+    first = next(documents)
+
+    # Handed on before the rest of the file is parsed, and not cached until it all is
+    assert first.page_content == parsed["pages"][0]
+    assert parsed["parsed"] == 1
+    assert cache.get(SHA, "load_pdf/2/ocr:ind+eng@300", "/data/a.pdf") is None
+
+    assert len([first, *documents]) == 5
+    stats = LoaderStats()
+    cached = list(load_from_cache("/data/renamed.pdf", SHA, cache, stats))
+
+    assert parsed["parsed"] == 5
+    assert [d.page_content for d in cached] == parsed["pages"]
+    assert cached[2].metadata == {"source": "/data/renamed.pdf", "page_number": 3}
+    assert stats.loaders["parse_cache"]["files"] == 1
+
+
+def test_a_hit_is_read_lazily(cache, parsed):
+    list(load_file_cached("/data/a.pdf", SHA, cache))
+
+    documents = cache.get(SHA, "load_pdf/2/ocr:ind+eng@300", "/data/a.pdf")
+
+    assert not isinstance(documents, list)
+    assert next(documents).page_content == parsed["pages"][0]
+    documents.close()
+
+
+def test_an_unfinished_parse_is_not_cached(cache, parsed):
+    documents = load_file_cached("/data/a.pdf", SHA, cache)
+    next(documents)
+    documents.close()
+
+    assert entries(cache) == []
+    with pytest.raises(LookupError):
+        load_from_cache("/data/a.pdf", SHA, cache)
+
+
+def test_least_recently_used_entries_are_evicted_with_their_files(cache, parsed):
+    list(load_file_cached("/data/a.pdf", "a" * 64, cache))
+    list(load_file_cached("/data/b.pdf", "b" * 64, cache))
+    list(load_from_cache("/data/a.pdf", "a" * 64, cache))
+    cache.max_bytes = os.path.getsize(os.path.join(cache.directory, entries(cache)[0])) + 1
+
+    assert cache.evict() == 1
+    assert len(entries(cache)) == 1
+    assert cache.get("b" * 64, "load_pdf/2/ocr:ind+eng@300", "/data/b.pdf") is None
+    assert len(list(load_from_cache("/data/a.pdf", "a" * 64, cache))) == 5
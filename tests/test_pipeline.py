@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from app.worker.pipeline import run_ingestion_pipeline
+
+
+class SplitByLine:
+    def split_documents(self, documents):
+        for document in documents:
+            for line in document.page_content.splitlines():
+                yield Document(page_content=line, metadata=dict(document.metadata))
+
+
+class SlowEmbeddings:
+    """Takes a while per call and records how many calls overlapped."""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return [[float(len(text))] for text in texts]
+
+
+def lines(count):
+    return [Document(page_content="\n".join(f"baris {i}" for i in range(count)), metadata={"source": "/data/a.pdf"})]
+
+
+def run(documents, embeddings, write_batch, **kwargs):
+    options = {"batch_size": 1, "queue_batches": 2, **kwargs}
+    return run_ingestion_pipeline(
+        documents, source="/data/a.pdf", splitter=SplitByLine(), embeddings=embeddings, write_batch=write_batch, **options
+    )
+
+
+def test_several_batches_are_embedded_at_once_and_written_in_order():
+    embeddings = SlowEmbeddings()
+    written = []
+
+    stats = run(lines(8), embeddings, lambda ids, chunks, vectors: written.extend(c.page_content for c in chunks), embed_concurrency=4)
+
+    assert embeddings.max_running == 4
+    assert written == [f"baris {i}" for i in range(8)]
+    assert stats["chunks"] == stats["chunks_written"] == 8
+
+
+def test_one_batch_at_a_time_by_default():
+    embeddings = SlowEmbeddings(seconds=0.01)
+
+    run(lines(4), embeddings, lambda ids, chunks, vectors: None)
+
+    assert embeddings.max_running == 1
+
+
+def failing_documents(after):
+    """A loader that fails after yielding `after` pages."""
+    for i in range(after):
+        yield Document(page_content=f"baris {i}", metadata={"source": "/data/a.pdf"})
+    raise ValueError("corrupt page")
+
+
+@pytest.mark.parametrize("failing_stage, error", [("load", "corrupt page"), ("embed", "embeddings API down"), ("write", "write failed")])
+def test_a_failing_stage_stops_the_others_and_raises(failing_stage, error):
+    class FailingEmbeddings(SlowEmbeddings):
+        def embed_documents(self, texts):
+            if failing_stage == "embed":
+                raise RuntimeError("embeddings API down")
+            return super().embed_documents(texts)
+
+    def write_batch(ids, chunks, vectors):
+        if failing_stage == "write":
+            raise RuntimeError("write failed")
+
+    documents = failing_documents(3) if failing_stage == "load" else lines(1000)
+    started = time.perf_counter()
+
+    with pytest.raises(Exception, match=error):
+        run(documents, FailingEmbeddings(seconds=0), write_batch)
+
+    # No stage is left waiting on a queue nobody reads any more
+    assert time.perf_counter() - started < 5
+    assert not [t for t in threading.enumerate() if t.name.startswith("embed-batch")]
+
+
+def test_known_chunks_are_neither_embedded_nor_written():
+    embeddings = SlowEmbeddings(seconds=0)
+    written = []
+    first = run(lines(3), embeddings, lambda ids, chunks, vectors: None)
+
+    stats = run(lines(4), embeddings, lambda ids, chunks, vectors: written.extend(ids), known_ids=set(first["chunk_ids"]))
+
+    assert stats["chunks"] == 4
+    assert stats["chunks_written"] == 1
+    assert written == stats["chunk_ids"][3:]
@@ -0,0 +1,99 @@
+import pytest
+from redis import RedisError
+
+from app.worker import progress
+from app.worker.progress import get_ingestion_status, read_progress
+
+
+class FakeRedis:
+    def __init__(self, values=None, down=False):
+        self.values = values or {}
+        self.down = down
+
+    def hgetall(self, key):
+        if self.down:
+            raise RedisError("connection refused")
+        return {name.encode(): str(value).encode() for name, value in self.values.items()}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(progress, "get_redis", lambda: redis)
+    monkeypatch.setattr(progress.time, "time", lambda: 1100.0)
+    return redis
+
+
+def test_throughput_and_eta_are_derived_from_the_counters(redis):
+    redis.values = {"files_total": 10, "files_done": 3, "files_failed": 1, "tokens_embedded": 5000, "started_at": 1000.0}
+
+    assert read_progress("run-1") == {
+        "files_total": 10,
+        "files_done": 3,
+        "files_failed": 1,
+        "chunks_embedded": 0,
+        "vectors_written": 0,
+        "tokens_embedded": 5000,
+        "elapsed_seconds": 100.0,
+        "tokens_per_second": 50.0,
+        # 4 of 10 files took 100 s, so 6 more take 150 s
+        "eta_seconds": 150.0,
+    }
+
+
+def test_no_eta_before_the_first_file_finishes(redis):
+    redis.values = {"files_total": 10, "started_at": 1000.0}
+
+    assert read_progress("run-1")["eta_seconds"] is None
+
+
+def test_progress_is_empty_without_redis(redis):
+    redis.down = True
+
+    result = read_progress("run-1")
+
+    assert result["files_total"] == 0 and result["elapsed_seconds"] == 0.0 and result["eta_seconds"] is None
+
+
+class FakeAsyncResult:
+    outcomes = {}
+
+    def __init__(self, task_id, app=None):
+        self.state, self.info = self.outcomes[task_id]
+        self.result = self.info
+
+    def ready(self):
+        return self.state in ("SUCCESS", "FAILURE")
+
+    def successful(self):
+        return self.state == "SUCCESS"
+
+    def failed(self):
+        return self.state == "FAILURE"
+
+
+@pytest.fixture
+def celery_results(monkeypatch):
+    monkeypatch.setattr("celery.result.AsyncResult", FakeAsyncResult)
+    monkeypatch.setattr(FakeAsyncResult, "outcomes", {})
+    return FakeAsyncResult.outcomes
+
+
+def test_status_of_a_running_ingestion(redis, celery_results):
+    celery_results["published"] = ("PROGRESS", {"stage": "ingesting", "files_done": 2})
+    celery_results["planning"] = ("STARTED", None)
+    redis.values = {"files_total": 4, "started_at": 1000.0}
+
+    assert get_ingestion_status("published")["progress"] == {"stage": "ingesting", "files_done": 2}
+    status = get_ingestion_status("planning")
+    assert status["progress"]["stage"] == "planning"
+    assert status["progress"]["files_total"] == 4
+    assert not status["ready"]
+
+
+def test_status_of_a_finished_ingestion(redis, celery_results):
+    celery_results["done"] = ("SUCCESS", {"files": 4, "swapped": True})
+    celery_results["failed"] = ("FAILURE", RuntimeError("Chroma unavailable"))
+
+    assert get_ingestion_status("done") == {"task_id": "done", "state": "SUCCESS", "ready": True, "result": {"files": 4, "swapped": True}}
+    assert get_ingestion_status("failed")["error"] == "Chroma unavailable"
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from redis import RedisError
+
+from app.services import query_embedding_cache
+from app.services.query_embedding_cache import CachedQueryEmbeddings
+
+
+class FakeRedis:
+    def __init__(self, down=False):
+        self.data = {}
+        self.down = down
+
+    def get(self, key):
+        if self.down:
+            raise RedisError("connection refused")
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.down:
+            raise RedisError("connection refused")
+        self.data[key] = value
+
+
+class FakeAsyncRedis:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def get(self, key):
+        return self.redis.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.redis.set(key, value, ex=ex)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.5]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(query_embedding_cache, "get_redis", lambda: redis)
+    monkeypatch.setattr(query_embedding_cache, "get_async_redis", lambda: FakeAsyncRedis(redis))
+    return redis
+
+
+def make_cache(embeddings, **kwargs):
+    return CachedQueryEmbeddings(embeddings, **{"model_name": "text-embedding-ada-002", "max_size": 10, "ttl": 60, **kwargs})
+
+
+def test_repeated_question_is_embedded_once(redis):
+    embeddings = FakeEmbeddings()
+    cache = make_cache(embeddings)
+
+    assert cache.embed_query("Berapa hari cuti?") == [17.0, 0.5]
+    # Case and whitespace do not make a new entry
+    assert cache.embed_query("  berapa HARI cuti? ") == [17.0, 0.5]
+    assert embeddings.queries == ["Berapa hari cuti?"]
+
+
+def test_other_processes_are_served_from_redis(redis):
+    embeddings = FakeEmbeddings()
+    make_cache(embeddings).embed_query("Berapa hari cuti?")
+
+    other_process = make_cache(embeddings)
+
+    assert asyncio.run(other_process.aembed_query("berapa hari cuti?")) == [17.0, 0.5]
+    assert embeddings.queries == ["Berapa hari cuti?"]
+
+
+def test_local_tier_evicts_least_recently_used(redis):
+    cache = make_cache(FakeEmbeddings(), max_size=2)
+    for text in ("a", "b", "a", "c"):
+        cache.embed_query(text)
+
+    assert list(cache._local) == [cache.cache_key("a"), cache.cache_key("c")]
+
+
+def test_local_entries_expire(redis, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_embedding_cache.time, "monotonic", lambda: now[0])
+    cache = make_cache(FakeEmbeddings(), ttl=10)
+    cache.embed_query("a")
+
+    now[0] = 111.0
+    assert cache._get_local(cache.cache_key("a")) is None
+
+
+def test_redis_outage_falls_back_to_the_model(redis):
+    redis.down = True
+    embeddings = FakeEmbeddings()
+    cache = make_cache(embeddings)
+
+    assert cache.embed_query("a") == [1.0, 0.5]
+    # Still cached in process
+    assert cache.embed_query("a") == [1.0, 0.5]
+    assert embeddings.queries == ["a"]
+
+
+def test_async_misses_go_through_the_batcher(redis):
+    embeddings = FakeEmbeddings()
+    batched = []
+
+    async def batch_embed_query(text):
+        batched.append(text)
+        return [9.0, 9.0]
+
+    cache = make_cache(embeddings, batch_embed_query=batch_embed_query)
+
+    assert asyncio.run(cache.aembed_query("a")) == [9.0, 9.0]
+    assert batched == ["a"]
+    assert embeddings.queries == []
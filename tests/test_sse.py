@@ -0,0 +1,75 @@
+import asyncio
+
+from app.helpers.sse import coalesce, event_stream, format_sse
+
+
+async def from_list(chunks, delays=None):
+    for index, chunk in enumerate(chunks):
+        if delays:
+            await asyncio.sleep(delays[index])
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_format_sse_splits_multiline_data():
+    assert format_sse("a\nb", event="progress") == "event: progress\ndata: a\ndata: b\n\n"
+    assert format_sse("[DONE]") == "data: [DONE]\n\n"
+
+
+def test_first_chunk_is_sent_at_once_and_the_rest_is_grouped():
+    chunks = asyncio.run(collect(coalesce(from_list(["Hal", "o", " du", "nia"]), max_bytes=1024, interval=10)))
+
+    assert chunks == ["Hal", "o dunia"]
+
+
+def test_buffer_is_flushed_at_max_bytes():
+    chunks = asyncio.run(collect(coalesce(from_list(["ab", "cd", "ef", "g"]), max_bytes=4, interval=10)))
+
+    assert chunks == ["ab", "cdef", "g"]
+
+
+def test_buffer_is_flushed_when_the_interval_elapses_without_new_chunks():
+    # "b" waits in the buffer while the model is slow to produce "c"
+    upstream = from_list(["a", "b", "c"], delays=[0, 0, 0.3])
+    chunks = asyncio.run(collect(coalesce(upstream, max_bytes=1024, interval=0.05)))
+
+    assert chunks == ["a", "b", "c"]
+
+
+def test_stop_cancels_and_closes_the_upstream():
+    closed = asyncio.Event()
+
+    async def endless():
+        try:
+            yield "a"
+            await asyncio.sleep(3600)
+            yield "never"
+        finally:
+            closed.set()
+
+    async def run():
+        stop = asyncio.Event()
+        received = []
+        async for chunk in coalesce(endless(), max_bytes=1024, interval=10, stop=stop):
+            received.append(chunk)
+            stop.set()
+        return received
+
+    assert asyncio.run(asyncio.wait_for(run(), 5)) == ["a"]
+    assert closed.is_set()
+
+
+def test_event_stream_ends_with_done_or_error():
+    frames = asyncio.run(collect(event_stream(from_list(["Halo"]))))
+    assert frames == [format_sse("Halo"), format_sse("[DONE]", event="done")]
+
+    async def failing():
+        yield "Ha"
+        raise RuntimeError("LLM down")
+
+    frames = asyncio.run(collect(event_stream(failing())))
+    assert frames[0] == format_sse("Ha")
+    assert frames[-1].startswith("event: error\n")
@@ -0,0 +1,34 @@
+import json
+import subprocess
+import sys
+
+# Loaded by the lifespan warm-up (or by the worker), never by `import app.main`
+DEFERRED_MODULES = (
+    "app.worker.tasks",
+    "celery",
+    "openai",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_community",
+    "chromadb",
+    "tiktoken",
+)
+
+
+def imported_by(module, modules):
+    # A fresh interpreter: other tests have already imported the worker stack
+    code = (
+        f"import json, sys; import {module}; "
+        f"print(json.dumps([m for m in {list(modules)!r} if m in sys.modules]))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_app_main_defers_heavy_imports():
+    assert imported_by("app.main", DEFERRED_MODULES) == []
+
+
+def test_dispatching_tasks_does_not_load_the_openai_sdk():
+    # The CLI and the directory watcher import the task module to send tasks
+    assert imported_by("app.worker.tasks", ("openai", "app.worker.embedder")) == []
@@ -0,0 +1,348 @@
+import pytest
+from celery.exceptions import Ignore
+from langchain_core.documents import Document
+
+from app.core.config import CHROMA_WRITE_QUEUE
+from app.worker import tasks
+from app.worker.celery_app import celery_app
+from app.worker.vectorstore import chunk_id
+
+
+class FakeManifest:
+    def __init__(self, records=None):
+        self._records = records or {}
+
+    def records(self, collection_name):
+        return dict(self._records)
+
+    def upsert(self, collection_name, record):
+        self._records[record.path] = record
+
+    def delete(self, collection_name, path):
+        pass
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Captures the signature each task replaces itself with instead of sending it."""
+    replaced = []
+
+    def fake_replace(sig):
+        replaced.append(sig)
+        raise Ignore()
+
+    for task in (tasks.process_directory, tasks.ingest_paths, tasks.reindex_directory, tasks.rebuild_collection):
+        monkeypatch.setattr(task, "replace", fake_replace)
+    monkeypatch.setattr(tasks, "Manifest", FakeManifest)
+    monkeypatch.setattr(tasks, "resolve_collection", lambda name: name)
+    monkeypatch.setattr(tasks, "start_progress", lambda run_id, files_total: None)
+    monkeypatch.setattr(tasks, "publish_progress", lambda task, run_id, stage: None)
+    return replaced
+
+
+@pytest.fixture
+def directory(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 satu")
+    (tmp_path / "b.docx").write_bytes(b"dua")
+    return tmp_path
+
+
+def test_process_directory_hands_off_to_chord(dispatched, directory):
+    result = tasks.process_directory.apply(args=(str(directory), "docs"))
+
+    assert result.state == "IGNORED"
+    assert len(dispatched) == 1
+    chord = dispatched[0]
+    # Each file is embedded anywhere, then committed by the writer
+    assert [[sig.task for sig in chain.tasks] for chain in chord.tasks] == [
+        [tasks.ingest_file.name, tasks.commit_file.name]
+    ] * 2
+    assert chord.body.task == tasks.finalize_ingestion.name
+    assert chord.body.args[0] == "docs"
+
+
+def test_ingest_paths_hands_off_to_chord(dispatched, directory):
+    result = tasks.ingest_paths.apply(args=([str(directory / "a.pdf")], "docs"))
+
+    assert result.state == "IGNORED"
+    assert len(dispatched[0].tasks) == 1
+
+
+class FakeCatalog:
+    abandoned = []
+
+    def create(self, logical):
+        return f"{logical}__v2"
+
+    def abandon(self, physical):
+        self.abandoned.append(physical)
+
+
+def test_reindex_directory_hands_off_to_chord(dispatched, directory, monkeypatch):
+    monkeypatch.setattr(tasks, "CollectionCatalog", FakeCatalog)
+    result = tasks.reindex_directory.apply(args=(str(directory), "docs"))
+
+    assert result.state == "IGNORED"
+    summary = dispatched[0].body.args[1]
+    assert summary["target"] == "docs__v2"
+    assert summary["swap"] is True
+
+
+def test_rebuild_collection_hands_off_to_chord(dispatched, monkeypatch):
+    record = tasks.FileRecord("/data/a.pdf", 10, 1.0, "abc", ["id-1"])
+    monkeypatch.setattr(tasks, "Manifest", lambda: FakeManifest({record.path: record}))
+    monkeypatch.setattr(tasks, "CollectionCatalog", FakeCatalog)
+    result = tasks.rebuild_collection.apply(args=("docs",))
+
+    assert result.state == "IGNORED"
+    ((ingest, _),) = [chain.tasks for chain in dispatched[0].tasks]
+    # Rebuilt from the parse cache only
+    assert ingest.args[4] is True
+
+
+def test_missing_directory_is_reported_as_error(dispatched, tmp_path):
+    result = tasks.process_directory.apply(args=(str(tmp_path / "missing"), "docs"))
+
+    assert result.result["status"] == "error"
+    assert dispatched == []
+
+
+def test_only_embedding_runs_outside_the_writer_queue():
+    def queue_of(task):
+        return celery_app.amqp.router.route({}, task.name)["queue"].name
+
+    assert queue_of(tasks.ingest_file) == "celery"
+    for task in (
+        tasks.process_directory,
+        tasks.ingest_paths,
+        tasks.reindex_directory,
+        tasks.rebuild_collection,
+        tasks.write_chunks,
+        tasks.commit_file,
+        tasks.finalize_ingestion,
+        tasks.gc_collections,
+    ):
+        assert queue_of(task) == CHROMA_WRITE_QUEUE
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def reset_stats(self):
+        pass
+
+    def stats(self):
+        return {"tokens": 0}
+
+
+class SplitByLine:
+    def split_documents(self, documents):
+        for document in documents:
+            for line in document.page_content.splitlines():
+                yield Document(page_content=line, metadata=dict(document.metadata))
+
+
+def test_ingest_file_sends_its_batches_to_the_writer_without_opening_chroma(monkeypatch):
+    embeddings = FakeEmbeddings()
+    sent = []
+    monkeypatch.setattr(tasks, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(tasks, "get_embedding_client", lambda: embeddings)
+    monkeypatch.setattr(tasks, "get_text_splitter", SplitByLine)
+    monkeypatch.setattr(tasks, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(tasks, "load_file_cached", lambda path, sha256, cache, stats: iter([
+        Document(page_content="satu\ndua\ntiga", metadata={"source": path}),
+    ]))
+    monkeypatch.setattr(tasks, "open_vectorstore", lambda name: pytest.fail("ingest_file opened Chroma"))
+    monkeypatch.setattr(tasks.write_chunks, "delay", lambda *args: sent.append(args))
+
+    unchanged = chunk_id("/data/a.pdf", 0, "satu")
+    record = tasks.FileRecord("/data/a.pdf", 10, 1.0, "abc")
+    result = tasks.ingest_file.apply(args=("docs__v1", tasks.asdict(record), [unchanged, "id-gone"])).result
+
+    # "satu" was stored by an earlier run: not embedded nor sent again
+    assert embeddings.embedded == ["dua", "tiga"]
+    assert [(args[0], args[2]) for args in sent] == [("docs__v1", ["dua"]), ("docs__v1", ["tiga"])]
+    assert tasks.unpack_vectors(sent[0][4], 1) == [[3.0, 0.5]]
+    assert result["record"]["chunk_ids"][0] == unchanged and len(result["record"]["chunk_ids"]) == 3
+    assert result["stale_ids"] == ["id-gone"]
+    assert (result["chunks"], result["chunks_written"]) == (3, 2)
+
+
+class FakeStore:
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.deleted = []
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+
+
+def test_commit_file_records_the_file_once_all_its_chunks_are_stored(monkeypatch):
+    store = FakeStore(["id-1", "id-2"])
+    manifest = FakeManifest()
+    monkeypatch.setattr(tasks, "open_vectorstore", lambda name: store)
+    monkeypatch.setattr(tasks, "existing_ids", lambda vectorstore, ids: vectorstore.ids & set(ids))
+    monkeypatch.setattr(tasks, "delete_ids", lambda vectorstore, ids: vectorstore.delete(ids))
+    monkeypatch.setattr(tasks, "Manifest", lambda: manifest)
+    record = tasks.FileRecord("/data/a.pdf", 10, 1.0, "abc", ["id-1", "id-2"])
+
+    result = tasks.commit_file.apply(args=(
+        {"path": record.path, "record": tasks.asdict(record), "stale_ids": ["id-old"], "chunks": 2, "chunks_written": 1},
+        "docs",
+    )).result
+
+    assert result == {"path": record.path, "stale_ids": ["id-old"], "chunks": 2, "chunks_written": 1, "chunks_deleted": 1}
+    assert store.deleted == ["id-old"]
+    assert manifest.records("docs")[record.path].sha256 == "abc"
+
+
+def test_commit_file_fails_a_file_whose_chunks_did_not_all_arrive(monkeypatch):
+    store = FakeStore(["id-1"])
+    previous = tasks.FileRecord("/data/a.pdf", 9, 0.5, "old", ["id-1", "id-2", "id-old"])
+    manifest = FakeManifest({previous.path: previous})
+    monkeypatch.setattr(tasks, "open_vectorstore", lambda name: store)
+    monkeypatch.setattr(tasks, "existing_ids", lambda vectorstore, ids: vectorstore.ids & set(ids))
+    monkeypatch.setattr(tasks, "Manifest", lambda: manifest)
+    record = tasks.FileRecord("/data/a.pdf", 10, 1.0, "abc", ["id-1", "id-2"])
+
+    result = tasks.commit_file.apply(args=(
+        {"path": record.path, "record": tasks.asdict(record), "stale_ids": ["id-old"], "chunks": 2, "chunks_written": 1},
+        "docs",
+    )).result
+
+    assert "error" in result and store.deleted == []
+    # Still the old version, minus the chunk that is gone, so the next run re-sends it
+    assert manifest.records("docs")[record.path].sha256 == "old"
+    assert manifest.records("docs")[record.path].chunk_ids == ["id-1", "id-old"]
+
+
+@pytest.fixture
+def no_swap(monkeypatch):
+    FakeCatalog.abandoned = []
+    monkeypatch.setattr(tasks, "CollectionCatalog", FakeCatalog)
+    monkeypatch.setattr(tasks, "swap_collection_alias", lambda *args: pytest.fail("swapped"))
+    monkeypatch.setattr(tasks, "build_lexical_index", lambda name: pytest.fail("indexed"))
+    monkeypatch.setattr(tasks.gc_collections, "apply_async", lambda **kwargs: None)
+    return FakeCatalog
+
+
+def test_reindex_of_a_directory_without_documents_keeps_the_live_version(dispatched, no_swap, tmp_path):
+    (tmp_path / "notes.txt").write_text("no loader for this")
+
+    result = tasks.reindex_directory.apply(args=(str(tmp_path), "docs")).result
+
+    assert result["status"] == "error" and result["swapped"] is False
+    assert no_swap.abandoned == ["docs__v2"]
+
+
+def test_a_new_version_without_chunks_is_not_swapped_in(no_swap):
+    summary = {"target": "docs__v2", "swap": True, "files": {"added": 1}}
+    empty_file = {"path": "/data/a.pdf", "chunks": 0, "chunks_written": 0}
+
+    result = tasks.finalize_ingestion([empty_file], "docs", summary)
+
+    assert result["status"] == "error"
+    assert no_swap.abandoned == ["docs__v2"]
+
+
+def file_result(path, written_ids=(), stale_ids=()):
+    """What `commit_file` returns for a file that made it."""
+    return {
+        "path": path,
+        "written_ids": list(written_ids),
+        "stale_ids": list(stale_ids),
+        "chunks": len(written_ids),
+        "chunks_written": len(written_ids),
+        "chunks_deleted": len(stale_ids),
+        "stage_seconds": {},
+        "embedding_cache": {},
+        "embedding_client": {"requests": 0, "tokens": 0, "retries": 0, "seconds": 0.0, "throttle_seconds": 0.0},
+        "loaders": {},
+        "pdf_pages": {},
+    }
+
+
+def incremental_summary(deleted_ids=()):
+    return {
+        "target": "docs",
+        "swap": False,
+        "files": {},
+        "changed": bool(deleted_ids),
+        "deleted_ids": list(deleted_ids),
+        "chunks_deleted": len(deleted_ids),
+        "embedding_calls_saved": 0,
+        "plan_seconds": 0.0,
+        "started_at": 0.0,
+    }
+
+
+@pytest.fixture
+def lexical_updates(monkeypatch):
+    updates = []
+    monkeypatch.setattr(tasks, "update_lexical_index", lambda name, added, deleted: updates.append((name, added, deleted)))
+    monkeypatch.setattr(tasks, "build_lexical_index", lambda name: pytest.fail("rebuilt the whole lexical index"))
+    monkeypatch.setattr(tasks, "bump_collection_version", lambda name: 1)
+    return updates
+
+
+def test_finalize_indexes_only_the_chunks_the_run_changed(lexical_updates):
+    results = [file_result("/data/a.pdf", ["id-new"], ["id-stale"]), file_result("/data/b.pdf")]
+
+    tasks.finalize_ingestion(results, "docs", incremental_summary(deleted_ids=["id-removed-file"]))
+
+    assert lexical_updates == [("docs", ["id-new"], ["id-removed-file", "id-stale"])]
+
+
+def test_finalize_leaves_the_lexical_index_alone_when_nothing_was_written(lexical_updates):
+    tasks.finalize_ingestion([file_result("/data/a.pdf")], "docs", incremental_summary())
+
+    assert lexical_updates == []
+
+
+@pytest.fixture
+def swaps(monkeypatch, tmp_path):
+    """Records alias swaps and lexical builds; the catalog is a real one on disk."""
+    calls = {"swapped": [], "indexed": [], "gc": 0}
+    versions = tasks.CollectionCatalog(db_path=str(tmp_path / "collections.sqlite3"))
+    monkeypatch.setattr(tasks, "CollectionCatalog", lambda: versions)
+    monkeypatch.setattr(tasks, "resolve_collection", lambda name: "docs")
+    monkeypatch.setattr(tasks, "swap_collection_alias", lambda name, target: calls["swapped"].append((name, target)))
+    monkeypatch.setattr(tasks, "build_lexical_index", lambda name: calls["indexed"].append(name))
+    monkeypatch.setattr(tasks.gc_collections, "apply_async", lambda **kwargs: calls.update(gc=calls["gc"] + 1))
+    calls["catalog"] = versions
+    return calls
+
+
+def swap_summary(target):
+    return {**incremental_summary(), "target": target, "swap": True}
+
+
+def test_a_complete_version_is_indexed_then_swapped_in(swaps):
+    target = swaps["catalog"].create("docs")
+
+    result = tasks.finalize_ingestion([file_result("/data/a.pdf", ["id-1"])], "docs", swap_summary(target))
+
+    assert result["status"] == "completed" and result["swapped"] is True
+    assert swaps["indexed"] == [target]
+    assert swaps["swapped"] == [("docs", target)]
+    # The collection from before versioning is retired
+    assert swaps["catalog"].retired(grace_seconds=-1) == [("docs", "docs")]
+    assert swaps["gc"] == 1
+
+
+def test_a_version_with_failed_files_is_abandoned_not_swapped(swaps):
+    target = swaps["catalog"].create("docs")
+    results = [file_result("/data/a.pdf", ["id-1"]), {"path": "/data/b.pdf", "error": "corrupt"}]
+
+    result = tasks.finalize_ingestion(results, "docs", swap_summary(target))
+
+    assert result["swapped"] is False
+    assert result["failed_files"] == [{"path": "/data/b.pdf", "error": "corrupt"}]
+    assert swaps["swapped"] == [] and swaps["indexed"] == []
+    assert swaps["catalog"].retired(grace_seconds=-1) == [("docs", target)]
+    assert swaps["gc"] == 1
@@ -0,0 +1,71 @@
+import os
+
+from app.worker.vectorstore import chunk_id, dedupe_collection
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        # id -> (text, metadata)
+        self.rows = dict(rows)
+
+    def get(self, include, limit, offset):
+        ids = list(self.rows)[offset:offset + limit]
+        return {
+            "ids": ids,
+            "documents": [self.rows[id_][0] for id_ in ids],
+            "metadatas": [self.rows[id_][1] for id_ in ids],
+        }
+
+
+class FakeClient:
+    def get_max_batch_size(self):
+        return 2
+
+
+class FakeVectorstore:
+    def __init__(self, rows):
+        self._collection = FakeCollection(rows)
+        self._client = FakeClient()
+
+    def delete(self, ids):
+        for id_ in ids:
+            del self._collection.rows[id_]
+
+
+def test_chunk_id_depends_on_source_position_and_text():
+    assert chunk_id("a.pdf", 0, "x") == chunk_id("a.pdf", 0, "x")
+    assert len({chunk_id("a.pdf", 0, "x"), chunk_id("b.pdf", 0, "x"), chunk_id("a.pdf", 1, "x"), chunk_id("a.pdf", 0, "y")}) == 4
+
+
+def test_legacy_relative_source_duplicates_are_removed():
+    source = os.path.abspath("public/data/a.pdf")
+    vectorstore = FakeVectorstore({
+        "random-1": ("teks", {"source": "public/data/a.pdf"}),
+        "random-2": ("teks", {"source": "public/data/a.pdf"}),
+        "new": ("teks", {"source": source, "chunk_index": 0}),
+    })
+
+    assert dedupe_collection(vectorstore, keep_ids={"new"}) == 2
+    assert list(vectorstore._collection.rows) == ["new"]
+
+
+def test_same_text_at_different_positions_is_kept():
+    vectorstore = FakeVectorstore({
+        "first": ("Lampiran", {"source": "/data/a.pdf", "chunk_index": 0}),
+        "second": ("Lampiran", {"source": "/data/a.pdf", "chunk_index": 7}),
+        "other-file": ("Lampiran", {"source": "/data/b.pdf", "chunk_index": 0}),
+    })
+
+    assert dedupe_collection(vectorstore) == 0
+    assert len(vectorstore._collection.rows) == 3
+
+
+def test_one_legacy_copy_survives_without_an_indexed_one():
+    vectorstore = FakeVectorstore({
+        "random-1": ("teks", {"source": "public/data/a.pdf"}),
+        "random-2": ("teks", {"source": "public/data/a.pdf"}),
+        "random-3": ("teks", {"source": "public/data/a.pdf"}),
+    })
+
+    assert dedupe_collection(vectorstore, keep_ids={"random-2"}) == 2
+    assert list(vectorstore._collection.rows) == ["random-2"]